@@ -2,44 +2,72 @@
 # -*- coding: utf-8 -*-
 """
 openid批量添加工具
+用法：
+    python3 add_openids.py openid1 openid2 ...     添加指定用户
+    python3 add_openids.py --stdin < users.txt     从标准输入逐行导入（格式同 user_openids.txt）
+    python3 add_openids.py --csv users.csv         从CSV导入（列 openid,location,sign,name,plate）
+    python3 add_openids.py                         交互式添加
 """
 
-import os
 import sys
+from config import Config
+from subscriber_status import SubscriberStatusStore
+from subscriber_store import get_subscriber_store, iter_csv_subscribers
+from subscribers import iter_subscribers, parse_subscriber_line
 
 def add_openids(openids_list):
-    """批量添加openid到文件"""
-    filename = 'user_openids.txt'
-    
-    # 读取现有openid
-    existing_openids = set()
-    if os.path.exists(filename):
-        with open(filename, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    existing_openids.add(line)
-    
-    # 添加新openid
+    """添加或更新订阅用户（每项为 "openid [地区代码] [生日MM-DD或星座] [name=称呼] [plate=车牌号]"）"""
+    store = get_subscriber_store()
+    status = SubscriberStatusStore()
+
     new_count = 0
-    with open(filename, 'a', encoding='utf-8') as f:
-        for openid in openids_list:
-            openid = openid.strip()
-            if openid and openid not in existing_openids:
-                f.write(openid + '\n')
-                new_count += 1
-                print(f"✅ 添加openid: {openid}")
-    
-    print(f"\n📊 统计: 新增 {new_count} 个openid，总计 {len(existing_openids) + new_count} 个用户")
+    for entry in openids_list:
+        subscriber = parse_subscriber_line(entry)
+        if not subscriber:
+            continue
+        if store.upsert(subscriber):
+            new_count += 1
+            print(f"✅ 添加openid: {subscriber.openid}（地区 {subscriber.location}）")
+        else:
+            # 已有用户重新添加（如重新授权后），更新信息并恢复推送
+            status.reactivate(subscriber.openid)
+            print(f"♻️ 已恢复推送: {subscriber.openid}")
+
+    print(f"\n📊 统计: 新增 {new_count} 个openid，总计 {store.count()} 个用户")
+
+def import_subscribers(subscribers):
+    """流式批量导入订阅用户（已有用户更新信息并恢复推送，不逐个输出）"""
+    store = get_subscriber_store()
+    status = SubscriberStatusStore()
+
+    def reactivating(subscribers):
+        # 与单个添加相同，重新导入的用户（如重新授权后）恢复推送，按批写入
+        batch = []
+        for subscriber in subscribers:
+            batch.append(subscriber.openid)
+            yield subscriber
+            if len(batch) >= Config.SUBSCRIBER_IMPORT_BATCH:
+                status.reactivate_many(batch)
+                batch.clear()
+        if batch:
+            status.reactivate_many(batch)
+
+    added, total = store.upsert_many(reactivating(subscribers))
+    print(f"📊 统计: 处理 {total} 条记录，新增 {added} 个openid，总计 {store.count()} 个用户")
 
 def main():
     print("🚀 openid批量添加工具")
     print("=" * 50)
-    
-    if len(sys.argv) > 1:
+
+    args = sys.argv[1:]
+    if args[:1] == ["--stdin"]:
+        import_subscribers(iter_subscribers(lines=sys.stdin))
+    elif args[:1] == ["--csv"] and len(args) == 2:
+        with open(args[1], 'r', encoding='utf-8', newline='') as f:
+            import_subscribers(iter_csv_subscribers(f))
+    elif args:
         # 从命令行参数添加
-        openids = sys.argv[1:]
-        add_openids(openids)
+        add_openids(args)
     else:
         # 交互式添加
         print("请输入openid（每行一个，空行结束）:")
@@ -49,11 +77,11 @@ def main():
             if not openid:
                 break
             openids.append(openid)
-        
+
         if openids:
             add_openids(openids)
         else:
             print("❌ 未输入任何openid")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+黄历查表模块
+功能：由紧凑的农历数据表一次性展开为按公历日期索引的数组，
+      提供农历日期、节气、生肖、干支、建除值日及宜忌的O(1)查询，无需联网
+"""
+
+import threading
+from array import array
+from datetime import date
+from typing import Dict, Optional
+
+# 农历数据（1900-2100），每年一个整数：
+# 低4位为闰月月份（0表示无闰月），第5-16位依次表示正月至十二月是否为大月（30天），
+# 第17位表示闰月是否为大月
+LUNAR_INFO = (
+    0x04bd8, 0x04ae0, 0x0a570, 0x054d5, 0x0d260, 0x0d950, 0x16554, 0x056a0, 0x09ad0, 0x055d2,  # 1900-1909
+    0x04ae0, 0x0a5b6, 0x0a4d0, 0x0d250, 0x1d255, 0x0b540, 0x0d6a0, 0x0ada2, 0x095b0, 0x14977,  # 1910-1919
+    0x04970, 0x0a4b0, 0x0b4b5, 0x06a50, 0x06d40, 0x1ab54, 0x02b60, 0x09570, 0x052f2, 0x04970,  # 1920-1929
+    0x06566, 0x0d4a0, 0x0ea50, 0x16a95, 0x05ad0, 0x02b60, 0x186e3, 0x092e0, 0x1c8d7, 0x0c950,  # 1930-1939
+    0x0d4a0, 0x1d8a6, 0x0b550, 0x056a0, 0x1a5b4, 0x025d0, 0x092d0, 0x0d2b2, 0x0a950, 0x0b557,  # 1940-1949
+    0x06ca0, 0x0b550, 0x15355, 0x04da0, 0x0a5b0, 0x14573, 0x052b0, 0x0a9a8, 0x0e950, 0x06aa0,  # 1950-1959
+    0x0aea6, 0x0ab50, 0x04b60, 0x0aae4, 0x0a570, 0x05260, 0x0f263, 0x0d950, 0x05b57, 0x056a0,  # 1960-1969
+    0x096d0, 0x04dd5, 0x04ad0, 0x0a4d0, 0x0d4d4, 0x0d250, 0x0d558, 0x0b540, 0x0b6a0, 0x195a6,  # 1970-1979
+    0x095b0, 0x049b0, 0x0a974, 0x0a4b0, 0x0b27a, 0x06a50, 0x06d40, 0x0af46, 0x0ab60, 0x09570,  # 1980-1989
+    0x04af5, 0x04970, 0x064b0, 0x074a3, 0x0ea50, 0x06b58, 0x05ac0, 0x0ab60, 0x096d5, 0x092e0,  # 1990-1999
+    0x0c960, 0x0d954, 0x0d4a0, 0x0da50, 0x07552, 0x056a0, 0x0abb7, 0x025d0, 0x092d0, 0x0cab5,  # 2000-2009
+    0x0a950, 0x0b4a0, 0x0baa4, 0x0ad50, 0x055d9, 0x04ba0, 0x0a5b0, 0x15176, 0x052b0, 0x0a930,  # 2010-2019
+    0x07954, 0x06aa0, 0x0ad50, 0x05b52, 0x04b60, 0x0a6e6, 0x0a4e0, 0x0d260, 0x0ea65, 0x0d530,  # 2020-2029
+    0x05aa0, 0x076a3, 0x096d0, 0x04afb, 0x04ad0, 0x0a4d0, 0x1d0b6, 0x0d250, 0x0d520, 0x0dd45,  # 2030-2039
+    0x0b5a0, 0x056d0, 0x055b2, 0x049b0, 0x0a577, 0x0a4b0, 0x0aa50, 0x1b255, 0x06d20, 0x0ada0,  # 2040-2049
+    0x14b63, 0x09370, 0x049f8, 0x04970, 0x064b0, 0x168a6, 0x0ea50, 0x06b20, 0x1a6c4, 0x0aae0,  # 2050-2059
+    0x092e0, 0x0d2e3, 0x0c960, 0x0d557, 0x0d4a0, 0x0da50, 0x05d55, 0x056a0, 0x0a6d0, 0x055d4,  # 2060-2069
+    0x052d0, 0x0a9b8, 0x0a950, 0x0b4a0, 0x0b6a6, 0x0ad50, 0x055a0, 0x0aba4, 0x0a5b0, 0x052b0,  # 2070-2079
+    0x0b273, 0x06930, 0x07337, 0x06aa0, 0x0ad50, 0x14b55, 0x04b60, 0x0a570, 0x054e4, 0x0d160,  # 2080-2089
+    0x0e968, 0x0d520, 0x0daa0, 0x16aa6, 0x056d0, 0x04ae0, 0x0a9d4, 0x0a2d0, 0x0d150, 0x0f252,  # 2090-2099
+    0x0d520                                                                                     # 2100
+)
+
+# 农历数据起点：1900年正月初一
+LUNAR_EPOCH = date(1900, 1, 31)
+
+# 查表覆盖的公历范围（节气寿星公式的21世纪参数适用于2001-2099年）
+FIRST_YEAR = 2001
+LAST_YEAR = 2099
+
+STEMS = "甲乙丙丁戊己庚辛壬癸"
+BRANCHES = "子丑寅卯辰巳午未申酉戌亥"
+ZODIACS = "鼠牛虎兔龙蛇马羊猴鸡狗猪"
+LUNAR_MONTHS = ("正", "二", "三", "四", "五", "六", "七", "八", "九", "十", "冬", "腊")
+LUNAR_DAYS = (
+    "初一", "初二", "初三", "初四", "初五", "初六", "初七", "初八", "初九", "初十",
+    "十一", "十二", "十三", "十四", "十五", "十六", "十七", "十八", "十九", "二十",
+    "廿一", "廿二", "廿三", "廿四", "廿五", "廿六", "廿七", "廿八", "廿九", "三十"
+)
+
+# 二十四节气，从小寒开始，每个公历月两个节气
+SOLAR_TERMS = (
+    "小寒", "大寒", "立春", "雨水", "惊蛰", "春分", "清明", "谷雨",
+    "立夏", "小满", "芒种", "夏至", "小暑", "大暑", "立秋", "处暑",
+    "白露", "秋分", "寒露", "霜降", "立冬", "小雪", "大雪", "冬至"
+)
+
+# 寿星通式21世纪C值，节气日 = int(Y * 0.2422 + C) - int(Y / 4)，Y为年份后两位
+SOLAR_TERM_C = (
+    5.4055, 20.12, 3.87, 18.73, 5.63, 20.646, 4.81, 20.1,
+    5.52, 21.04, 5.678, 21.37, 7.108, 22.83, 7.5, 23.13,
+    7.646, 23.042, 8.318, 23.438, 7.438, 22.36, 7.18, 21.94
+)
+
+# 寿星通式的已知例外：(年份, 节气序号) -> 日期修正
+SOLAR_TERM_FIXES = {
+    (2002, 14): 1,   # 立秋
+    (2008, 9): 1,    # 小满
+    (2016, 12): 1,   # 小暑
+    (2019, 0): -1,   # 小寒
+    (2021, 23): -1,  # 冬至
+    (2026, 3): -1,   # 雨水
+    (2082, 1): 1,    # 大寒
+    (2084, 5): 1,    # 春分
+    (2089, 19): 1,   # 霜降
+    (2089, 20): 1,   # 立冬
+}
+
+# 建除十二值星及其宜忌
+DUTY_NAMES = "建除满平定执破危成收开闭"
+DUTY_ACTIVITIES = (
+    ("出行、上任、会友、祈福", "动土、开仓、安葬"),
+    ("祭祀、祈福、沐浴、扫舍、求医", "嫁娶、出行、赴任"),
+    ("祭祀、祈福、开市、交易、纳财", "栽种、安葬、赴任"),
+    ("修造、涂泥、平治道涂", "嫁娶、开市、栽种"),
+    ("祭祀、祈福、嫁娶、纳畜、订盟", "出行、诉讼、破土"),
+    ("祭祀、祈福、捕捉、纳财", "出行、开市、移徙"),
+    ("求医、破屋、坏垣", "嫁娶、开市、出行、立券"),
+    ("祭祀、祈福、安床、沐浴", "登高、出行、行船"),
+    ("嫁娶、开市、入学、出行、交易", "诉讼、争执"),
+    ("纳财、收割、纳畜、入学", "出行、安葬、开市"),
+    ("开市、嫁娶、出行、入学、求医", "安葬、动土、破土"),
+    ("筑堤、补垣、安葬、纳财", "出行、开市、求医、动土")
+)
+
+# 日干支以 2000-01-01（戊午日，六十甲子序号54）为基准
+DAY_GANZHI_BASE = date(2000, 1, 1).toordinal() - 54
+
+NO_TERM = 255
+
+
+def _lunar_year_days(info: int) -> int:
+    """农历年总天数"""
+    days = 348  # 12个小月
+    bit = 0x8000
+    while bit > 0x8:
+        if info & bit:
+            days += 1
+        bit >>= 1
+    return days + _leap_days(info)
+
+
+def _leap_days(info: int) -> int:
+    """闰月天数，无闰月返回0"""
+    if info & 0xf:
+        return 30 if info & 0x10000 else 29
+    return 0
+
+
+def _month_days(info: int, month: int) -> int:
+    """农历某月（1-12）天数"""
+    return 30 if info & (0x10000 >> month) else 29
+
+
+def _solar_term_day(year: int, index: int) -> int:
+    """某年第 index 个节气所在的公历日（寿星通式）"""
+    y = year % 100
+    leap_base = (y - 1) // 4 if index < 4 else y // 4  # 小寒至雨水在闰年二月之前
+    day = int(y * 0.2422 + SOLAR_TERM_C[index]) - leap_base
+    return day + SOLAR_TERM_FIXES.get((year, index), 0)
+
+
+def _days_in_month(year: int, month: int) -> int:
+    """公历某月天数"""
+    if month == 12:
+        return 31
+    return (date(year, month + 1, 1) - date(year, month, 1)).days
+
+
+def _ganzhi(index: int) -> str:
+    """六十甲子序号转干支"""
+    return STEMS[index % 10] + BRANCHES[index % 12]
+
+
+class AlmanacTable:
+    """按公历日期索引的黄历数组表"""
+
+    def __init__(self, first_year: int = FIRST_YEAR, last_year: int = LAST_YEAR):
+        """
+        展开查表数据
+
+        Args:
+            first_year: 起始公历年
+            last_year: 结束公历年（含）
+        """
+        if first_year < 1901 or last_year > 2099 or first_year > last_year:
+            raise ValueError("黄历表仅支持1901-2099年")
+
+        self.start = date(first_year, 1, 1)
+        self.end = date(last_year, 12, 31)
+        self.base = self.start.toordinal()
+        size = self.end.toordinal() - self.base + 1
+
+        # 每天一项：农历年、月份（闰月+100）、日，节气序号，月干支序号
+        self.lunar_year = array('H', bytes(2 * size))
+        self.lunar_month = array('B', bytes(size))
+        self.lunar_day = array('B', bytes(size))
+        self.solar_term = array('B', [NO_TERM]) * size
+        self.month_ganzhi = array('B', bytes(size))
+
+        self._fill_lunar(size)
+        self._fill_solar_terms(first_year, last_year)
+
+    def _fill_lunar(self, size: int):
+        """从农历数据起点逐月展开农历日期"""
+        offset = self.base - LUNAR_EPOCH.toordinal()
+        year = 1900
+        # 跳过起点之前的整年
+        while offset >= _lunar_year_days(LUNAR_INFO[year - 1900]):
+            offset -= _lunar_year_days(LUNAR_INFO[year - 1900])
+            year += 1
+
+        index = -offset  # 当前农历年正月初一在数组中的位置
+        while index < size:
+            info = LUNAR_INFO[year - 1900]
+            leap = info & 0xf
+            for month in range(1, 13):
+                months = [(month, _month_days(info, month))]
+                if month == leap:
+                    months.append((month + 100, _leap_days(info)))
+                for month_code, days in months:
+                    for day in range(1, days + 1):
+                        if 0 <= index < size:
+                            self.lunar_year[index] = year
+                            self.lunar_month[index] = month_code
+                            self.lunar_day[index] = day
+                        index += 1
+            year += 1
+
+    def _fill_solar_terms(self, first_year: int, last_year: int):
+        """标记节气日，并按"节"划分月干支"""
+        for year in range(first_year, last_year + 1):
+            for month in range(1, 13):
+                for half in range(2):
+                    term = (month - 1) * 2 + half
+                    day = _solar_term_day(year, term)
+                    self.solar_term[date(year, month, day).toordinal() - self.base] = term
+
+        # 月干支按"节"（每月第一个节气）换月，1900年1月小寒前为丙子月（序号12）
+        for year in range(first_year, last_year + 1):
+            for month in range(1, 13):
+                month_start = date(year, month, 1).toordinal() - self.base
+                node = month_start + _solar_term_day(year, (month - 1) * 2) - 1
+                month_end = month_start + _days_in_month(year, month)
+                months = (year - 1900) * 12 + month + 11
+                for i in range(month_start, node):
+                    self.month_ganzhi[i] = months % 60
+                for i in range(node, month_end):
+                    self.month_ganzhi[i] = (months + 1) % 60
+
+    def _index(self, day: date) -> int:
+        """公历日期转数组下标"""
+        index = day.toordinal() - self.base
+        if not 0 <= index < len(self.lunar_day):
+            raise ValueError(f"日期 {day} 超出黄历表范围 {self.start} ~ {self.end}")
+        return index
+
+    def lookup(self, day: Optional[date] = None) -> Dict:
+        """
+        查询某天的黄历
+
+        Args:
+            day: 公历日期，默认今天
+
+        Returns:
+            Dict: 日期、农历、干支、生肖、节气、值日、宜、忌
+        """
+        day = day or date.today()
+        i = self._index(day)
+
+        lunar_year = self.lunar_year[i]
+        month_code = self.lunar_month[i]
+        is_leap = month_code > 100
+        month = month_code - 100 if is_leap else month_code
+        year_ganzhi = (lunar_year - 4) % 60
+        month_ganzhi = self.month_ganzhi[i]
+        day_ganzhi = (day.toordinal() - DAY_GANZHI_BASE) % 60
+        duty = (day_ganzhi % 12 - month_ganzhi % 12) % 12
+        term = self.solar_term[i]
+        suitable, avoid = DUTY_ACTIVITIES[duty]
+
+        return {
+            "date": day.strftime("%Y年%m月%d日"),
+            "lunar": f"农历{'闰' if is_leap else ''}{LUNAR_MONTHS[month - 1]}月{LUNAR_DAYS[self.lunar_day[i] - 1]}",
+            "ganzhi": f"{_ganzhi(year_ganzhi)}年 {_ganzhi(month_ganzhi)}月 {_ganzhi(day_ganzhi)}日",
+            "zodiac": ZODIACS[year_ganzhi % 12],
+            "solar_term": SOLAR_TERMS[term] if term != NO_TERM else "",
+            "duty": DUTY_NAMES[duty] + "日",
+            "suitable": suitable,
+            "avoid": avoid
+        }
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_almanac_table() -> AlmanacTable:
+    """获取进程内共享的黄历表（首次调用时展开）"""
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = AlmanacTable()
+        return _table
+
+
+def lookup_almanac(day: Optional[date] = None) -> Dict:
+    """查询某天的黄历，默认今天"""
+    return get_almanac_table().lookup(day)
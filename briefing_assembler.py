@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+简报组装模块
+功能：并发调用各板块数据源（天气、生活指数、黄历、限行、星座、易经），
+为每个数据源设置单独的超时时间和整体时间预算，超时或出错的板块标记为降级
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional
+
+from config import Config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def degraded_section(reason: str) -> Dict:
+    """
+    构造降级板块数据
+
+    Args:
+        reason: 降级原因（timeout / 异常信息）
+
+    Returns:
+        Dict: 带降级标记的板块数据，模板中取不到的字段会显示默认值
+    """
+    return {"degraded": True, "reason": reason}
+
+
+def is_degraded(section: Optional[Dict]) -> bool:
+    """判断板块是否为降级数据"""
+    return bool(section) and bool(section.get("degraded"))
+
+
+class BriefingAssembler:
+    """简报组装器：并发获取所有板块数据"""
+
+    def __init__(self, providers: Dict[str, Callable[[], Dict]],
+                 section_timeout: Optional[float] = None,
+                 total_budget: Optional[float] = None,
+                 timeouts: Optional[Dict[str, float]] = None):
+        """
+        初始化简报组装器
+
+        Args:
+            providers: 板块名称到数据获取函数的映射，如 {"weather": get_weather_info}
+            section_timeout: 单个板块的默认超时时间（秒）
+            total_budget: 整个简报的时间预算（秒）
+            timeouts: 按板块覆盖的超时时间
+        """
+        self.providers = providers
+        self.section_timeout = section_timeout if section_timeout is not None else Config.SECTION_TIMEOUT
+        self.total_budget = total_budget if total_budget is not None else Config.BRIEFING_BUDGET
+        self.timeouts = timeouts or {}
+
+    def assemble(self) -> Dict[str, Dict]:
+        """
+        并发获取所有板块
+
+        Returns:
+            Dict[str, Dict]: 板块名称到板块数据的映射，超时或失败的板块为降级数据
+        """
+        sections = {}
+        if not self.providers:
+            return sections
+
+        start = time.monotonic()
+        budget_deadline = start + self.total_budget
+
+        # 每个数据源一个线程，保证所有板块同时开始计时
+        executor = ThreadPoolExecutor(max_workers=len(self.providers),
+                                      thread_name_prefix="briefing-section")
+        try:
+            futures = {name: executor.submit(provider)
+                       for name, provider in self.providers.items()}
+
+            for name, future in futures.items():
+                section_deadline = start + self.timeouts.get(name, self.section_timeout)
+                remaining = min(section_deadline, budget_deadline) - time.monotonic()
+
+                try:
+                    sections[name] = future.result(timeout=max(remaining, 0))
+                except FutureTimeoutError:
+                    logger.warning(f"板块 {name} 超时，已降级")
+                    future.cancel()
+                    sections[name] = degraded_section("timeout")
+                except Exception as e:
+                    logger.error(f"板块 {name} 获取失败，已降级: {e}")
+                    sections[name] = degraded_section(str(e))
+        finally:
+            # 不等待仍在运行的慢数据源，避免拖住整份简报
+            executor.shutdown(wait=False)
+
+        elapsed = time.monotonic() - start
+        degraded = [name for name, section in sections.items() if is_degraded(section)]
+        if degraded:
+            logger.warning(f"简报组装完成，耗时 {elapsed:.2f}s，降级板块: {', '.join(degraded)}")
+        else:
+            logger.info(f"简报组装完成，耗时 {elapsed:.2f}s")
+
+        return sections
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定时任务调度模块
+功能：基于 APScheduler 的事件驱动调度，睡眠到最近一个任务的触发时刻准时执行（不再每分钟轮询），
+      同一调度器可注册多个任务（各版简报、提醒、数据刷新），收到 SIGINT/SIGTERM 时立即退出
+"""
+
+import signal
+import threading
+import logging
+from typing import Callable, List, Optional
+
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from config import Config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class BriefingScheduler:
+    """简报定时任务调度器"""
+
+    def __init__(self, timezone: Optional[str] = None):
+        """
+        初始化调度器
+
+        Args:
+            timezone: 时区名称（如 "Asia/Shanghai"），默认为配置中的时区，未配置时使用本机时区
+        """
+        options = {}
+        timezone = timezone or Config.SCHEDULE_TIMEZONE
+        if timezone:
+            options["timezone"] = timezone
+        self.scheduler = BlockingScheduler(job_defaults={
+            # 同一任务不重叠执行；错过多次（如进程挂起）时只补执行一次
+            "max_instances": 1,
+            "coalesce": True,
+            "misfire_grace_time": Config.SCHEDULE_MISFIRE_GRACE
+        }, **options)
+        self.scheduler.add_listener(self._on_event, EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+        self._shutdown_hooks: List[Callable[[], None]] = []
+
+    @staticmethod
+    def _on_event(event):
+        if event.code == EVENT_JOB_MISSED:
+            logger.warning(f"定时任务 {event.job_id} 错过了触发时间 {event.scheduled_run_time}")
+        else:
+            logger.error(f"定时任务 {event.job_id} 执行异常: {event.exception}")
+
+    def add_daily(self, func: Callable, at: str, name: Optional[str] = None):
+        """
+        注册每天定时执行的任务
+
+        Args:
+            func: 任务函数
+            at: 执行时间 "HH:MM"
+            name: 任务名称（日志中显示），默认为函数名
+        """
+        hour, minute = (int(part) for part in at.split(':'))
+        name = name or func.__name__
+        self.scheduler.add_job(func, CronTrigger(hour=hour, minute=minute, timezone=self.scheduler.timezone),
+                               id=name, name=name, replace_existing=True)
+        logger.info(f"定时任务已设置: {name} 每天 {at} 执行")
+
+    def add_interval(self, func: Callable, seconds: float, name: Optional[str] = None):
+        """
+        注册固定间隔执行的任务（如数据刷新、提醒检查）
+
+        Args:
+            func: 任务函数
+            seconds: 执行间隔（秒）
+            name: 任务名称（日志中显示），默认为函数名
+        """
+        name = name or func.__name__
+        self.scheduler.add_job(func, IntervalTrigger(seconds=seconds, timezone=self.scheduler.timezone),
+                               id=name, name=name, replace_existing=True)
+        logger.info(f"定时任务已设置: {name} 每 {seconds:g} 秒执行")
+
+    def add_once(self, func: Callable, name: Optional[str] = None, **kwargs):
+        """
+        注册启动后立即执行一次的任务（如启动时的测试执行），在调度器内运行，退出信号同样生效
+
+        Args:
+            func: 任务函数
+            name: 任务名称（日志中显示），默认为函数名
+            **kwargs: 传给任务函数的参数
+        """
+        name = name or func.__name__
+        self.scheduler.add_job(func, DateTrigger(timezone=self.scheduler.timezone), kwargs=kwargs,
+                               id=name, name=name, replace_existing=True)
+        logger.info(f"定时任务已设置: {name} 启动后立即执行一次")
+
+    def on_shutdown(self, callback: Callable[[], None]):
+        """注册停止调度时的回调（如取消分时发送窗口中的等待）"""
+        self._shutdown_hooks.append(callback)
+
+    def shutdown(self, *_):
+        """停止调度（可作为信号处理函数），正在执行的任务不等待"""
+        if self.scheduler.running:
+            logger.info("收到退出信号，停止定时任务调度")
+            for callback in self._shutdown_hooks:
+                callback()
+            self.scheduler.shutdown(wait=False)
+
+    def run(self):
+        """阻塞运行，直到收到 SIGINT/SIGTERM 或调用 shutdown"""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.shutdown)
+            signal.signal(signal.SIGTERM, self.shutdown)
+        logger.info("定时任务调度器已启动，等待执行...")
+        self.scheduler.start()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+简报模板模块
+功能：各推送渠道的消息模板在启动时编译一次，统一从同一份简报数据（Briefing）渲染；
+      同一份简报在同一渠道只渲染一次，所有接收者共用渲染结果；
+      个性化内容（称呼、车牌、星座）以 user.* 个人字段的形式拼接到预渲染的共享正文中
+"""
+
+from datetime import datetime
+from string import Formatter
+from typing import Dict, List, Optional, Tuple, Union
+
+from circuit_breaker import stale_note
+from city_weather import city_name
+from constellation import reading_for
+from subscribers import Subscriber
+from traffic_rules import plate_digit
+
+# 个人字段前缀，共享正文渲染时保留为空位，按接收者拼接
+USER_PREFIX = "user."
+
+WEATHER_KEYS = ("temperature", "weather", "humidity", "wind")
+LIFE_INDEX_KEYS = ("dressing", "uv", "car_washing", "cold", "sport", "air_quality")
+ALMANAC_KEYS = ("date", "lunar", "ganzhi", "zodiac", "solar_term", "duty", "suitable", "avoid")
+TRAFFIC_KEYS = ("date", "weekday", "time", "area", "note")
+CONSTELLATION_KEYS = ("constellation", "overall", "love", "career", "wealth", "health", "advice")
+I_CHING_KEYS = ("hexagram", "meaning", "interpretation", "lucky_number", "lucky_color")
+
+
+def _text(value) -> Optional[str]:
+    """板块字段转为文本，空值返回None（渲染时替换为模板的缺省文字）"""
+    if value is None or value == "" or value == []:
+        return None
+    return str(value)
+
+
+class Briefing:
+    """一份简报（某城市某次生成）的数据，各渠道模板的唯一数据来源"""
+
+    __slots__ = ("location", "generated_at", "sections", "values", "rendered", "bound", "zodiac_blocks")
+
+    def __init__(self, location: str, sections: Dict[str, Dict], generated_at: Optional[datetime] = None):
+        """
+        初始化简报
+
+        Args:
+            location: 地区代码
+            sections: 板块名称到板块数据的映射（weather、life_index、almanac、traffic，
+                      可选 constellation、i_ching）
+            generated_at: 生成时间，默认当前时间
+        """
+        self.location = location
+        self.generated_at = generated_at or datetime.now()
+        self.sections = sections
+        self.values = self._build_values()
+        # 渠道名称到渲染结果的缓存
+        self.rendered: Dict[str, Union[str, Dict[str, str]]] = {}
+        # 渠道名称到已填入共享字段的模板，个人字段留空
+        self.bound: Dict[str, CompiledTemplate] = {}
+        # 星座下标到星座运势段落，同星座的接收者共用
+        self.zodiac_blocks: Dict[int, str] = {}
+
+    def _section(self, name: str) -> Dict:
+        return self.sections.get(name) or {}
+
+    def _build_values(self) -> Dict[str, Optional[str]]:
+        """把各板块展开为模板字段（如 weather.temperature），只计算一次"""
+        values: Dict[str, Optional[str]] = {
+            "date": self.generated_at.strftime("%Y年%m月%d日"),
+            "datetime": self.generated_at.strftime("%Y-%m-%d %H:%M"),
+            "city": city_name(self.location)
+        }
+        for name, keys in (("weather", WEATHER_KEYS), ("life_index", LIFE_INDEX_KEYS),
+                           ("almanac", ALMANAC_KEYS), ("traffic", TRAFFIC_KEYS),
+                           ("constellation", CONSTELLATION_KEYS), ("i_ching", I_CHING_KEYS)):
+            section = self._section(name)
+            for key in keys:
+                values[f"{name}.{key}"] = _text(section.get(key))
+
+        values["weather.stale_note"] = stale_note(self._section("weather"))
+        values["life_index.stale_note"] = stale_note(self._section("life_index"))
+
+        suitable = self._section("almanac").get("suitable")
+        values["almanac.suitable_short"] = f"{suitable[:10]}..." if suitable else None
+        values["almanac.solar_term"] = values["almanac.solar_term"] or "无"
+
+        traffic = self._section("traffic")
+        numbers = traffic.get("restricted_numbers")
+        note = traffic.get("note")
+        values["traffic.numbers"] = ", ".join(map(str, numbers)) if numbers else "不限行"
+        values["traffic.restricted"] = "、".join(map(str, numbers)) if numbers else note or "不限行"
+        if numbers and note:
+            # 限行尾号只是推算结果（如未收录当年节假日安排）时附上说明，短格式（订阅消息限20字）只做标记
+            values["traffic.numbers"] += "(待核实)"
+            values["traffic.restricted"] += f"（{note}）"
+        return values
+
+
+class CompiledTemplate:
+    """预先解析好的模板：字面文字和字段名交替排列，渲染时只做字段查表和拼接"""
+
+    __slots__ = ("parts", "missing")
+
+    def __init__(self, text: str, missing: str = "N/A"):
+        """
+        编译模板
+
+        Args:
+            text: 模板文字，字段写作 {weather.temperature}
+            missing: 字段缺失时的替代文字
+        """
+        self.parts: List[Tuple[str, Optional[str]]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(text)
+        ]
+        self.missing = missing
+
+    def _value(self, values: Dict[str, Optional[str]], field: str) -> str:
+        value = values.get(field)
+        if value is not None:
+            return value
+        # 个人字段缺失时整段省略
+        return "" if field.startswith(USER_PREFIX) else self.missing
+
+    def render(self, values: Dict[str, Optional[str]]) -> str:
+        out = []
+        for literal, field in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(self._value(values, field))
+        return "".join(out)
+
+    def bind(self, values: Dict[str, Optional[str]]) -> "CompiledTemplate":
+        """
+        预先填入共享字段，返回只剩个人字段空位的模板
+
+        相邻的字面文字和共享字段合并为一段，之后每个接收者只需拼接个人字段，
+        渲染开销与个人字段数量相关，与正文长度无关。
+        """
+        parts: List[Tuple[str, Optional[str]]] = []
+        pending: List[str] = []
+        for literal, field in self.parts:
+            pending.append(literal)
+            if field is None:
+                continue
+            if field.startswith(USER_PREFIX):
+                parts.append(("".join(pending), field))
+                pending = []
+            else:
+                pending.append(self._value(values, field))
+        parts.append(("".join(pending), None))
+
+        bound = CompiledTemplate("", self.missing)
+        bound.parts = parts
+        return bound
+
+
+WECHAT_TEMPLATE = """🌅 早安{user.salutation}！今日信息简报 ({datetime})
+
+🌤️ {city}天气{weather.stale_note}
+• 温度：{weather.temperature}
+• 天气：{weather.weather}
+• 湿度：{weather.humidity}
+• 风力：{weather.wind}
+
+📊 生活指数{life_index.stale_note}
+• 穿衣：{life_index.dressing}
+• 紫外线：{life_index.uv}
+• 洗车：{life_index.car_washing}
+• 感冒：{life_index.cold}
+• 运动：{life_index.sport}
+• 空气质量：{life_index.air_quality}
+
+📅 今日黄历
+• 日期：{almanac.date}
+• 农历：{almanac.lunar}
+• 干支：{almanac.ganzhi}
+• 节气：{almanac.solar_term}
+• 宜：{almanac.suitable}
+• 忌：{almanac.avoid}
+• 生肖：{almanac.zodiac}
+• 值日：{almanac.duty}
+
+🚗 尾号限行
+• 日期：{traffic.date} {traffic.weekday}
+• 限行尾号：{traffic.restricted}
+• 限行时间：{traffic.time}
+• 限行区域：{traffic.area}{user.plate}{user.zodiac}
+
+💡 温馨提示：注意天气变化，合理安排出行！"""
+
+ROCKET_TEMPLATE = """
+【每日信息简报】
+📅 {date}
+
+--------------------
+【天气】{weather.stale_note}
+🌤️ 天气：{weather.weather}
+🌡️ 温度：{weather.temperature}
+💧 湿度：{weather.humidity}
+💨 风力：{weather.wind}
+
+--------------------
+【生活指数】{life_index.stale_note}
+👔 穿衣：{life_index.dressing}
+☀️ 紫外线：{life_index.uv}
+🚗 洗车：{life_index.car_washing}
+🤧 感冒：{life_index.cold}
+🏃 运动：{life_index.sport}
+🌬️ 空气：{life_index.air_quality}
+
+--------------------
+【黄历】
+📅 农历：{almanac.lunar}
+🐉 生肖：{almanac.zodiac}
+✅ 宜：{almanac.suitable}
+❌ 忌：{almanac.avoid}
+
+--------------------
+【限行】
+🚫 {traffic.numbers}
+⏰ {traffic.time} | 📍 {traffic.area}
+
+--------------------
+【星座】
+⭐ {constellation.constellation}
+🌟 整体：{constellation.overall}
+💖 爱情：{constellation.love}
+💼 事业：{constellation.career}
+💰 财运：{constellation.wealth}
+🧘 健康：{constellation.health}
+
+--------------------
+【易经】
+🔮 卦象：{i_ching.hexagram}
+🌅 寓意：{i_ching.meaning}
+🔢 幸运数字：{i_ching.lucky_number}
+🎨 幸运颜色：{i_ching.lucky_color}
+
+--------------------
+【寄语】
+愿您的每一天都充满阳光与希望，事业有成，家庭幸福！
+"""
+
+# 个人星座运势段落（按星座渲染，同星座接收者共用）
+ZODIAC_TEMPLATE = """
+
+⭐ 星座运势（{constellation}）
+• 整体：{overall}
+• 爱情：{love}
+• 事业：{career}
+• 财运：{wealth}
+• 健康：{health}
+• 建议：{advice}"""
+
+# 测试工具的预览（逐项显示）
+PREVIEW_TEMPLATE = {
+    "标题": "🌅 早安！今日信息简报",
+    "日期": "{datetime}",
+    "天气": "🌤️ {city}天气：{weather.temperature} {weather.weather}，湿度{weather.humidity}，{weather.wind}",
+    "生活指数": "📊 生活指数：穿衣{life_index.dressing}，紫外线{life_index.uv}，空气质量{life_index.air_quality}",
+    "今日黄历": "📅 今日黄历：{almanac.lunar}，宜{almanac.suitable_short}",
+    "尾号限行": "🚗 尾号限行：{traffic.weekday}限行{traffic.numbers}"
+}
+
+# 小程序订阅消息字段（thing 类字段不超过20个字）
+MINIPROGRAM_TEMPLATE = {
+    "thing1": "每日信息简报",
+    "date2": "{date}",
+    "thing3": "{weather.weather} {weather.temperature}",
+    "thing4": "限行:{traffic.numbers}",
+    "thing5": "{almanac.suitable_short}",
+    "thing6": "穿衣:{life_index.dressing}"
+}
+
+
+def _compile(spec: Union[str, Dict[str, str]], missing: str):
+    if isinstance(spec, dict):
+        return {key: CompiledTemplate(text, missing) for key, text in spec.items()}
+    return CompiledTemplate(spec, missing)
+
+
+# 启动时编译各渠道模板
+CHANNELS = {
+    "wechat": _compile(WECHAT_TEMPLATE, "N/A"),
+    "rocket": _compile(ROCKET_TEMPLATE, "未知"),
+    "preview": _compile(PREVIEW_TEMPLATE, "N/A"),
+    "miniprogram": _compile(MINIPROGRAM_TEMPLATE, "N/A")
+}
+ZODIAC_BLOCK = CompiledTemplate(ZODIAC_TEMPLATE, "N/A")
+
+
+def render(channel: str, briefing: Briefing) -> Union[str, Dict[str, str]]:
+    """
+    按渠道渲染简报，同一份简报同一渠道只渲染一次
+
+    Args:
+        channel: 渠道名称（见 CHANNELS）
+        briefing: 简报数据
+
+    Returns:
+        Union[str, Dict[str, str]]: 文本渠道返回消息文字，分字段渠道返回字段名到文字的映射
+
+    Raises:
+        KeyError: 渠道不存在
+    """
+    # 不含个人信息的版本，个人字段为空
+    cached = briefing.rendered.get(channel)
+    if cached is not None:
+        return cached
+    template = CHANNELS[channel]
+    if isinstance(template, dict):
+        result = {key: part.render(briefing.values) for key, part in template.items()}
+    else:
+        result = template.render(briefing.values)
+    briefing.rendered[channel] = result
+    return result
+
+
+def miniprogram_data(briefing: Briefing) -> Dict[str, Dict[str, str]]:
+    """小程序订阅消息的 data 字段，格式为 {"thing1": {"value": ...}, ...}"""
+    return {key: {"value": value} for key, value in render("miniprogram", briefing).items()}
+
+
+def _zodiac_block(briefing: Briefing, sign: int) -> str:
+    block = briefing.zodiac_blocks.get(sign)
+    if block is None:
+        reading = reading_for(sign, briefing.generated_at.date())
+        block = ZODIAC_BLOCK.render(reading)
+        briefing.zodiac_blocks[sign] = block
+    return block
+
+
+def personal_values(briefing: Briefing, subscriber: Subscriber) -> Dict[str, str]:
+    """
+    接收者的个人字段
+
+    Returns:
+        Dict[str, str]: user.salutation（称呼）、user.plate（本人车辆限行提醒）、
+                        user.zodiac（本人星座运势），未设置的字段不出现
+    """
+    values = {}
+    if subscriber.name:
+        values["user.salutation"] = f"，{subscriber.name}"
+    if subscriber.plate:
+        restricted = plate_digit(subscriber.plate) in briefing.sections.get("traffic", {}).get("restricted_numbers", [])
+        values["user.plate"] = f"\n• 您的车辆：{subscriber.plate}，今日{'限行' if restricted else '不限行'}"
+    if subscriber.sign is not None:
+        values["user.zodiac"] = _zodiac_block(briefing, subscriber.sign)
+    return values
+
+
+def render_for(channel: str, briefing: Briefing, subscriber: Subscriber) -> str:
+    """
+    为单个接收者渲染文本渠道消息
+
+    共享正文每个渠道只填充一次，之后每个接收者只把个人字段拼接到预渲染的正文段落之间。
+
+    Args:
+        channel: 文本渠道名称
+        briefing: 简报数据
+        subscriber: 接收者
+
+    Returns:
+        str: 个性化后的消息文字
+    """
+    bound = briefing.bound.get(channel)
+    if bound is None:
+        bound = CHANNELS[channel].bind(briefing.values)
+        briefing.bound[channel] = bound
+    return bound.render(personal_values(briefing, subscriber))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订阅消息批量发送模块
+功能：流式读取接收者，在共享连接池上保持固定数量的并发请求，
+      全局限制每秒请求数，返回每个接收者的发送结果
+"""
+
+import time
+import threading
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from subscribers import Subscriber
+from wechat_token import AccessTokenManager, WeChatAPIError
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """全局限速：多个线程共享，平均每秒不超过 qps 次"""
+
+    def __init__(self, qps: float):
+        self.interval = 1.0 / qps if qps > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """等待到下一个可用的发送时刻"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SendResult:
+    """单个接收者的发送结果"""
+
+    __slots__ = ("openid", "errcode", "errmsg")
+
+    def __init__(self, openid: str, errcode: Optional[int], errmsg: str = ""):
+        """
+        Args:
+            openid: 接收者openid
+            errcode: 微信返回的错误码，0为成功，请求未完成（网络异常等）为None
+            errmsg: 错误信息
+        """
+        self.openid = openid
+        self.errcode = errcode
+        self.errmsg = errmsg
+
+    @property
+    def ok(self) -> bool:
+        return self.errcode == 0
+
+    def __repr__(self):
+        return f"SendResult({self.openid!r}, {self.errcode!r}, {self.errmsg!r})"
+
+
+def summarize(results: Dict[str, SendResult]) -> Dict:
+    """按错误码统计发送结果，如 {0: 980, 43101: 15, None: 5}"""
+    return dict(Counter(result.errcode for result in results.values()))
+
+
+class SubscribeMessageSender:
+    """小程序订阅消息批量发送器"""
+
+    def __init__(self, manager: AccessTokenManager, template_id: str, page: str = "pages/index/index",
+                 send_url: Optional[str] = None, max_in_flight: Optional[int] = None,
+                 qps: Optional[float] = None):
+        """
+        初始化发送器
+
+        Args:
+            manager: Access Token管理器（令牌失效时自动刷新重发）
+            template_id: 订阅消息模板ID
+            page: 点击消息跳转的小程序页面
+            send_url: 订阅消息发送接口地址
+            max_in_flight: 同时在途的请求数
+            qps: 全局每秒请求上限
+        """
+        self.manager = manager
+        self.template_id = template_id
+        self.page = page
+        self.send_url = send_url or Config.WECHAT_SUBSCRIBE_URL
+        self.max_in_flight = max_in_flight or Config.SEND_MAX_IN_FLIGHT
+        self.limiter = RateLimiter(qps if qps is not None else Config.SEND_QPS)
+
+        # 连接池至少要容纳所有在途请求，否则多出的请求每次都要重新握手
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_in_flight)
+        self.manager.session.mount("https://", adapter)
+        self.manager.session.mount("http://", adapter)
+
+    def send_one(self, openid: str, data: Dict) -> SendResult:
+        """发送一条订阅消息"""
+        self.limiter.acquire()
+        payload = {
+            "touser": openid,
+            "template_id": self.template_id,
+            "page": self.page,
+            "data": data
+        }
+        try:
+            result = self.manager.request("POST", self.send_url, json=payload)
+        except WeChatAPIError as e:
+            return SendResult(openid, None, str(e))
+        return SendResult(openid, result.get('errcode', 0), result.get('errmsg', ""))
+
+    def send_all(self, recipients: Iterable[Subscriber], data_for: Callable[[Subscriber], Dict],
+                 on_result: Optional[Callable[[SendResult], None]] = None,
+                 collect: bool = True) -> Dict[str, SendResult]:
+        """
+        批量发送
+
+        接收者按需从迭代器中读取，任何时刻最多 max_in_flight 个请求在途，不会一次性展开全部接收者。
+
+        Args:
+            recipients: 接收者（可以是逐行读取文件的生成器）
+            data_for: 接收者到消息 data 字段的函数（同城用户可返回同一个对象）
+            on_result: 每个结果完成时的回调（如写入投递发件箱），在发送线程中调用
+            collect: 是否收集并返回全部结果；结果已由 on_result 处理时可关闭，内存占用与接收者数量无关
+
+        Returns:
+            Dict[str, SendResult]: openid 到发送结果的映射（按完成顺序），collect 为False时为空
+        """
+        results: Dict[str, SendResult] = {}
+        counts: Counter = Counter()
+        results_lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        started = time.monotonic()
+
+        def task(subscriber: Subscriber):
+            try:
+                result = self.send_one(subscriber.openid, data_for(subscriber))
+            except Exception as e:
+                result = SendResult(subscriber.openid, None, str(e))
+            finally:
+                slots.release()
+            with results_lock:
+                counts[result.errcode] += 1
+                if collect:
+                    results[result.openid] = result
+            if on_result:
+                try:
+                    on_result(result)
+                except Exception as e:
+                    logger.error(f"发送结果回调失败（{result.openid}）: {e}")
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="subscribe-send") as executor:
+            for subscriber in recipients:
+                slots.acquire()
+                executor.submit(task, subscriber)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"订阅消息发送完成: {sum(counts.values())} 位接收者，耗时 {elapsed:.1f}s，结果 {dict(counts)}")
+        return results
@@ -5,8 +5,11 @@
 用于检查用户是否已授权订阅消息
 """
 
-import requests
+from bulk_sender import SubscribeMessageSender
 from miniprogram_config import MiniProgramConfig
+from subscriber_status import SubscriberStatusStore
+from subscriber_store import get_subscriber_store
+from wechat_token import WeChatAPIError, get_token_manager
 
 def check_user_authorization():
     """检查用户授权状态"""
@@ -15,79 +18,53 @@ def check_user_authorization():
     print("🔍 用户授权状态检查工具")
     print("=" * 50)
     
-    # 获取Access Token
-    url = f"{config.ACCESS_TOKEN_URL}?grant_type=client_credential&appid={config.MINI_PROGRAM_APP_ID}&secret={config.MINI_PROGRAM_APP_SECRET}"
-    
+    # 获取Access Token（与其他工具和进程共用缓存的令牌）
+    manager = get_token_manager(config.MINI_PROGRAM_APP_ID, config.MINI_PROGRAM_APP_SECRET)
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if 'access_token' in data:
-                access_token = data['access_token']
-                print("✅ Access Token获取成功")
-            else:
-                print("❌ Access Token获取失败")
-                print(f"错误信息: {data}")
-                return
-    except Exception as e:
-        print(f"❌ 请求异常: {e}")
+        manager.get_token()
+        print("✅ Access Token获取成功")
+    except WeChatAPIError as e:
+        print("❌ Access Token获取失败")
+        print(f"错误信息: {e}")
         return
     
-    # 读取用户openid
-    try:
-        with open('user_openids.txt', 'r', encoding='utf-8') as f:
-            openids = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-    except FileNotFoundError:
-        print("❌ 用户openid文件不存在")
-        return
+    # 逐行读取订阅用户，并发发送测试消息检查授权状态（令牌失效时自动刷新并重发）
+    sender = SubscribeMessageSender(manager, config.MINI_PROGRAM_TEMPLATE_ID, send_url=config.SUBSCRIBE_MESSAGE_URL)
+    test_data = {
+        "thing1": {"value": "授权测试"},
+        "date2": {"value": "2024-01-01"},
+        "thing3": {"value": "测试消息"}
+    }
+    results = sender.send_all(get_subscriber_store().iter_subscribers(), lambda subscriber: test_data)
     
-    if not openids:
+    if not results:
         print("❌ 未找到用户openid")
         return
     
-    print(f"📋 检查 {len(openids)} 个用户的授权状态...\n")
+    # 检查结果写回用户状态，未授权的用户之后不再推送，授权后恢复
+    SubscriberStatusStore().apply(results.values())
     
-    for i, openid in enumerate(openids, 1):
-        print(f"[{i}/{len(openids)}] 用户 {openid[:8]}...")
-        
-        # 尝试发送测试消息检查授权状态
-        test_data = {
-            "touser": openid,
-            "template_id": config.MINI_PROGRAM_TEMPLATE_ID,
-            "page": "pages/index/index",
-            "data": {
-                "thing1": {"value": "授权测试"},
-                "date2": {"value": "2024-01-01"},
-                "thing3": {"value": "测试消息"}
-            }
-        }
-        
-        send_url = f"https://api.weixin.qq.com/cgi-bin/message/subscribe/send?access_token={access_token}"
+    print(f"📋 已检查 {len(results)} 个用户的授权状态\n")
+    
+    for i, result in enumerate(results.values(), 1):
+        print(f"[{i}/{len(results)}] 用户 {result.openid[:8]}...")
+        errcode = result.errcode
         
-        try:
-            response = requests.post(send_url, json=test_data, timeout=10)
-            if response.status_code == 200:
-                result = response.json()
-                errcode = result.get('errcode', -1)
-                
-                if errcode == 0:
-                    print("   ✅ 授权成功 - 可以接收消息")
-                elif errcode == 43101:
-                    print("   ❌ 用户未授权订阅消息")
-                    print("   💡 需要用户授权后才能接收消息")
-                elif errcode == 48001:
-                    print("   ⚠️ API未授权 (接口配置问题)")
-                    print("   💡 请检查测试号接口配置")
-                elif errcode == 40003:
-                    print("   ❌ 无效openid")
-                    print("   💡 请检查openid是否正确")
-                else:
-                    print(f"   ❓ 其他错误: {result}")
-            else:
-                print(f"   ❌ HTTP请求失败: {response.status_code}")
-                
-        except Exception as e:
-            print(f"   ❌ 请求异常: {e}")
+        if errcode == 0:
+            print("   ✅ 授权成功 - 可以接收消息")
+        elif errcode == 43101:
+            print("   ❌ 用户未授权订阅消息")
+            print("   💡 需要用户授权后才能接收消息")
+        elif errcode == 48001:
+            print("   ⚠️ API未授权 (接口配置问题)")
+            print("   💡 请检查测试号接口配置")
+        elif errcode == 40003:
+            print("   ❌ 无效openid")
+            print("   💡 请检查openid是否正确")
+        elif errcode is None:
+            print(f"   ❌ 请求异常: {result.errmsg}")
+        else:
+            print(f"   ❓ 其他错误: {errcode} {result.errmsg}")
     
     print(f"\n🎯 授权状态总结:")
     print("• 如果显示'授权成功' → ✅ 用户可以接收消息")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+熔断模块
+功能：每个数据源一个熔断器，连续失败达到阈值后在熔断窗口内不再请求上游；
+      失败或熔断期间返回最近一次真实数据并标注数据时间，不再返回模拟数据
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from briefing_assembler import degraded_section
+from config import Config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单个数据源的熔断器"""
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None):
+        """
+        初始化熔断器
+
+        Args:
+            name: 数据源名称
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断持续时间（秒），之后放行一次试探请求
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else Config.BREAKER_RESET_TIMEOUT
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否允许本次请求；熔断窗口结束后只放行一个试探请求"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        """记录成功，恢复闭合"""
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"数据源 {self.name} 已恢复")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        """记录失败，达到阈值或试探失败时熔断"""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"数据源 {self.name} 连续失败 {self.failures} 次，熔断 {self.reset_timeout}s")
+                self.state = OPEN
+                self.opened_at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {"state": self.state, "failures": self.failures, "opened_at": self.opened_at}
+
+    def restore(self, data: Dict):
+        """恢复持久化的状态；保存时正在试探（半开）的熔断器按熔断恢复，熔断窗口过后重新放行试探请求"""
+        state = data.get("state", CLOSED)
+        self.state = OPEN if state == HALF_OPEN else state
+        self.failures = data.get("failures", 0)
+        self.opened_at = data.get("opened_at", 0.0)
+
+
+def _format_age(seconds: float) -> str:
+    """把数据年龄格式化为 "N分钟前" / "N小时前" / "N天前" """
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{max(minutes, 1)}分钟前"
+    if minutes < 24 * 60:
+        return f"{minutes // 60}小时前"
+    return f"{minutes // (24 * 60)}天前"
+
+
+def stale_note(section: Optional[Dict]) -> str:
+    """旧数据的提示文字，例如 "（3小时前的数据）"，新数据返回空字符串"""
+    if section and section.get("stale"):
+        return f"（{section.get('age', '早前')}的数据）"
+    return ""
+
+
+class ProviderGuard:
+    """数据源熔断器集合，并保存每个数据源最近一次的真实数据"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化
+
+        Args:
+            path: 熔断状态和最近真实数据的持久化文件，进程重启后继续生效
+        """
+        self.path = path or os.path.join(Config.DATA_DIR, Config.PROVIDER_STATE_FILE)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._last_good: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"数据源状态文件 {self.path} 读取失败，忽略: {e}")
+            return
+        for name, state in data.get("breakers", {}).items():
+            self.breaker(name).restore(state)
+        self._last_good = data.get("last_good", {})
+
+    def _save(self):
+        """原子写入磁盘（调用方需持有锁）"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "breakers": {name: breaker.to_dict() for name, breaker in self._breakers.items()},
+            "last_good": self._last_good
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"数据源状态文件 {self.path} 写入失败: {e}")
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        """获取（必要时创建）数据源的熔断器"""
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(name)
+        return self._breakers[name]
+
+    def fetch(self, name: str, key: str, fetcher: Callable[[], Any]) -> Dict:
+        """
+        经熔断器调用数据源
+
+        Args:
+            name: 数据源名称（同一个上游共用一个熔断器），如 weather
+            key: 数据键，如地区代码，用于保存最近一次真实数据
+            fetcher: 数据获取函数，失败时应抛出异常
+
+        Returns:
+            Dict: 新数据；失败或熔断时为带 stale/age 标记的最近真实数据；都没有时为降级数据
+        """
+        with self._lock:
+            breaker = self.breaker(name)
+        reason = "熔断中"
+
+        if breaker.allow():
+            try:
+                value = fetcher()
+                breaker.record_success()
+                with self._lock:
+                    self._last_good[f"{name}:{key}"] = {"value": value, "fetched_at": time.time()}
+                    self._save()
+                return value
+            except Exception as e:
+                breaker.record_failure()
+                reason = str(e)
+                logger.error(f"数据源 {name}（{key}）请求失败: {e}")
+                with self._lock:
+                    self._save()
+        else:
+            logger.info(f"数据源 {name} 熔断中，跳过请求（{key}）")
+
+        return self.fallback(name, key, reason)
+
+    def fallback(self, name: str, key: str, reason: str) -> Dict:
+        """
+        不请求上游时的数据（如调用方已超时）
+
+        Returns:
+            Dict: 带 stale/age 标记的最近真实数据，没有时为降级数据
+        """
+        with self._lock:
+            last_good = self._last_good.get(f"{name}:{key}")
+        if last_good:
+            return dict(last_good["value"], stale=True, age=_format_age(time.time() - last_good["fetched_at"]))
+        return degraded_section(reason)
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_provider_guard() -> ProviderGuard:
+    """获取进程内共享的数据源熔断器集合"""
+    global _guard
+    with _guard_lock:
+        if _guard is None:
+            _guard = ProviderGuard()
+        return _guard
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多城市天气模块
+功能：对去重后的地区列表（订阅用户涉及的城市），每个地区并发请求一次天气和生活指数，
+      同城用户共用同一份数据，上游请求数只随城市数量增长
+"""
+
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Optional
+
+from circuit_breaker import ProviderGuard, get_provider_guard
+from config import Config
+from weather_client import QWeatherClient
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def city_name(location: str) -> str:
+    """地区代码转城市名称，未知地区返回地区代码本身"""
+    return Config.CITY_NAMES.get(location, location)
+
+
+class CityWeatherFetcher:
+    """多城市天气获取器"""
+
+    def __init__(self, client: Optional[QWeatherClient] = None, max_workers: Optional[int] = None,
+                 guard: Optional[ProviderGuard] = None):
+        """
+        初始化多城市天气获取器
+
+        Args:
+            client: 和风天气客户端，多个城市共用同一个连接池
+            max_workers: 最大并发请求数
+            guard: 数据源熔断器，默认为进程内共享的熔断器
+        """
+        self.client = client or QWeatherClient()
+        self.max_workers = max_workers or Config.WEATHER_MAX_WORKERS
+        self.guard = guard or get_provider_guard()
+
+    def _fetch_city(self, location: str) -> Dict:
+        """获取单个城市的天气和生活指数，单项失败时为最近一次真实数据或降级数据"""
+        return {
+            "name": city_name(location),
+            "weather": self.guard.fetch("weather", location, lambda: self.client.get_now(location)),
+            "life_index": self.guard.fetch("life_index", location, lambda: self.client.get_indices(location))
+        }
+
+    def _fallback_city(self, location: str, reason: str) -> Dict:
+        """城市超时时的数据：各项为最近一次真实数据或降级数据"""
+        return {
+            "name": city_name(location),
+            "weather": self.guard.fallback("weather", location, reason),
+            "life_index": self.guard.fallback("life_index", location, reason)
+        }
+
+    def fetch(self, locations: Iterable[str], timeout: Optional[float] = None,
+              budget: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        并发获取多个城市的数据，每个地区只请求一次
+
+        超时的城市单独改用最近一次真实数据（没有时为降级数据），不影响已返回的城市
+
+        Args:
+            locations: 地区代码（可以有重复）
+            timeout: 单个城市从开始请求起的超时时间（秒），None 表示不限
+            budget: 所有城市的总时间预算（秒），到期后尚未返回的城市全部按超时处理，None 表示不限
+
+        Returns:
+            Dict[str, Dict]: 地区代码到 {"name", "weather", "life_index"} 的映射
+        """
+        unique = list(dict.fromkeys(locations))
+        if not unique:
+            return {}
+
+        # 城市在线程池中排队时不计时，开始请求时记下开始时间
+        started: Dict[str, float] = {}
+
+        def fetch_city(location: str) -> Dict:
+            started[location] = time.monotonic()
+            return self._fetch_city(location)
+
+        start = time.monotonic()
+        workers = min(self.max_workers, len(unique))
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="city-weather")
+        try:
+            futures = {executor.submit(fetch_city, location): location for location in unique}
+            pending = set(futures)
+            results: Dict[str, Dict] = {}
+            late = []
+            while pending:
+                deadlines = [start + budget] if budget is not None else []
+                if timeout is not None:
+                    # 等待期间才开始的城市最早在 timeout 之后超时，最多等待 timeout 再检查
+                    deadlines.append(time.monotonic() + timeout)
+                    deadlines.extend(started[futures[future]] + timeout for future in pending
+                                     if futures[future] in started)
+                wait_for = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+                done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    location = futures[future]
+                    try:
+                        results[location] = future.result()
+                    except Exception as e:
+                        logger.error(f"{city_name(location)}天气获取失败: {e}")
+                        results[location] = self._fallback_city(location, str(e))
+
+                now = time.monotonic()
+                over_budget = budget is not None and now >= start + budget
+                for future in list(pending):
+                    location = futures[future]
+                    if over_budget or (timeout is not None and location in started
+                                       and now >= started[location] + timeout):
+                        pending.discard(future)
+                        late.append(location)
+                        results[location] = self._fallback_city(location, "timeout")
+
+            if late:
+                logger.warning(f"{len(late)}/{len(unique)} 个城市天气超时，使用最近一次数据: "
+                               f"{', '.join(city_name(location) for location in late)}")
+            return {location: results[location] for location in unique}
+        finally:
+            # 不等待超时城市的请求，尚未开始的请求直接取消
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -17,18 +17,104 @@ class Config:
     WECHAT_APP_ID = os.getenv('WECHAT_APP_ID', 'your_wechat_app_id')
     WECHAT_APP_SECRET = os.getenv('WECHAT_APP_SECRET', 'your_wechat_app_secret')
     WECHAT_TEMPLATE_ID = os.getenv('WECHAT_TEMPLATE_ID', 'your_template_id')
+    WECHAT_TOKEN_URL = "https://api.weixin.qq.com/cgi-bin/token"
+    WECHAT_TOKEN_CACHE_FILE = "wechat_token.json"  # 数据目录下，多进程共享
+    WECHAT_TOKEN_REFRESH_MARGIN = 300  # 距离过期多少秒时后台提前刷新
+    WECHAT_REQUEST_TIMEOUT = 10  # 微信接口请求超时（秒）
+    WECHAT_POOL_SIZE = 10  # 微信接口连接池大小
+    WECHAT_SUBSCRIBE_URL = "https://api.weixin.qq.com/cgi-bin/message/subscribe/send"
+    WECHAT_USER_BATCHGET_URL = "https://api.weixin.qq.com/cgi-bin/user/info/batchget"
+    WECHAT_MEDIA_UPLOAD_URL = "https://api.weixin.qq.com/cgi-bin/media/upload"
+    WECHAT_MEDIA_CACHE_FILE = "wechat_media.json"  # 临时素材 media_id 缓存（数据目录下）
+    WECHAT_MEDIA_TTL = 3 * 24 * 3600 - 3600  # 临时素材有效期3天，提前1小时停止使用
+    WECHAT_MEDIA_UPLOAD_TIMEOUT = 30  # 素材上传超时（秒）
+    WECHAT_SEND_IMAGE = os.getenv('WECHAT_SEND_IMAGE', '').lower() in ('1', 'true', 'yes')  # 是否附带图片版简报
+    
+    # 订阅消息批量发送配置
+    SEND_MAX_IN_FLIGHT = int(os.getenv('SEND_MAX_IN_FLIGHT', '16'))  # 同时在途的请求数
+    SEND_QPS = float(os.getenv('SEND_QPS', '100'))  # 全局每秒请求上限
+    OUTBOX_DB = "delivery_outbox.db"  # 投递发件箱（数据目录下）
+    OUTBOX_BATCH_SIZE = 200  # 发件箱每批领取/写入的行数
+    OUTBOX_KEEP_DAYS = 30  # 投递记录保留天数
+    
+    # 订阅用户状态配置（根据发送结果自动更新）
+    STATUS_DB = "subscriber_status.db"
+    STATUS_BACKOFF_BASE = 20 * 3600  # 首次临时失败后的暂停时间（秒），略小于一天，次日即可重试
+    STATUS_BACKOFF_MAX = 7 * 24 * 3600  # 最长暂停时间（秒）
+    CHECK_MAX_AGE = 24 * 3600  # 用户检查结果有效期（秒），期内且状态无变化的用户不再检查
+    CHECK_BATCH_SIZE = 100  # 批量获取用户信息接口每次最多100个openid
+    # 订阅用户openid所属的AppID：批量获取用户信息是公众号接口，只有与公众号AppID相同时才按关注状态检查，
+    # 小程序订阅消息的openid改为根据发送记录判断
+    SUBSCRIBER_APP_ID = os.getenv('SUBSCRIBER_APP_ID', '')
     
     # 天气API配置
     WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', 'your_weather_api_key')
-    WEATHER_LOCATION = "101010100"  # 北京地区代码
+    WEATHER_LOCATION = os.getenv('WEATHER_LOCATION', '101010100')  # 默认地区代码（北京）
+    WEATHER_MAX_WORKERS = 8  # 多城市天气并发请求数
+    CITY_NAMES = {
+        "101010100": "北京",
+        "101020100": "上海",
+        "101030100": "天津",
+        "101040100": "重庆",
+        "101280101": "广州",
+        "101280601": "深圳",
+        "101210101": "杭州",
+        "101190101": "南京",
+        "101200101": "武汉",
+        "101270101": "成都",
+        "101110101": "西安"
+    }
+    WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'https://devapi.qweather.com/v7')
+    WEATHER_CONNECT_TIMEOUT = 3.05  # 建立连接（含TLS握手）超时（秒）
+    WEATHER_READ_TIMEOUT = 5  # 读取响应超时（秒）
+    WEATHER_CACHE_FILE = "weather_cache.json"
+    WEATHER_CACHE_TTL = 1800  # 缓存新鲜期（秒），期内不请求上游
+    WEATHER_CACHE_MAX_STALE = 6 * 3600  # 过期后仍可先返回旧值的最长时间（秒）
+    WEATHER_NOW_MAX_STALE = WEATHER_CACHE_TTL + 300  # 实时天气最长可用时间（秒），超过后不再当作当前天气
     
     # 定时任务配置
     SCHEDULE_TIME = "09:00"  # 每天上午9点执行
+    ROCKET_SCHEDULE_TIME = "08:00"  # Rocket版每天上午8点执行
+    SCHEDULE_TIMEZONE = os.getenv('SCHEDULE_TIMEZONE') or None  # 定时任务时区（如 Asia/Shanghai），默认本机时区
+    SCHEDULE_MISFIRE_GRACE = 600  # 错过触发时间（如进程挂起）后多少秒内仍补执行
+    # 分时发送窗口：从定时任务的触发时间起，把接收者按openid哈希均匀分散到这段时间内发送，0为立即全部发送
+    DELIVERY_WINDOW_MINUTES = float(os.getenv('DELIVERY_WINDOW_MINUTES', '0'))
+    ROCKET_DELIVERY_WINDOW_MINUTES = float(os.getenv('ROCKET_DELIVERY_WINDOW_MINUTES', '0'))
+    DELIVERY_BATCH_SLACK = 1.0  # 发送时刻相差不超过这么多秒的接收者合为一批标记、发送（秒）
+    
+    # 简报组装配置
+    SECTION_TIMEOUT = float(os.getenv('SECTION_TIMEOUT', '5'))  # 单个板块超时（秒）
+    BRIEFING_BUDGET = float(os.getenv('BRIEFING_BUDGET', '10'))  # 整份简报时间预算（秒）
+    # 天气请求含重试的总时长（秒），小于单个板块超时，超时前的重试才有意义
+    WEATHER_RETRY_BUDGET = SECTION_TIMEOUT * 0.8
     
     # 日志配置
     LOG_LEVEL = "INFO"
     LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
     
+    # 尾号限行配置
+    HOLIDAY_FILE = "holidays.json"  # 数据目录下追加的节假日安排
+    TRAFFIC_COMPILE_DAYS = 732  # 限行规则预编译天数（从今年1月1日起）
+    
+    # 订阅用户文件（每行 "openid [地区代码]"），首次使用时迁移到订阅用户数据库
+    SUBSCRIBER_FILE = os.getenv('SUBSCRIBER_FILE', 'user_openids.txt')
+    SUBSCRIBER_DB = "subscribers.db"  # 订阅用户数据库（数据目录下）
+    SUBSCRIBER_IMPORT_BATCH = 1000  # 批量导入每批写入的行数
+    SHARD_INDEX = int(os.getenv('SHARD_INDEX', '0'))  # 多进程分片发送时本进程的分片下标
+    SHARD_COUNT = int(os.getenv('SHARD_COUNT', '1'))  # 分片总数，1为不分片
+    
+    # 数据目录（缓存等运行时文件）
+    DATA_DIR = os.getenv('BRIEFING_DATA_DIR', 'data')
+    
+    # 数据源熔断配置
+    BREAKER_FAILURE_THRESHOLD = 3  # 连续失败多少次后熔断
+    BREAKER_RESET_TIMEOUT = 600  # 熔断持续时间（秒），之后放行一次试探请求
+    PROVIDER_STATE_FILE = "provider_state.json"  # 熔断状态和最近真实数据
+    
+    # 简报快照配置
+    SNAPSHOT_DB = "briefing_snapshots.db"
+    SNAPSHOT_KEEP_DAYS = 30  # 快照保留天数
+    
     # 其他配置
     MAX_RETRY = 3
-    RETRY_DELAY = 5  # 重试延迟（秒）
\ No newline at end of file
+    RETRY_DELAY = 0.2  # 重试退避基准延迟（秒），第n次重试前最多等待 RETRY_DELAY * 2^n
\ No newline at end of file
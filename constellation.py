@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+星座运势模块
+功能：每天只计算12个星座的运势，订阅用户按生日或星座查表映射到对应运势，
+      个性化运势的计算量固定为12次，与用户数量无关
+"""
+
+import random
+import threading
+from array import array
+from datetime import date
+from typing import Dict, List, Optional
+
+SIGNS = ("白羊座", "金牛座", "双子座", "巨蟹座", "狮子座", "处女座",
+         "天秤座", "天蝎座", "射手座", "摩羯座", "水瓶座", "双鱼座")
+
+# 各星座起始日期（月, 日），与 SIGNS 顺序一致
+SIGN_STARTS = ((3, 21), (4, 20), (5, 21), (6, 22), (7, 23), (8, 23),
+               (9, 23), (10, 24), (11, 23), (12, 22), (1, 20), (2, 19))
+
+ADVICES = (
+    "今日运势不错，适合开展新计划，注意保持良好的人际关系。",
+    "稳扎稳打更有收获，遇事多听取他人意见。",
+    "灵感充沛，适合学习与创作，避免冲动消费。",
+    "人缘旺盛，合作顺利，记得适当休息。",
+    "宜整理思路、规划未来，不宜轻易做出重大决定。",
+    "行动力强，把握机会主动出击，同时注意沟通方式。",
+    "情绪容易起伏，多做运动有助于放松心情。",
+    "财务方面需谨慎，按计划支出，忌跟风投资。"
+)
+
+NO_SIGN = 255
+
+
+def _day_of_year(month: int, day: int) -> int:
+    """按闰年计算的年内序号（0-365），2月29日也有对应位置"""
+    return date(2000, month, day).timetuple().tm_yday - 1
+
+
+def _build_sign_table() -> array:
+    """年内每一天对应的星座下标，生日查星座时直接按下标取值"""
+    table = array('B', [NO_SIGN]) * 366
+    starts = sorted((_day_of_year(month, day), index) for index, (month, day) in enumerate(SIGN_STARTS))
+    for position, (start, index) in enumerate(starts):
+        end = starts[position + 1][0] if position + 1 < len(starts) else 366
+        for i in range(start, end):
+            table[i] = index
+    # 年初到水瓶座之前属于摩羯座
+    for i in range(starts[0][0]):
+        table[i] = SIGNS.index("摩羯座")
+    return table
+
+
+SIGN_TABLE = _build_sign_table()
+
+
+def sign_for_birthday(month: int, day: int) -> int:
+    """生日（月、日）对应的星座下标"""
+    return SIGN_TABLE[_day_of_year(month, day)]
+
+
+def parse_sign(value: str) -> Optional[int]:
+    """
+    解析星座或生日
+
+    Args:
+        value: 星座名称（如 "白羊座"）或生日（"MM-DD"）
+
+    Returns:
+        Optional[int]: 星座下标，无法识别时返回None
+    """
+    if value in SIGNS:
+        return SIGNS.index(value)
+    try:
+        month, day = (int(part) for part in value.split('-'))
+        return sign_for_birthday(month, day)
+    except ValueError:
+        return None
+
+
+def _compute_reading(day: date, sign: int) -> Dict:
+    """计算某星座某天的运势（同一天同一星座结果固定）"""
+    rng = random.Random(f"{day.isoformat()}:{sign}")
+
+    def stars():
+        return "⭐" * rng.randint(2, 5)
+
+    return {
+        "constellation": SIGNS[sign],
+        "overall": stars(),
+        "love": stars(),
+        "career": stars(),
+        "wealth": stars(),
+        "health": stars(),
+        "advice": rng.choice(ADVICES)
+    }
+
+
+_readings_cache: Dict[date, List[Dict]] = {}
+_readings_lock = threading.Lock()
+
+
+def daily_readings(day: Optional[date] = None) -> List[Dict]:
+    """
+    获取某天12个星座的运势，每天只计算一次
+
+    Returns:
+        List[Dict]: 按 SIGNS 顺序排列的运势
+    """
+    day = day or date.today()
+    with _readings_lock:
+        readings = _readings_cache.get(day)
+        if readings is None:
+            readings = [_compute_reading(day, sign) for sign in range(len(SIGNS))]
+            # 只保留当天，避免常驻进程累积
+            _readings_cache.clear()
+            _readings_cache[day] = readings
+        return readings
+
+
+def reading_for(sign: Optional[int], day: Optional[date] = None) -> Dict:
+    """
+    获取单个星座的运势，未设置星座时返回当日轮值星座
+
+    Args:
+        sign: 星座下标
+        day: 日期，默认今天
+    """
+    day = day or date.today()
+    if sign is None or sign == NO_SIGN:
+        sign = day.day % len(SIGNS)
+    return daily_readings(day)[sign]
@@ -2,16 +2,27 @@
 # -*- coding: utf-8 -*-
 """
 每日信息简报系统
-功能：获取北京天气、生活指数、黄历、限行信息，并推送到微信公众号
+功能：按订阅用户所在城市获取天气、生活指数，以及黄历、限行信息，并推送到微信公众号
 """
 
-import requests
 import json
-import schedule
-import time
-from datetime import datetime, timedelta
+from collections import Counter
+from datetime import date, timedelta
 import logging
 from typing import Dict, List, Optional
+from almanac_table import lookup_almanac
+from briefing_scheduler import BriefingScheduler
+from briefing_templates import Briefing, render, render_for
+from city_weather import CityWeatherFetcher, city_name
+from config import Config
+from delivery_window import DeliveryWindow
+from image_generator import ImageGenerator
+from snapshot_store import SnapshotStore, is_usable
+from subscriber_store import configured_shard, get_subscriber_store
+from traffic_rules import query_traffic_restriction
+from weather_client import QWeatherClient
+from wechat_media import MediaCache
+from wechat_token import WeChatAPIError, get_token_manager
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,150 +37,144 @@ class DailyBriefing:
             wechat_config: 微信公众号配置
         """
         self.wechat_config = wechat_config
-        self.weather_api_key = "your_weather_api_key"  # 需要替换为实际的天气API密钥
+        self.weather_client = QWeatherClient(api_key=Config.WEATHER_API_KEY)
+        self.city_fetcher = CityWeatherFetcher(self.weather_client)
+        self.snapshot_store = SnapshotStore()
+        # 图片版简报：每个城市的图片每天只上传一次，所有消息共用同一个 media_id
+        self.media_cache = MediaCache(get_token_manager()) if Config.WECHAT_SEND_IMAGE else None
+        # 分时发送：本进程的用户按openid哈希分散到整个发送窗口
+        self.shard = configured_shard()
+        self.delivery_window = DeliveryWindow(Config.SCHEDULE_TIME, Config.DELIVERY_WINDOW_MINUTES, self.shard)
         
-    def get_weather_info(self) -> Dict:
-        """获取北京天气信息"""
-        try:
-            # 使用和风天气API（需要注册获取API密钥）
-            url = f"https://devapi.qweather.com/v7/weather/now?location=101010100&key={self.weather_api_key}"
-            response = requests.get(url)
-            
-            if response.status_code == 200:
-                data = response.json()
-                weather_data = {
-                    "temperature": data["now"]["temp"],
-                    "weather": data["now"]["text"],
-                    "humidity": data["now"]["humidity"],
-                    "wind": data["now"]["windDir"] + data["now"]["windScale"] + "级",
-                    "update_time": data["updateTime"]
-                }
-                return weather_data
-            else:
-                # 模拟数据（实际使用时需要替换为真实API）
-                return {
-                    "temperature": "8℃",
-                    "weather": "晴",
-                    "humidity": "45%",
-                    "wind": "北风3级",
-                    "update_time": datetime.now().strftime("%Y-%m-%d %H:%M")
-                }
-        except Exception as e:
-            logger.error(f"获取天气信息失败: {e}")
-            return {}
+    def get_weather_info(self, location: Optional[str] = None) -> Dict:
+        """获取指定城市（默认北京）天气信息，失败或熔断时为带数据时间的最近一次真实数据"""
+        location = location or Config.WEATHER_LOCATION
+        # 使用和风天气API（需要注册获取API密钥）
+        return self.city_fetcher.guard.fetch("weather", location, lambda: self.weather_client.get_now(location))
     
-    def get_life_index(self) -> Dict:
-        """获取生活指数"""
-        try:
-            # 模拟生活指数数据
-            return {
-                "dressing": "较舒适",
-                "uv": "中等",
-                "car_washing": "适宜",
-                "cold": "少发",
-                "sport": "适宜",
-                "air_quality": "良"
-            }
-        except Exception as e:
-            logger.error(f"获取生活指数失败: {e}")
-            return {}
+    def get_life_index(self, location: Optional[str] = None) -> Dict:
+        """获取指定城市（默认北京）生活指数，失败或熔断时为带数据时间的最近一次真实数据"""
+        location = location or Config.WEATHER_LOCATION
+        return self.city_fetcher.guard.fetch("life_index", location, lambda: self.weather_client.get_indices(location))
     
     def get_almanac(self) -> Dict:
         """获取今日黄历"""
         try:
-            # 模拟黄历数据
-            today = datetime.now()
-            return {
-                "date": today.strftime("%Y年%m月%d日"),
-                "lunar": "农历腊月廿三",
-                "suitable": "祭祀、祈福、求嗣、开光、出行",
-                "avoid": "破土、安葬、作灶",
-                "zodiac": "龙",
-                "star": "心宿"
-            }
+            # 本地查表，无需联网
+            return lookup_almanac()
         except Exception as e:
             logger.error(f"获取黄历失败: {e}")
             return {}
     
-    def get_traffic_restriction(self) -> Dict:
-        """获取尾号限行信息"""
+    def get_traffic_restriction(self, location: Optional[str] = None) -> Dict:
+        """获取指定城市（默认北京）尾号限行信息"""
         try:
-            today = datetime.now()
-            # 北京尾号限行规则（模拟）
-            restriction_rules = {
-                0: [1, 6],  # 周一
-                1: [2, 7],  # 周二
-                2: [3, 8],  # 周三
-                3: [4, 9],  # 周四
-                4: [5, 0],  # 周五
-                5: [],      # 周六不限行
-                6: []       # 周日不限行
-            }
-            
-            weekday = today.weekday()
-            restricted_numbers = restriction_rules.get(weekday, [])
-            
-            return {
-                "date": today.strftime("%Y年%m月%d日"),
-                "weekday": ["周一", "周二", "周三", "周四", "周五", "周六", "周日"][weekday],
-                "restricted_numbers": restricted_numbers,
-                "time": "7:00-20:00",
-                "area": "五环路以内道路（不含五环路）"
-            }
+            # 预编译的限行规则，O(1)查询
+            return query_traffic_restriction(location)
         except Exception as e:
             logger.error(f"获取限行信息失败: {e}")
             return {}
     
-    def format_briefing_message(self) -> str:
-        """格式化简报信息"""
-        # 获取所有信息
-        weather = self.get_weather_info()
-        life_index = self.get_life_index()
-        almanac = self.get_almanac()
-        traffic = self.get_traffic_restriction()
+    def collect_sections(self, locations: List[str]) -> Dict[str, Dict]:
+        """
+        获取各城市的全部板块，优先读取当天快照，只为缺失的城市并发请求上游
         
-        # 构建消息内容
-        message = f"""🌅 早安！今日信息简报 ({datetime.now().strftime('%Y-%m-%d %H:%M')})
-
-🌤️ 北京天气
-• 温度：{weather.get('temperature', 'N/A')}
-• 天气：{weather.get('weather', 'N/A')}
-• 湿度：{weather.get('humidity', 'N/A')}
-• 风力：{weather.get('wind', 'N/A')}
-
-📊 生活指数
-• 穿衣：{life_index.get('dressing', 'N/A')}
-• 紫外线：{life_index.get('uv', 'N/A')}
-• 洗车：{life_index.get('car_washing', 'N/A')}
-• 感冒：{life_index.get('cold', 'N/A')}
-• 运动：{life_index.get('sport', 'N/A')}
-• 空气质量：{life_index.get('air_quality', 'N/A')}
-
-📅 今日黄历
-• 日期：{almanac.get('date', 'N/A')}
-• 农历：{almanac.get('lunar', 'N/A')}
-• 宜：{almanac.get('suitable', 'N/A')}
-• 忌：{almanac.get('avoid', 'N/A')}
-• 生肖：{almanac.get('zodiac', 'N/A')}
-• 星宿：{almanac.get('star', 'N/A')}
-
-🚗 尾号限行
-• 日期：{traffic.get('date', 'N/A')} {traffic.get('weekday', 'N/A')}
-• 限行尾号：{'、'.join(map(str, traffic.get('restricted_numbers', []))) if traffic.get('restricted_numbers') else '不限行'}
-• 限行时间：{traffic.get('time', 'N/A')}
-• 限行区域：{traffic.get('area', 'N/A')}
-
-💡 温馨提示：注意天气变化，合理安排出行！"""
+        Args:
+            locations: 需要的地区代码列表
+            
+        Returns:
+            Dict[str, Dict]: 地区代码到板块数据（weather、life_index、almanac、traffic）的映射
+        """
+        today = date.today()
+        snapshots = {location: self.snapshot_store.load(location, today) or {} for location in locations}
+        missing = [location for location, snapshot in snapshots.items()
+                   if not all(is_usable(snapshot.get(name)) for name in ("weather", "life_index", "almanac"))]
+        
+        if missing:
+            # 天气按去重后的城市并发获取，每个城市单独计时，只有超时的城市使用最近一次数据；
+            # 黄历本地查表，全城市共享
+            cities = self.city_fetcher.fetch(missing, timeout=Config.SECTION_TIMEOUT,
+                                             budget=Config.BRIEFING_BUDGET)
+            almanac = self.get_almanac()
+            
+            for location in missing:
+                city = cities.get(location, {})
+                fresh = {
+                    "weather": city.get("weather", {}),
+                    "life_index": city.get("life_index", {}),
+                    "almanac": almanac,
+                    "traffic": self.get_traffic_restriction(location)
+                }
+                # 只用新获取的有效数据覆盖快照中的旧数据
+                merged = dict(snapshots[location])
+                merged.update({name: section for name, section in fresh.items()
+                               if is_usable(section) or name not in merged})
+                if any(is_usable(fresh[name]) for name in ("weather", "life_index", "almanac")):
+                    self.snapshot_store.save(location, merged, today)
+                snapshots[location] = merged
+        
+        return snapshots
+    
+    def build_briefing(self, location: Optional[str] = None, sections: Optional[Dict] = None) -> Briefing:
+        """
+        生成某城市的简报数据
         
-        return message
+        Args:
+            location: 地区代码，默认为配置中的地区
+            sections: 该城市已获取的板块数据，为None时现场获取
+        """
+        location = location or Config.WEATHER_LOCATION
+        if sections is None:
+            sections = self.collect_sections([location])[location]
+        if not sections.get("traffic"):
+            sections = dict(sections, traffic=self.get_traffic_restriction(location))
+        return Briefing(location, sections)
     
-    def send_to_wechat(self, message: str) -> bool:
-        """发送消息到微信公众号"""
+    def format_briefing_message(self, location: Optional[str] = None, sections: Optional[Dict] = None) -> str:
+        """
+        格式化简报信息
+        
+        Args:
+            location: 地区代码，默认为配置中的地区
+            sections: 该城市已获取的板块数据，为None时现场获取
+        """
+        return render("wechat", self.build_briefing(location, sections))
+    
+    def image_media_id(self, briefing: Briefing) -> Optional[str]:
+        """
+        图片版简报的临时素材ID（同一天内容相同的图片只上传一次）
+        
+        Returns:
+            Optional[str]: media_id，未开启图片版或上传失败时为None
+        """
+        if self.media_cache is None:
+            return None
+        sections = briefing.sections
+        image = ImageGenerator().generate_image_stream(
+            sections.get("weather") or {}, sections.get("life_index") or {},
+            sections.get("almanac") or {}, sections.get("traffic") or {}
+        )
+        try:
+            return self.media_cache.media_id(image, filename=f"briefing-{briefing.location}.jpg")
+        except WeChatAPIError as e:
+            logger.error(f"上传图片版简报失败，只发送文字: {e}")
+            return None
+    
+    def send_to_wechat(self, message: str, media_id: Optional[str] = None) -> bool:
+        """
+        发送消息到微信公众号
+        
+        Args:
+            message: 文字消息
+            media_id: 附带图片的临时素材ID（同一城市的所有消息共用）
+        """
         try:
             # 微信公众号模板消息发送（需要配置）
             # 这里使用模拟发送，实际需要集成微信公众平台API
             logger.info("模拟发送微信公众号消息:")
             logger.info(message)
+            if media_id:
+                logger.info(f"附带图片素材: {media_id}")
             
             # 实际实现需要：
             # 1. 获取access_token
@@ -181,21 +186,63 @@ class DailyBriefing:
             logger.error(f"发送微信公众号消息失败: {e}")
             return False
     
-    def daily_task(self):
-        """每日任务执行"""
+    def daily_task(self, paced: bool = True):
+        """
+        每日任务执行
+        
+        Args:
+            paced: 是否按发送窗口分散发送（启动时的测试执行不分散，立即全部发送）
+        """
         logger.info("开始执行每日信息简报任务")
         
         try:
-            # 格式化消息
-            message = self.format_briefing_message()
+            # 城市列表直接从订阅用户索引读取，没有订阅用户时只生成默认城市的简报
+            store = get_subscriber_store()
+            subscriber_locations = store.locations()
+            locations = subscriber_locations or [Config.WEATHER_LOCATION]
+            
+            # 所有城市的数据一次获取（优先读取当天快照）
+            sections = self.collect_sections(locations)
+            self.snapshot_store.prune()
+            
+            # 每个城市只生成一次共享正文和图片，按需创建
+            briefings: Dict[str, Briefing] = {}
+            media_ids: Dict[str, Optional[str]] = {}
+            
+            def city_briefing(location: str) -> Briefing:
+                if location not in briefings:
+                    briefings[location] = self.build_briefing(location, sections.get(location))
+                    # 图片在本城市的所有消息间复用
+                    media_ids[location] = self.image_media_id(briefings[location])
+                return briefings[location]
+            
+            # 逐个读取订阅用户（本进程的分片）并发送，不先载入全部用户；每位用户只拼接个人字段。
+            # 按哈希桶顺序读取，每位用户等到自己在发送窗口中的固定时刻再发送（未启用窗口时立即发送）
+            sent = Counter()
+            total = Counter()
+            window = self.delivery_window
+            if paced:
+                window.open()
+            for member in store.iter_subscribers(shard=self.shard or (0, 1)):
+                if paced and not window.wait_for(member.openid):
+                    logger.warning("发送窗口已取消，停止发送剩余用户")
+                    break
+                briefing = city_briefing(member.location)
+                total[member.location] += 1
+                if self.send_to_wechat(render_for("wechat", briefing, member), media_ids[member.location]):
+                    sent[member.location] += 1
             
-            # 发送到微信公众号
-            success = self.send_to_wechat(message)
+            if not subscriber_locations:
+                location = locations[0]
+                total[location] += 1
+                if self.send_to_wechat(render("wechat", city_briefing(location)), media_ids[location]):
+                    sent[location] += 1
             
-            if success:
-                logger.info("每日信息简报发送成功")
-            else:
-                logger.error("每日信息简报发送失败")
+            for location, count in total.items():
+                if sent[location]:
+                    logger.info(f"{city_name(location)}每日信息简报发送成功（{sent[location]}/{count}）")
+                else:
+                    logger.error(f"{city_name(location)}每日信息简报发送失败")
                 
         except Exception as e:
             logger.error(f"每日任务执行失败: {e}")
@@ -205,15 +252,15 @@ class DailyBriefing:
         logger.info("启动每日信息简报定时任务")
         
         # 每天上午9点执行
-        schedule.every().day.at("09:00").do(self.daily_task)
+        scheduler = BriefingScheduler()
+        scheduler.add_daily(self.daily_task, Config.SCHEDULE_TIME, "每日信息简报")
+        scheduler.on_shutdown(self.delivery_window.cancel)
         
-        # 立即执行一次（测试用）
-        self.daily_task()
+        # 启动后在调度器内立即执行一次（测试用，不分散发送），不推迟当天的定时任务
+        scheduler.add_once(self.daily_task, "每日信息简报（启动测试）", paced=False)
         
-        # 保持调度运行
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # 每分钟检查一次
+        # 睡眠到下次触发时刻，收到退出信号时立即返回
+        scheduler.run()
 
 def main():
     """主函数"""
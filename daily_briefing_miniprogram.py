@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+小程序版每日信息简报系统
+功能：按城市获取简报数据，通过订阅消息批量发送器推送给所有订阅用户
+"""
+
+import logging
+from datetime import date
+from typing import Dict, Iterator, List
+
+from briefing_scheduler import BriefingScheduler
+from briefing_templates import Briefing, miniprogram_data
+from bulk_sender import SubscribeMessageSender
+from config import Config
+from daily_briefing import DailyBriefing
+from delivery_outbox import FAILED, SENT, DeliveryOutbox, OutboxRecorder
+from delivery_window import DeliveryWindow
+from miniprogram_config import MiniProgramConfig
+from subscriber_status import SubscriberStatusStore
+from subscriber_store import bucket_of, configured_shard, get_subscriber_store
+from subscribers import Subscriber
+from wechat_token import get_token_manager
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class MiniProgramBriefing:
+    # 发件箱中的渠道名称
+    CHANNEL = "miniprogram"
+
+    def __init__(self, config: MiniProgramConfig):
+        self.config = config
+        self.manager = get_token_manager(config.MINI_PROGRAM_APP_ID, config.MINI_PROGRAM_APP_SECRET)
+        self.sender = SubscribeMessageSender(
+            self.manager,
+            config.MINI_PROGRAM_TEMPLATE_ID,
+            send_url=config.SUBSCRIBE_MESSAGE_URL
+        )
+        # 复用公众号版本的数据获取逻辑（多城市并发、当天快照）
+        self.collector = DailyBriefing({})
+        self.outbox = DeliveryOutbox()
+        self.status = SubscriberStatusStore()
+        self.subscribers = get_subscriber_store()
+        # 分片运行时每个进程只处理自己的分片，发件箱按分片使用独立的渠道名，互不领取、互不恢复
+        self.shard = configured_shard()
+        self.channel = self.CHANNEL if self.shard is None else f"{self.CHANNEL}#{self.shard[0]}/{self.shard[1]}"
+        # 分时发送：本进程的用户按openid哈希分散到整个发送窗口，每位用户每天在相同时刻收到
+        self.delivery_window = DeliveryWindow(Config.SCHEDULE_TIME, Config.DELIVERY_WINDOW_MINUTES, self.shard)
+
+    def build_city_data(self) -> Dict[str, Dict]:
+        """
+        为订阅用户涉及的每个城市生成一次订阅消息数据
+
+        Returns:
+            Dict[str, Dict]: 地区代码到订阅消息 data 字段的映射
+        """
+        # 地区代码直接从索引读取，不遍历用户
+        locations = self.subscribers.locations()
+        sections = self.collector.collect_sections(locations)
+        return {location: miniprogram_data(Briefing(location, sections[location]))
+                for location in locations}
+
+    def dispatch(self, day: date, recipients: Iterator[Subscriber], paced: bool = True) -> Iterator[Subscriber]:
+        """
+        逐批放行接收者，每批发出前在一个事务中标记为发送中
+
+        发送时刻相近的接收者（最多同时在途的请求数）组成一批：启用发送窗口时，每批等到第一位接收者的时刻，
+        之后 DELIVERY_BATCH_SLACK 秒内到时刻的接收者一并放行（接收者需按哈希桶顺序排列）。
+        """
+        window = self.delivery_window
+        if paced:
+            window.open()
+        batch = []
+
+        def begin() -> List[Subscriber]:
+            marked = self.outbox.begin(day, self.channel, batch)
+            batch.clear()
+            return marked
+
+        for subscriber in recipients:
+            remaining = window.remaining(bucket_of(subscriber.openid)) if paced else 0.0
+            if batch and (len(batch) >= self.sender.max_in_flight or remaining > Config.DELIVERY_BATCH_SLACK):
+                yield from begin()
+            if paced and not batch and not window.wait_for(subscriber.openid):
+                logger.warning("发送窗口已取消，剩余用户保留在发件箱中，下次运行时继续发送")
+                return
+            batch.append(subscriber)
+        if batch:
+            yield from begin()
+
+    def daily_task(self, paced: bool = True):
+        """
+        每日任务
+
+        Args:
+            paced: 是否按发送窗口分散发送（启动时的测试执行不分散，立即全部发送）
+        """
+        logger.info("开始执行小程序版每日信息简报")
+
+        try:
+            city_data = self.build_city_data()
+
+            if not city_data:
+                logger.warning("没有找到需要发送消息的用户")
+                return
+
+            def data_for(subscriber: Subscriber) -> Dict:
+                # 同城用户共用同一份消息数据
+                return city_data[subscriber.location]
+
+            # 逐行读取可达的订阅用户写入发件箱（已有记录保持原状态），再只领取待发送的记录
+            today = date.today()
+            subscribers = self.subscribers.iter_subscribers(shard=self.shard)
+            added = self.outbox.enqueue(today, self.channel, self.status.filter_reachable(subscribers))
+            self.outbox.recover(today, self.channel)
+            logger.info(f"发件箱新增 {added} 条投递记录，当前状态: {self.outbox.counts(today, self.channel)}")
+
+            # 发送结果写入发件箱的同时更新用户状态
+            with OutboxRecorder(self.outbox, today, self.channel, on_flush=self.status.apply) as recorder:
+                # 发件箱按哈希桶顺序领取，每位用户等到发送窗口中自己的时刻再发出；
+                # 每批消息发出前才标记为发送中，中途退出时只有在途的一批结果未知；结果逐批写入发件箱，不在内存中保留
+                recipients = self.dispatch(today, self.outbox.claim(today, self.channel), paced)
+                self.sender.send_all(recipients, data_for, recorder.record, collect=False)
+            counts = self.outbox.counts(today, self.channel)
+            self.outbox.prune()
+
+            logger.info(f"消息发送完成: 成功{counts.get(SENT, 0)}个，失败{counts.get(FAILED, 0)}个")
+
+        except Exception as e:
+            logger.error(f"每日任务执行失败: {e}")
+
+    def run_scheduler(self):
+        """启动定时任务"""
+        logger.info("启动小程序版每日信息简报定时任务")
+
+        # 每天上午9点执行
+        scheduler = BriefingScheduler()
+        scheduler.add_daily(self.daily_task, Config.SCHEDULE_TIME, "小程序每日信息简报")
+        scheduler.on_shutdown(self.delivery_window.cancel)
+
+        # 启动后在调度器内立即执行一次测试（不分散发送），不推迟当天的定时任务
+        scheduler.add_once(self.daily_task, "小程序每日信息简报（启动测试）", paced=False)
+
+        # 睡眠到下次触发时刻，收到退出信号时立即返回
+        scheduler.run()
+
+def main():
+    """主函数"""
+    config = MiniProgramConfig()
+    briefing_system = MiniProgramBriefing(config)
+    briefing_system.run_scheduler()
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,16 @@
 用于开发和测试阶段
 """
 
-import requests
 import json
-import schedule
-import time
 from datetime import datetime
 import logging
 from miniprogram_config import MiniProgramConfig
+from almanac_table import lookup_almanac
+from briefing_templates import Briefing, miniprogram_data, render
+from traffic_rules import query_traffic_restriction
+from config import Config
+from snapshot_store import SnapshotStore
+from wechat_token import WeChatAPIError, get_token_manager
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -19,6 +22,16 @@ logger = logging.getLogger(__name__)
 class NoInterfaceBriefing:
     def __init__(self, config: MiniProgramConfig):
         self.config = config
+        
+        self.snapshot_store = SnapshotStore()
+        
+        # 各板块数据源（优先读取正式任务写入的当天快照，缺失时使用模拟数据）
+        self.providers = {
+            "weather": self.get_weather_info,
+            "life_index": self.get_life_index,
+            "almanac": self.get_almanac,
+            "traffic": self.get_traffic_restriction
+        }
     
     def get_weather_info(self) -> dict:
         """获取北京天气信息"""
@@ -43,90 +56,47 @@ class NoInterfaceBriefing:
     
     def get_almanac(self) -> dict:
         """获取今日黄历"""
-        today = datetime.now()
-        return {
-            "date": today.strftime("%Y年%m月%d日"),
-            "lunar": "农历腊月廿三",
-            "suitable": "祭祀、祈福、求嗣、开光、出行",
-            "avoid": "破土、安葬、作灶",
-            "zodiac": "龙",
-            "star": "心宿"
-        }
+        # 本地查表，无需联网
+        return lookup_almanac()
     
     def get_traffic_restriction(self) -> dict:
         """获取尾号限行信息"""
-        today = datetime.now()
-        weekday = today.weekday()
-        
-        restriction_rules = {
-            0: [1, 6], 1: [2, 7], 2: [3, 8], 3: [4, 9], 4: [5, 0], 5: [], 6: []
-        }
-        
-        restricted_numbers = restriction_rules.get(weekday, [])
-        
-        return {
-            "date": today.strftime("%Y年%m月%d日"),
-            "weekday": ["周一", "周二", "周三", "周四", "周五", "周六", "周日"][weekday],
-            "restricted_numbers": restricted_numbers,
-            "time": "7:00-20:00",
-            "area": "五环路以内道路（不含五环路）"
-        }
+        # 预编译的限行规则，O(1)查询
+        return query_traffic_restriction()
     
     def format_message(self) -> dict:
         """格式化消息"""
-        weather = self.get_weather_info()
-        life_index = self.get_life_index()
-        almanac = self.get_almanac()
-        traffic = self.get_traffic_restriction()
+        # 测试系统只读快照，不把模拟数据写回
+        sections = self.snapshot_store.load_or_assemble(Config.WEATHER_LOCATION, self.providers, persist=False)
+        briefing = Briefing(Config.WEATHER_LOCATION, sections)
         
-        return {
-            "标题": "🌅 早安！今日信息简报",
-            "日期": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "天气": f"🌤️ 北京天气：{weather['temperature']} {weather['weather']}，湿度{weather['humidity']}，{weather['wind']}",
-            "生活指数": f"📊 生活指数：穿衣{life_index['dressing']}，紫外线{life_index['uv']}，空气质量{life_index['air_quality']}",
-            "今日黄历": f"📅 今日黄历：{almanac['lunar']}，宜{almanac['suitable'][:10]}...",
-            "尾号限行": f"🚗 尾号限行：{traffic['weekday']}限行{', '.join(map(str, traffic['restricted_numbers'])) if traffic['restricted_numbers'] else '不限行'}",
-            "格式化数据": {
-                "thing1": {"value": "每日信息简报"},
-                "date2": {"value": datetime.now().strftime("%Y年%m月%d日")},
-                "thing3": {"value": f"{weather['weather']} {weather['temperature']}"},
-                "thing4": {"value": f"限行:{', '.join(map(str, traffic['restricted_numbers'])) if traffic['restricted_numbers'] else '不限行'}"},
-                "thing5": {"value": almanac['suitable'][:10] + "..."},
-                "thing6": {"value": f"穿衣:{life_index['dressing']}"}
-            }
-        }
+        message = dict(render("preview", briefing))
+        message["格式化数据"] = miniprogram_data(briefing)
+        return message
     
     def test_api_connection(self):
         """测试API连接（不依赖接口验证）"""
         print("🧪 测试API连接（绕过接口验证）")
         print("=" * 50)
         
-        # 测试Access Token获取
-        url = f"{self.config.ACCESS_TOKEN_URL}?grant_type=client_credential&appid={self.config.MINI_PROGRAM_APP_ID}&secret={self.config.MINI_PROGRAM_APP_SECRET}"
-        
+        # 测试Access Token获取（与其他工具和进程共用缓存的令牌）
         try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                if 'access_token' in data:
-                    print("✅ Access Token获取成功")
-                    print(f"   Token: {data['access_token'][:20]}...")
-                    
-                    # 测试消息格式化
-                    message = self.format_message()
-                    print("✅ 消息格式化成功")
-                    print("   消息预览:")
-                    print(f"   标题: {message['标题']}")
-                    print(f"   天气: {message['天气']}")
-                    print(f"   限行: {message['尾号限行']}")
-                    
-                    return True
-                else:
-                    print("❌ Access Token获取失败")
-                    print(f"   错误: {data}")
-            else:
-                print(f"❌ HTTP请求失败: {response.status_code}")
-                
+            token = get_token_manager(self.config.MINI_PROGRAM_APP_ID, self.config.MINI_PROGRAM_APP_SECRET).get_token()
+            print("✅ Access Token获取成功")
+            print(f"   Token: {token[:20]}...")
+            
+            # 测试消息格式化
+            message = self.format_message()
+            print("✅ 消息格式化成功")
+            print("   消息预览:")
+            print(f"   标题: {message['标题']}")
+            print(f"   天气: {message['天气']}")
+            print(f"   限行: {message['尾号限行']}")
+            
+            return True
+        except WeChatAPIError as e:
+            print("❌ Access Token获取失败")
+            print(f"   错误: {e}")
         except Exception as e:
             print(f"❌ 请求异常: {e}")
         
@@ -5,11 +5,20 @@ Rocket版每日信息简报系统
 功能：获取北京天气、生活指数、黄历、限行信息，通过Rocket推送给用户
 """
 
-import schedule
-import time
 from datetime import datetime
 import logging
 from rocket_push import RocketPush, RocketConfig
+from almanac_table import lookup_almanac
+from constellation import reading_for
+from traffic_rules import query_traffic_restriction
+from briefing_scheduler import BriefingScheduler
+from briefing_templates import Briefing, render
+from circuit_breaker import get_provider_guard
+from image_generator import ImageGenerator
+from config import Config
+from delivery_window import DeliveryWindow
+from snapshot_store import SnapshotStore
+from weather_client import QWeatherClient
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -25,78 +34,52 @@ class RocketBriefing:
             user_id=RocketConfig.ROCKET_USER_ID,
             channel=RocketConfig.ROCKET_CHANNEL
         )
+        
+        self.weather_client = QWeatherClient()
+        self.guard = get_provider_guard()
+        self.snapshot_store = SnapshotStore()
+        # 分时发送：各房间按房间名哈希分散到发送窗口内
+        self.delivery_window = DeliveryWindow(Config.ROCKET_SCHEDULE_TIME, Config.ROCKET_DELIVERY_WINDOW_MINUTES)
+        
+        # 各板块数据源（优先读取当天快照，缺失的板块并发获取）
+        self.providers = {
+            "weather": self.get_weather_info,
+            "life_index": self.get_life_index,
+            "almanac": self.get_almanac,
+            "traffic": self.get_traffic_restriction,
+            "constellation": self.get_constellation,
+            "i_ching": self.get_i_ching
+        }
     
     def get_weather_info(self):
-        """获取北京天气信息"""
-        # 模拟天气数据，实际项目中应调用天气API
-        return {
-            "temperature": "8℃",
-            "weather": "晴",
-            "humidity": "45%",
-            "wind": "北风3级",
-            "update_time": datetime.now().strftime("%H:%M")
-        }
+        """获取北京天气信息，失败或熔断时为带数据时间的最近一次真实数据"""
+        location = Config.WEATHER_LOCATION
+        return self.guard.fetch("weather", location, lambda: self.weather_client.get_now(location))
     
     def get_life_index(self):
-        """获取生活指数"""
-        # 模拟生活指数数据
-        return {
-            "dressing": "较舒适",
-            "uv": "中等",
-            "car_washing": "适宜",
-            "cold": "少发",
-            "sport": "适宜",
-            "air_quality": "良"
-        }
+        """获取生活指数，失败或熔断时为带数据时间的最近一次真实数据"""
+        location = Config.WEATHER_LOCATION
+        return self.guard.fetch("life_index", location, lambda: self.weather_client.get_indices(location))
     
     def get_almanac(self):
         """获取今日黄历"""
-        # 模拟黄历数据
-        today = datetime.now()
-        return {
-            "date": today.strftime("%Y年%m月%d日"),
-            "lunar": "农历腊月廿三",
-            "suitable": "祭祀、祈福、求嗣、开光、出行",
-            "avoid": "破土、安葬、作灶",
-            "zodiac": "龙",
-            "star": "心宿"
-        }
+        # 本地查表，无需联网
+        return lookup_almanac()
     
     def get_traffic_restriction(self):
         """获取尾号限行信息"""
-        # 模拟限行数据
-        today = datetime.now()
-        weekday = today.weekday()
-        
-        restriction_rules = {
-            0: [1, 6], 1: [2, 7], 2: [3, 8], 3: [4, 9], 4: [5, 0], 5: [], 6: []
-        }
-        
-        restricted_numbers = restriction_rules.get(weekday, [])
-        
-        return {
-            "date": today.strftime("%Y年%m月%d日"),
-            "weekday": ["周一", "周二", "周三", "周四", "周五", "周六", "周日"][weekday],
-            "restricted_numbers": restricted_numbers,
-            "time": "7:00-20:00",
-            "area": "五环路以内道路（不含五环路）"
-        }
+        # 预编译的限行规则，O(1)查询
+        return query_traffic_restriction()
     
-    def get_constellation(self):
-        """获取星座运势"""
-        # 模拟星座运势数据
-        constellations = ["白羊座", "金牛座", "双子座", "巨蟹座", "狮子座", "处女座", "天秤座", "天蝎座", "射手座", "摩羯座", "水瓶座", "双鱼座"]
-        today = datetime.now()
-        index = today.day % 12
-        return {
-            "constellation": constellations[index],
-            "overall": "⭐⭐⭐⭐",
-            "love": "⭐⭐⭐",
-            "career": "⭐⭐⭐⭐",
-            "wealth": "⭐⭐⭐⭐",
-            "health": "⭐⭐⭐",
-            "advice": "今日运势不错，适合开展新计划，注意保持良好的人际关系。"
-        }
+    def get_constellation(self, sign=None):
+        """
+        获取星座运势
+        
+        Args:
+            sign: 星座下标，为None时返回当日轮值星座（频道广播用）
+        """
+        # 12个星座的运势每天只计算一次，按星座查表
+        return reading_for(sign)
     
     def get_i_ching(self):
         """获取易经内容"""
@@ -112,29 +95,62 @@ class RocketBriefing:
             "lucky_color": ["红色", "金色", "紫色"][today.day % 3]
         }
     
-    def daily_task(self):
-        """每日任务"""
+    def broadcast(self, message, paced=True):
+        """
+        推送到所有配置的房间
+        
+        Args:
+            message: 消息内容
+            paced: 是否按发送窗口分散发送，为False时立即全部发送
+        
+        Returns:
+            Dict[str, RoomResult]: 房间名称到发送结果的映射
+        """
+        window = self.delivery_window
+        if not (paced and window.enabled):
+            return self.rocket.broadcast(message)
+        
+        window.open()
+        results = {}
+        rooms = sorted(dict.fromkeys(RocketConfig.ROCKET_BROADCAST_ROOMS), key=window.offset_of)
+        for room in rooms:
+            if not window.wait_for(room):
+                logger.warning("发送窗口已取消，停止发送剩余房间")
+                break
+            results.update(self.rocket.broadcast(message, [room]))
+        return results
+    
+    def daily_task(self, paced=True):
+        """
+        每日任务
+        
+        Args:
+            paced: 是否按发送窗口分散发送（启动时的测试执行不分散，立即全部发送）
+        """
         logger.info("开始执行Rocket版每日信息简报任务")
         
         try:
-            # 获取各种信息
-            weather = self.get_weather_info()
-            life_index = self.get_life_index()
-            almanac = self.get_almanac()
-            traffic = self.get_traffic_restriction()
-            constellation = self.get_constellation()
-            i_ching = self.get_i_ching()
+            # 读取当天快照，只并发获取缺失的信息
+            sections = self.snapshot_store.load_or_assemble(Config.WEATHER_LOCATION, self.providers)
             
             # 格式化消息
-            message = self.rocket.format_message(weather, life_index, almanac, traffic, constellation, i_ching)
+            message = render("rocket", Briefing(Config.WEATHER_LOCATION, sections))
             
-            # 发送消息到Rocket
-            success = self.rocket.send_message(message)
+            # 并发推送到所有配置的房间（启用发送窗口时各房间在各自的固定时刻发送）
+            results = self.broadcast(message, paced)
             
-            if success:
+            if results and all(result.ok for result in results.values()):
                 logger.info("Rocket每日信息简报发送成功")
             else:
-                logger.error("Rocket每日信息简报发送失败")
+                logger.error("Rocket每日信息简报部分或全部房间发送失败")
+            
+            if RocketConfig.ROCKET_SEND_IMAGE:
+                # 图片版只上传一次，其余房间引用同一个文件
+                image = ImageGenerator().generate_image_stream(
+                    sections["weather"], sections["life_index"], sections["almanac"],
+                    sections["traffic"], sections["constellation"], sections["i_ching"]
+                )
+                self.rocket.broadcast_image(image, filename=f"briefing-{datetime.now():%Y%m%d}.jpg")
                 
         except Exception as e:
             logger.error(f"每日任务执行异常: {e}")
@@ -144,19 +160,15 @@ class RocketBriefing:
         logger.info("启动Rocket版每日信息简报定时任务")
         
         # 设置定时任务（每天上午8点执行）
-        schedule.every().day.at("08:00").do(self.daily_task)
-        logger.info("定时任务已设置: 每天 08:00 执行")
-        
-        # 立即执行一次测试任务
-        logger.info("立即执行一次测试任务...")
-        self.daily_task()
+        scheduler = BriefingScheduler()
+        scheduler.add_daily(self.daily_task, Config.ROCKET_SCHEDULE_TIME, "Rocket每日信息简报")
+        scheduler.on_shutdown(self.delivery_window.cancel)
         
-        # 启动调度器
-        logger.info("定时任务调度器已启动，等待执行...")
+        # 启动后在调度器内立即执行一次测试任务（不分散发送），不推迟当天的定时任务
+        scheduler.add_once(self.daily_task, "Rocket每日信息简报（启动测试）", paced=False)
         
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+        # 启动调度器（睡眠到下次触发时刻，收到退出信号时立即返回）
+        scheduler.run()
 
 def main():
     """主函数"""
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投递发件箱
+功能：用SQLite（WAL模式）为每个 (日期, 接收者, 渠道) 记录一行投递状态，状态变更批量写入；
+      进程中途退出后重新运行时从中断处继续，已完成的行不再扫描，也不会重复发送
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import logging
+from contextlib import closing
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bulk_sender import SendResult
+from config import Config
+from subscriber_store import bucket_of
+from subscribers import Subscriber
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 投递状态
+PENDING = "pending"    # 待发送
+SENDING = "sending"    # 请求已发出，等待结果
+SENT = "sent"          # 发送成功
+FAILED = "failed"      # 发送失败
+UNKNOWN = "unknown"    # 请求发出后进程退出，结果未知（不重发，避免重复）
+
+
+class DeliveryOutbox:
+    """按 (日期, openid, 渠道) 记录的投递发件箱"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化发件箱
+
+        Args:
+            path: SQLite数据库文件路径，默认在数据目录下
+        """
+        self.path = path or os.path.join(Config.DATA_DIR, Config.OUTBOX_DB)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    day TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    openid TEXT NOT NULL,
+                    location TEXT,
+                    bucket INTEGER NOT NULL DEFAULT 0,
+                    state TEXT NOT NULL,
+                    errcode INTEGER,
+                    errmsg TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (day, channel, openid)
+                )
+            """)
+            self._add_buckets(conn)
+            # 按状态领取待发送行时直接定位，不扫描已完成的行；按openid哈希桶顺序领取，与发送窗口中的时刻一致
+            conn.execute("DROP INDEX IF EXISTS idx_outbox_state")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_claim ON outbox (day, channel, state, bucket, openid)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _add_buckets(conn: sqlite3.Connection):
+        """旧版发件箱没有哈希桶列时补上并回填"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+        if "bucket" in columns:
+            return
+        conn.execute("ALTER TABLE outbox ADD COLUMN bucket INTEGER NOT NULL DEFAULT 0")
+        conn.create_function("openid_bucket", 1, bucket_of, deterministic=True)
+        conn.execute("UPDATE outbox SET bucket = openid_bucket(openid)")
+
+    def enqueue(self, day: date, channel: str, subscribers: Iterable[Subscriber],
+                batch_size: Optional[int] = None) -> int:
+        """
+        为当天的接收者建立投递记录，已存在的记录保持原状态
+
+        Args:
+            day: 投递日期
+            channel: 渠道名称
+            subscribers: 接收者（可以是生成器）
+            batch_size: 每批写入的行数
+
+        Returns:
+            int: 新增的记录数
+        """
+        batch_size = batch_size or Config.OUTBOX_BATCH_SIZE
+        day_key = day.isoformat()
+        added = 0
+        batch: List[Tuple] = []
+        with closing(self._connect()) as conn:
+            def flush():
+                nonlocal added
+                with conn:
+                    before = conn.total_changes
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO outbox (day, channel, openid, location, bucket, state, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)", batch
+                    )
+                    added += conn.total_changes - before
+                batch.clear()
+
+            now = time.time()
+            for subscriber in subscribers:
+                batch.append((day_key, channel, subscriber.openid, subscriber.location,
+                              bucket_of(subscriber.openid), PENDING, now))
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+        return added
+
+    def recover(self, day: date, channel: str) -> int:
+        """
+        把上次运行中已开始发送但没有写回结果的行标记为结果未知
+
+        只有发出请求前才标记为发送中，这些行的请求可能已经发出，为避免重复发送不再重发；
+        领取后尚未发出的行仍是待发送，本次运行会正常发送。
+
+        Returns:
+            int: 标记的行数
+        """
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "UPDATE outbox SET state = ?, updated_at = ? WHERE day = ? AND channel = ? AND state = ?",
+                (UNKNOWN, time.time(), day.isoformat(), channel, SENDING)
+            )
+        if cursor.rowcount:
+            logger.warning(f"{day} {channel} 有 {cursor.rowcount} 条投递在上次运行中断时结果未知，不再重发")
+        return cursor.rowcount
+
+    def claim(self, day: date, channel: str, batch_size: Optional[int] = None) -> Iterator[Subscriber]:
+        """
+        逐批读取待发送的接收者（按openid哈希桶顺序，即发送窗口中的先后顺序）
+
+        读取时不改变状态，发送前由 begin 按小批标记为发送中，进程中途退出时未发出的行仍是待发送。
+
+        Yields:
+            Subscriber: 待发送的接收者（只含 openid 和地区代码）
+        """
+        batch_size = batch_size or Config.OUTBOX_BATCH_SIZE
+        day_key = day.isoformat()
+        last = (-1, "")
+        while True:
+            # 按索引续读，每批一个短查询，不长时间占用读事务
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    "SELECT bucket, openid, location FROM outbox WHERE day = ? AND channel = ? AND state = ? "
+                    "AND (bucket, openid) > (?, ?) ORDER BY bucket, openid LIMIT ?",
+                    (day_key, channel, PENDING, *last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][:2]
+            for _, openid, location in rows:
+                yield Subscriber(openid, location)
+
+    def begin(self, day: date, channel: str, subscribers: List[Subscriber]) -> List[Subscriber]:
+        """
+        发出请求前把即将发送的一小批行标记为发送中（一个事务）
+
+        Returns:
+            List[Subscriber]: 仍为待发送、已标记的接收者（其余的不应发送）
+        """
+        day_key = day.isoformat()
+        now = time.time()
+        marked = []
+        with closing(self._connect()) as conn, conn:
+            for subscriber in subscribers:
+                cursor = conn.execute(
+                    "UPDATE outbox SET state = ?, updated_at = ? "
+                    "WHERE day = ? AND channel = ? AND openid = ? AND state = ?",
+                    (SENDING, now, day_key, channel, subscriber.openid, PENDING)
+                )
+                if cursor.rowcount:
+                    marked.append(subscriber)
+        return marked
+
+    def mark(self, day: date, channel: str, results: Iterable[SendResult]):
+        """批量写入发送结果"""
+        day_key = day.isoformat()
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "UPDATE outbox SET state = ?, errcode = ?, errmsg = ?, updated_at = ? "
+                "WHERE day = ? AND channel = ? AND openid = ?",
+                [(SENT if result.ok else FAILED, result.errcode, result.errmsg, now, day_key, channel, result.openid)
+                 for result in results]
+            )
+
+    def counts(self, day: date, channel: str) -> Dict[str, int]:
+        """各状态的记录数"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT state, COUNT(*) FROM outbox WHERE day = ? AND channel = ? GROUP BY state",
+                (day.isoformat(), channel)
+            ).fetchall()
+        return dict(rows)
+
+    def prune(self, keep_days: Optional[int] = None):
+        """删除过期的投递记录"""
+        keep_days = keep_days if keep_days is not None else Config.OUTBOX_KEEP_DAYS
+        cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM outbox WHERE day < ?", (cutoff,))
+
+
+class OutboxRecorder:
+    """攒批写入发送结果，可作为批量发送器的结果回调（线程安全）"""
+
+    def __init__(self, outbox: DeliveryOutbox, day: date, channel: str, batch_size: Optional[int] = None,
+                 on_flush: Optional[Callable[[List[SendResult]], None]] = None):
+        """
+        Args:
+            outbox: 投递发件箱
+            day: 投递日期
+            channel: 渠道名称
+            batch_size: 每批写入的结果数
+            on_flush: 每批结果写入发件箱后的回调（如更新订阅用户状态）
+        """
+        self.outbox = outbox
+        self.day = day
+        self.channel = channel
+        self.batch_size = batch_size or Config.OUTBOX_BATCH_SIZE
+        self.on_flush = on_flush
+        self._pending: List[SendResult] = []
+        self._lock = threading.Lock()
+
+    def _write(self, batch: List[SendResult]):
+        """写入一批结果（调用方需持有锁）"""
+        self.outbox.mark(self.day, self.channel, batch)
+        if self.on_flush:
+            self.on_flush(batch)
+
+    def record(self, result: SendResult):
+        """记录一个发送结果，攒满一批时写入"""
+        with self._lock:
+            self._pending.append(result)
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+            self._write(batch)
+
+    def flush(self):
+        """写入剩余结果"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if batch:
+                self._write(batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分时发送窗口模块
+功能：把一次定时推送均匀分散到运营设定的时间窗口内，每个接收者按其openid（或房间名）的稳定哈希
+      落在窗口中的固定时刻，接口看到的是平稳的发送速率，用户每天在相同的时间收到消息
+"""
+
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from config import Config
+from subscriber_store import BUCKET_COUNT, bucket_of, shard_range
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class DeliveryWindow:
+    """分时发送窗口"""
+
+    def __init__(self, start: str, minutes: float, shard: Optional[Tuple[int, int]] = None):
+        """
+        初始化发送窗口
+
+        Args:
+            start: 窗口开始时间 "HH:MM"（与定时任务的触发时间一致）
+            minutes: 窗口时长（分钟），0 表示不分散、立即全部发送
+            shard: (分片下标, 分片数)，分片发送时本进程的用户也分散到整个窗口
+        """
+        self.start = start
+        self.duration = max(float(minutes), 0.0) * 60
+        # 哈希桶区间 [起, 止) 按比例映射到窗口内的偏移
+        self.span = shard_range(*shard) if shard else (0, BUCKET_COUNT)
+        self.anchor = time.time()
+        self._cancelled = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.duration > 0
+
+    def offset(self, bucket: int) -> float:
+        """哈希桶在窗口内的偏移（秒），桶在区间内均匀分布，偏移也就均匀分布"""
+        low, high = self.span
+        return (bucket - low) * self.duration / (high - low)
+
+    def offset_of(self, key: str) -> float:
+        """openid或房间名在窗口内的固定偏移（秒）"""
+        return self.offset(bucket_of(key))
+
+    def _scheduled_start(self, now: datetime) -> datetime:
+        hour, minute = (int(part) for part in self.start.split(':'))
+        return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+    def open(self):
+        """
+        开始一轮发送
+
+        在窗口内开始时（定时触发、错过后补执行）以当天的窗口开始时间为起点，已过时刻的用户立即补发；
+        在窗口外开始时（如启动时的测试执行）以当前时间为起点，同样分散到整个窗口时长。
+        """
+        now = datetime.now(ZoneInfo(Config.SCHEDULE_TIMEZONE)) if Config.SCHEDULE_TIMEZONE else datetime.now()
+        start = self._scheduled_start(now)
+        if start <= now < start + timedelta(seconds=self.duration):
+            self.anchor = start.timestamp()
+        else:
+            self.anchor = now.timestamp()
+        if self.enabled:
+            logger.info(f"分时发送窗口: {datetime.fromtimestamp(self.anchor):%H:%M:%S} 起 "
+                        f"{self.duration / 60:g} 分钟")
+
+    def remaining(self, bucket: int) -> float:
+        """距该哈希桶的发送时刻还有多少秒（已到或未启用窗口时不大于0）"""
+        if not self.enabled:
+            return 0.0
+        return self.anchor + self.offset(bucket) - time.time()
+
+    def wait(self, bucket: int) -> bool:
+        """
+        等待到该哈希桶的发送时刻（已过则立即返回）
+
+        Returns:
+            bool: False 表示窗口已取消（进程退出），应停止发送
+        """
+        delay = self.remaining(bucket)
+        if delay > 0:
+            return not self._cancelled.wait(delay)
+        return not self._cancelled.is_set()
+
+    def wait_for(self, key: str) -> bool:
+        """等待到openid或房间名的发送时刻"""
+        return self.wait(bucket_of(key))
+
+    def cancel(self):
+        """取消等待中的发送（收到退出信号时调用）"""
+        self._cancelled.set()
@@ -45,6 +45,20 @@ class ImageGenerator:
         Returns:
             bytes: 图片的字节数据
         """
+        return self.generate_image_stream(weather, life_index, almanac, traffic, constellation, i_ching).getvalue()
+    
+    def generate_image_stream(self, weather, life_index, almanac, traffic, constellation=None, i_ching=None,
+                              output=None):
+        """
+        生成每日信息简报图片并写入文件对象（上传时直接从中读取，不再复制一份字节数据）
+        
+        Args:
+            weather, life_index, almanac, traffic, constellation, i_ching: 同 generate_image
+            output: 可写的文件对象（如临时文件），默认为内存缓冲区
+            
+        Returns:
+            文件对象，已定位到开头
+        """
         # 创建图片
         image = Image.new('RGB', (self.width, self.height), self.bg_color)
         draw = ImageDraw.Draw(image)
@@ -133,12 +147,12 @@ class ImageGenerator:
         greeting = "愿您的每一天都充满阳光与希望，事业有成，家庭幸福！"
         draw.text((self.padding + 20, y_position), greeting, font=self.content_font, fill=self.text_color)
         
-        # 保存图片到内存
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=95)
-        buffer.seek(0)
+        # 保存图片到文件对象
+        output = output if output is not None else io.BytesIO()
+        image.save(output, format='JPEG', quality=95)
+        output.seek(0)
         
-        return buffer.getvalue()
+        return output
     
     def _draw_section(self, draw, title, y_position):
         """
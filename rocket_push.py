@@ -5,129 +5,621 @@ Rocket推送模块
 功能：将每日信息简报推送到Rocket的每日黄历频道
 """
 
+import os
+import time
+import uuid
+import threading
 import requests
-import json
 import logging
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as AckTimeout
+from typing import IO, Callable, Dict, Iterable, Optional
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from briefing_templates import Briefing, render
+from config import Config
+from rocket_realtime import RealtimeDisconnected, RealtimeError, RocketRealtime, realtime_url, websocket
+from ttl_cache import TTLCache
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 房间列表接口及返回中的列表字段（公开频道、私有群组）
+ROOM_LIST_ENDPOINTS = (("channels.list.joined", "channels"), ("groups.list", "groups"))
+ROOM_LIST_PAGE_SIZE = 100
+
+
+def is_room_not_found(error: Optional[str]) -> bool:
+    """接口错误是否表示房间不存在（房间被删除、改名或已退出）"""
+    error = (error or "").lower()
+    return "room-not-found" in error or "invalid-room" in error or "room not found" in error
+
+
+def is_duplicate_message(error: Optional[str]) -> bool:
+    """接口错误是否表示同一ID的消息已保存（确认超时后改走REST重发时，实时调用其实已经成功）"""
+    error = (error or "").lower()
+    return "e11000" in error or "duplicate key" in error or "already exists" in error or "already-exists" in error
+
+
+class RateLimitGate:
+    """按Rocket返回的限流响应头（X-RateLimit-Remaining / X-RateLimit-Reset）暂停请求，多线程共享"""
+
+    def __init__(self):
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """限额用完时等待到重置时刻"""
+        with self._lock:
+            delay = self._resume_at - time.time()
+        if delay > 0:
+            logger.info(f"Rocket接口限流，等待 {delay:.1f}s")
+            time.sleep(delay)
+
+    @staticmethod
+    def _reset_time(response: requests.Response) -> Optional[float]:
+        """限额重置时刻（Unix秒）"""
+        retry_after = response.headers.get("Retry-After")
+        reset = response.headers.get("X-RateLimit-Reset")
+        try:
+            if retry_after is not None:
+                return time.time() + float(retry_after)
+            if reset is None:
+                return None
+            reset = float(reset)
+        except ValueError:
+            return None
+        # Rocket返回毫秒时间戳，兼容秒级时间戳和相对秒数
+        if reset > 1e12:
+            return reset / 1000
+        return reset if reset > 1e9 else time.time() + reset
+
+    def update(self, response: requests.Response):
+        """根据响应头记录限额用完后的恢复时刻"""
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        if response.status_code != 429 and (remaining is None or remaining.strip() != "0"):
+            return
+        resume_at = self._reset_time(response) or time.time() + 1
+        with self._lock:
+            self._resume_at = max(self._resume_at, resume_at)
+
+
+class MultipartStream:
+    """
+    边读边生成的 multipart/form-data 请求体
+
+    文件内容按块从原文件对象读取，不会把整个文件再复制一份到内存；
+    提供长度，请求带 Content-Length 发送。
+    """
+
+    def __init__(self, field: str, fileobj: IO[bytes], filename: str, content_type: str,
+                 fields: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            field: 文件字段名
+            fileobj: 已定位到文件开头的可读文件对象（内存缓冲区或临时文件）
+            filename: 上传的文件名
+            content_type: 文件类型
+            fields: 附带的文本字段
+        """
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = []
+        for name, value in (fields or {}).items():
+            head.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n')
+        head.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                    f'filename="{quote(filename)}"\r\nContent-Type: {content_type}\r\n\r\n')
+        self._head = "".join(head).encode("utf-8")
+        self._tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        self._file = fileobj
+        self._start = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        self._file_size = fileobj.tell() - self._start
+        self._length = len(self._head) + self._file_size + len(self._tail)
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET):
+        """只支持回到开头（重试时重新发送）"""
+        if offset != 0 or whence != os.SEEK_SET:
+            raise ValueError("MultipartStream只支持seek(0)")
+        self._pos = 0
+        self._file.seek(self._start)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length - self._pos
+        file_end = len(self._head) + self._file_size
+        chunks = []
+        while size > 0 and self._pos < self._length:
+            if self._pos < len(self._head):
+                chunk = self._head[self._pos:self._pos + size]
+            elif self._pos < file_end:
+                chunk = self._file.read(min(size, file_end - self._pos))
+                if not chunk:
+                    raise IOError("上传文件在读取过程中被截断")
+            else:
+                offset = self._pos - file_end
+                chunk = self._tail[offset:offset + size]
+            chunks.append(chunk)
+            self._pos += len(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+
+class RoomResult:
+    """单个房间的推送结果"""
+
+    __slots__ = ("room", "ok", "message_id", "error", "file_url")
+
+    def __init__(self, room: str, ok: bool, message_id: Optional[str] = None, error: str = "",
+                 file_url: Optional[str] = None):
+        """
+        Args:
+            room: 房间名称（或房间ID）
+            ok: 是否发送成功
+            message_id: 成功时的消息ID
+            error: 失败原因
+            file_url: 上传文件时文件的访问地址
+        """
+        self.room = room
+        self.ok = ok
+        self.message_id = message_id
+        self.error = error
+        self.file_url = file_url
+
+    def __repr__(self):
+        return f"RoomResult({self.room!r}, {self.ok!r}, {self.message_id!r}, {self.error!r})"
+
+
 class RocketPush:
     """Rocket推送类"""
     
-    def __init__(self, token, user_id, channel="每日黄历"):
+    def __init__(self, token, user_id, channel="每日黄历", base_url=None, room_cache=None, max_workers=None,
+                 realtime=None):
         """
         初始化Rocket推送
         
         Args:
             token: Rocket个人访问令牌
             user_id: Rocket用户ID
-            channel: 推送频道名称
+            channel: 默认推送房间名称
+            base_url: Rocket API地址，默认为配置中的地址
+            room_cache: 房间名称到ID的缓存，默认使用数据目录下的磁盘缓存
+            max_workers: 多房间推送时的最大并发数
+            realtime: 实时会话（RocketRealtime），默认按配置决定是否启用
         """
         self.token = token
         self.user_id = user_id
-        self.channel = "mei3-ri4-huang2-li4"  # 实际频道名称
-        self.base_url = "https://chat.akria.net/api/v1"  # Rocket服务器地址
-    
-    def get_user_channels(self):
-        """获取用户的所有频道"""
-        headers = {
+        self.channel = channel
+        self.base_url = (base_url or RocketConfig.ROCKET_SERVER_URL).rstrip('/')
+        # 服务器根地址（文件访问地址相对于它）
+        self.server_url = self.base_url[:-len("/api/v1")] if self.base_url.endswith("/api/v1") else self.base_url
+        self.room_cache = room_cache or TTLCache(
+            os.path.join(Config.DATA_DIR, RocketConfig.ROCKET_ROOM_CACHE_FILE),
+            ttl=RocketConfig.ROCKET_ROOM_CACHE_TTL,
+            max_stale=RocketConfig.ROCKET_ROOM_CACHE_TTL
+        )
+        self._room_key = f"rooms:{self.base_url}:{self.user_id}"
+        # 房间列表刷新串行进行，等待期间别的线程刚刷新过就直接使用其结果；
+        # 刷新后仍找不到的名称短时间内不再触发刷新
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._refreshed_rooms: Dict[str, str] = {}
+        self._unknown_rooms: Dict[str, float] = {}
+        self.max_workers = max_workers or RocketConfig.ROCKET_MAX_WORKERS
+        self.rate_limit = RateLimitGate()
+        
+        # 可选的实时会话：文字消息优先走已登录的WebSocket，断开时回退REST
+        if realtime is None and RocketConfig.ROCKET_REALTIME and websocket is not None:
+            realtime = RocketRealtime(realtime_url(self.server_url), token, RocketConfig.ROCKET_ACK_TIMEOUT)
+        elif realtime is None and RocketConfig.ROCKET_REALTIME:
+            logger.warning("未安装 websocket-client，Rocket实时推送不可用，使用REST接口")
+        self.realtime = realtime
+        self._realtime_lock = threading.Lock()
+        self._realtime_retry_at = 0.0
+        
+        # 所有请求共用一个保持连接的会话，连接池容纳全部并发请求
+        self.session = requests.Session()
+        self.session.headers.update({
             "X-Auth-Token": self.token,
-            "X-User-Id": self.user_id,
-            "Content-Type": "application/json"
-        }
+            "X-User-Id": self.user_id
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def _request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """
+        调用Rocket接口，遵守限流响应头；被限流（429）时等待重置后重试
         
-        try:
-            # 获取用户加入的channels
-            response = requests.get(f"{self.base_url}/channels.list.joined", 
-                                  headers=headers, 
-                                  timeout=10)
+        Raises:
+            requests.RequestException: 网络异常
+        """
+        kwargs.setdefault("timeout", 10)
+        body = kwargs.get("data")
+        for attempt in range(RocketConfig.ROCKET_RATE_LIMIT_RETRIES + 1):
+            if hasattr(body, "seek"):
+                # 流式请求体重试前回到开头
+                body.seek(0)
+            self.rate_limit.wait()
+            response = self.session.request(method, f"{self.base_url}/{endpoint}", **kwargs)
+            self.rate_limit.update(response)
+            if response.status_code != 429:
+                break
+            logger.warning(f"Rocket接口 {endpoint} 被限流（第{attempt + 1}次）")
+        return response
+    
+    def _list_rooms(self) -> Dict[str, str]:
+        """
+        分页读取用户加入的所有频道和群组
+        
+        Returns:
+            Dict[str, str]: 房间名称到房间ID的映射
             
-            if response.status_code == 200:
+        Raises:
+            requests.RequestException: 网络异常或接口返回失败
+        """
+        rooms = {}
+        for endpoint, field in ROOM_LIST_ENDPOINTS:
+            offset = 0
+            while True:
+                response = self._request("GET", endpoint,
+                                         params={"offset": offset, "count": ROOM_LIST_PAGE_SIZE})
+                response.raise_for_status()
                 data = response.json()
-                if data.get("success"):
-                    channels = data.get("channels", [])
-                    print("\n📋 用户加入的Channels:")
-                    for channel in channels:
-                        print(f"  - {channel.get('name')} (ID: {channel.get('_id')})")
+                page = data.get(field, [])
+                for room in page:
+                    rooms[room.get("name")] = room.get("_id")
+                offset += len(page)
+                if not page or offset >= data.get("total", 0):
+                    break
+        logger.info(f"已读取 {len(rooms)} 个Rocket房间")
+        return rooms
+    
+    def get_rooms(self, refresh: bool = False) -> Dict[str, str]:
+        """
+        房间名称到ID的映射，优先读取磁盘缓存
+        
+        Args:
+            refresh: 是否重新从服务器读取（房间不存在时使用）
+        """
+        if not refresh:
+            return self.room_cache.get_or_fetch(self._room_key, self._list_rooms)
+        requested_at = time.monotonic()
+        with self._refresh_lock:
+            if self._refreshed_at >= requested_at:
+                # 等待期间其他线程已经刷新过
+                return self._refreshed_rooms
+            rooms = self._list_rooms()
+            self.room_cache.set(self._room_key, rooms)
+            self._refreshed_rooms = rooms
+            self._refreshed_at = time.monotonic()
+            return rooms
+    
+    def get_user_channels(self):
+        """打印用户加入的所有频道和群组（从缓存读取）"""
+        try:
+            rooms = self.get_rooms()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"获取用户频道列表异常: {e}")
+            return
+        print("\n📋 用户加入的房间:")
+        for name, room_id in rooms.items():
+            print(f"  - {name} (ID: {room_id})")
+        
+    def get_channel_id(self, room: Optional[str] = None, refresh: bool = False) -> Optional[str]:
+        """
+        房间名称解析为房间ID，未缓存的名称会重新读取一次房间列表（刷新后仍找不到的名称在一段时间内直接返回None）
+        
+        Args:
+            room: 房间名称（也可以直接传房间ID），默认为初始化时的房间
+            refresh: 是否忽略缓存重新读取
             
-            # 获取用户加入的groups
-            response = requests.get(f"{self.base_url}/groups.list", 
-                                  headers=headers, 
-                                  timeout=10)
+        Returns:
+            Optional[str]: 房间ID，找不到时返回None
+        """
+        room = room or self.channel
+        try:
+            rooms = self.get_rooms(refresh)
+            if room not in rooms and room not in rooms.values() and not refresh:
+                if self._unknown_rooms.get(room, 0) > time.monotonic():
+                    return None
+                # 可能是新加入的房间
+                rooms = self.get_rooms(refresh=True)
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"读取Rocket房间列表失败: {e}")
+            return None
+        if room in rooms:
+            self._unknown_rooms.pop(room, None)
+            return rooms[room]
+        if room in rooms.values():
+            return room
+        now = time.monotonic()
+        if self._unknown_rooms.get(room, 0) <= now:
+            logger.warning(f"Rocket房间 {room} 不存在或未加入")
+        self._unknown_rooms[room] = now + RocketConfig.ROCKET_UNKNOWN_ROOM_TTL
+        return None
+    
+    def _post_message(self, room_id: str, message: str, attachments: Optional[list] = None) -> Dict:
+        """调用 chat.postMessage，返回接口结果（失败时 success 为 False）"""
+        payload = {"roomId": room_id, "text": message}
+        if attachments:
+            payload["attachments"] = attachments
+        try:
+            response = self._request("POST", "chat.postMessage", json=payload)
+            return self._result(response)
+        except (requests.RequestException, ValueError) as e:
+            return {"success": False, "error": str(e)}
+    
+    @staticmethod
+    def _result(response: requests.Response) -> Dict:
+        """解析接口结果，非200响应视为失败"""
+        data = response.json()
+        if response.status_code != 200 and data.get("success"):
+            data["success"] = False
+        return data
+    
+    def _send_with_retry(self, room: str, send: Callable[[str], Dict]) -> Dict:
+        """
+        解析房间ID后调用 send，房间ID失效时刷新房间列表后重试一次
+        
+        Args:
+            room: 房间名称
+            send: 房间ID到接口结果的函数
+        """
+        channel_id = self.get_channel_id(room)
+        if not channel_id:
+            return {"success": False, "error": "无法获取房间ID"}
+        
+        data = send(channel_id)
+        if not data.get("success") and is_room_not_found(data.get("error")):
+            # 房间ID已失效（房间被删除后重建等），刷新房间列表后重试一次
+            logger.warning(f"Rocket房间 {room} 不存在，刷新房间列表后重试")
+            channel_id = self.get_channel_id(room, refresh=True)
+            if channel_id:
+                data = send(channel_id)
+        return data
+    
+    def _realtime_session(self) -> Optional[RocketRealtime]:
+        """已连接的实时会话；未启用或暂时连不上时返回None（使用REST）"""
+        if self.realtime is None:
+            return None
+        if self.realtime.connected:
+            return self.realtime
+        with self._realtime_lock:
+            if self.realtime.connected:
+                return self.realtime
+            if time.time() < self._realtime_retry_at:
+                return None
+            try:
+                self.realtime.connect()
+            except RealtimeDisconnected as e:
+                # 一段时间内不再尝试重连
+                self._realtime_retry_at = time.time() + RocketConfig.ROCKET_REALTIME_RETRY_INTERVAL
+                logger.warning(f"{e}，暂时改用REST接口")
+                return None
+        return self.realtime
+    
+    def _send_rest(self, room_id: str, message: str, message_id: str) -> Dict:
+        """通过 chat.sendMessage 发送指定ID的消息（实时会话断开时的回退，沿用同一消息ID避免重复）"""
+        try:
+            response = self._request("POST", "chat.sendMessage",
+                                     json={"message": {"_id": message_id, "rid": room_id, "msg": message}})
+            return self._result(response)
+        except (requests.RequestException, ValueError) as e:
+            return {"success": False, "error": str(e)}
+    
+    def _await_realtime(self, future, room_id: str, message: str, message_id: str) -> Dict:
+        """等待实时调用的确认，会话断开或确认超时时改走REST"""
+        try:
+            return {"success": True, "message": future.result(RocketConfig.ROCKET_ACK_TIMEOUT) or {}}
+        except RealtimeError as e:
+            return {"success": False, "error": str(e)}
+        except (RealtimeDisconnected, AckTimeout) as e:
+            logger.warning(f"Rocket实时发送未确认（{str(e) or '确认超时'}），改用REST接口")
+            data = self._send_rest(room_id, message, message_id)
+            if not data.get("success") and is_duplicate_message(data.get("error")):
+                # 服务器已保存了实时会话发出的这条消息，只是确认没有送达
+                logger.info(f"Rocket消息 {message_id} 已由实时会话送达")
+                return {"success": True, "message": {"_id": message_id, "rid": room_id}}
+            return data
+    
+    def _deliver(self, room_id: str, message: str, attachments: Optional[list] = None) -> Dict:
+        """发送一条消息：文字消息在实时会话可用时走WebSocket，否则走REST"""
+        session = self._realtime_session() if not attachments else None
+        if session is None:
+            return self._post_message(room_id, message, attachments)
+        message_id = uuid.uuid4().hex[:17]
+        return self._await_realtime(session.send_message(room_id, message, message_id),
+                                    room_id, message, message_id)
+    
+    def send_to_room(self, message: str, room: Optional[str] = None, attachments: Optional[list] = None) -> RoomResult:
+        """
+        发送消息到一个Rocket房间，房间ID失效时刷新房间列表后重试一次
+        
+        Args:
+            message: 消息内容
+            room: 房间名称，默认为初始化时的房间
+            attachments: 消息附件（如已上传图片的链接）
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success"):
-                    groups = data.get("groups", [])
-                    print("\n📋 用户加入的Groups:")
-                    for group in groups:
-                        print(f"  - {group.get('name')} (ID: {group.get('_id')})")
+        Returns:
+            RoomResult: 发送结果
+        """
+        room = room or self.channel
+        data = self._send_with_retry(room, lambda room_id: self._deliver(room_id, message, attachments))
+        if data.get("success"):
+            return RoomResult(room, True, message_id=(data.get("message") or {}).get("_id"))
+        return RoomResult(room, False, error=str(data.get("error") or "发送失败"))
+    
+    def _file_url(self, message: Dict) -> Optional[str]:
+        """上传消息中文件的完整访问地址"""
+        for attachment in message.get("attachments") or []:
+            link = attachment.get("title_link") or attachment.get("image_url")
+            if link:
+                return link if link.startswith("http") else self.server_url + link
+        file = message.get("file") or {}
+        if file.get("_id"):
+            return f"{self.server_url}/file-upload/{file['_id']}/{quote(file.get('name', ''))}"
+        return None
+    
+    def upload_file(self, fileobj: IO[bytes], room: Optional[str] = None, filename: str = "briefing.jpg",
+                    content_type: str = "image/jpeg", message: str = "") -> RoomResult:
+        """
+        通过 rooms.upload 上传文件到房间，请求体直接从文件对象流式读取
+        
+        Args:
+            fileobj: 已定位到文件开头的可读文件对象
+            room: 房间名称，默认为初始化时的房间
+            filename: 文件名
+            content_type: 文件类型
+            message: 随文件发送的文字
             
-        except Exception as e:
-            logger.error(f"获取用户频道列表异常: {e}")
+        Returns:
+            RoomResult: 上传结果，成功时 file_url 为文件访问地址
+        """
+        room = room or self.channel
+        stream = MultipartStream("file", fileobj, filename, content_type, {"msg": message} if message else None)
         
-    def get_channel_id(self):
-        """获取频道ID"""
-        # 直接返回已知的频道ID
-        return "698d7b667c0af801b7e72bd8"
+        def upload(room_id: str) -> Dict:
+            try:
+                response = self._request("POST", f"rooms.upload/{room_id}", data=stream,
+                                         headers={"Content-Type": stream.content_type},
+                                         timeout=RocketConfig.ROCKET_UPLOAD_TIMEOUT)
+                return self._result(response)
+            except (requests.RequestException, ValueError, IOError) as e:
+                return {"success": False, "error": str(e)}
+        
+        data = self._send_with_retry(room, upload)
+        if not data.get("success"):
+            return RoomResult(room, False, error=str(data.get("error") or "上传失败"))
+        uploaded = data.get("message") or {}
+        return RoomResult(room, True, message_id=uploaded.get("_id"), file_url=self._file_url(uploaded))
     
-    def send_message(self, message):
+    def send_message(self, message, room=None):
         """
-        发送消息到Rocket频道
+        发送消息到Rocket房间
         
         Args:
             message: 消息内容
+            room: 房间名称，默认为初始化时的房间
             
         Returns:
             bool: 发送是否成功
         """
-        channel_id = self.get_channel_id()
-        if not channel_id:
-            logger.error("无法获取频道ID，发送失败")
-            return False
+        result = self.send_to_room(message, room)
+        if result.ok:
+            logger.info(f"Rocket消息发送成功")
+        else:
+            logger.error(f"Rocket消息发送失败: {result.error}")
+        return result.ok
+    
+    def _fan_out(self, rooms: list, send: Callable[[str], RoomResult]) -> Dict[str, RoomResult]:
+        """在有限并发下对每个房间调用 send，汇总结果"""
+        if not rooms:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(rooms)),
+                                thread_name_prefix="rocket-send") as executor:
+            return dict(zip(rooms, executor.map(send, rooms)))
+    
+    def _log_results(self, results: Dict[str, RoomResult]):
+        failed = {room: result.error for room, result in results.items() if not result.ok}
+        logger.info(f"Rocket消息推送完成: 成功 {len(results) - len(failed)}/{len(results)} 个房间")
+        if failed:
+            logger.error(f"Rocket推送失败的房间: {failed}")
+    
+    def _prepare_rooms(self, rooms: Optional[Iterable[str]]) -> list:
+        """去重房间列表，并预先读取一次房间列表，避免各线程同时请求"""
+        rooms = list(dict.fromkeys(rooms or RocketConfig.ROCKET_BROADCAST_ROOMS))
+        if rooms:
+            try:
+                self.get_rooms()
+            except (requests.RequestException, ValueError) as e:
+                logger.warning(f"预读Rocket房间列表失败: {e}")
+        return rooms
+    
+    def broadcast(self, message: str, rooms: Optional[Iterable[str]] = None) -> Dict[str, RoomResult]:
+        """
+        把同一条消息并发推送到多个房间
         
-        headers = {
-            "X-Auth-Token": self.token,
-            "X-User-Id": self.user_id,
-            "Content-Type": "application/json"
-        }
+        Args:
+            message: 消息内容
+            rooms: 房间名称列表，默认为配置中的推送房间
+            
+        Returns:
+            Dict[str, RoomResult]: 房间名称到发送结果的映射
+        """
+        rooms = self._prepare_rooms(rooms)
+        session = self._realtime_session()
+        if session is not None:
+            results = self._broadcast_realtime(session, message, rooms)
+        else:
+            results = self._fan_out(rooms, lambda room: self.send_to_room(message, room))
+        self._log_results(results)
+        return results
+    
+    def _broadcast_realtime(self, session: RocketRealtime, message: str, rooms: list) -> Dict[str, RoomResult]:
+        """在实时会话上连续发出所有房间的 sendMessage，再逐个等待确认"""
+        pending = {}
+        results: Dict[str, RoomResult] = {}
+        for room in rooms:
+            room_id = self.get_channel_id(room)
+            if not room_id:
+                results[room] = RoomResult(room, False, error="无法获取房间ID")
+                continue
+            message_id = uuid.uuid4().hex[:17]
+            pending[room] = (session.send_message(room_id, message, message_id), room_id, message_id)
         
-        # 简化消息格式，只包含必要字段
-        payload = {
-            "roomId": channel_id,
-            "text": message
-        }
+        for room, (future, room_id, message_id) in pending.items():
+            data = self._await_realtime(future, room_id, message, message_id)
+            if data.get("success"):
+                results[room] = RoomResult(room, True, message_id=(data.get("message") or {}).get("_id"))
+            elif is_room_not_found(data.get("error")):
+                # 房间ID失效，走刷新房间列表后重试的路径
+                results[room] = self.send_to_room(message, room)
+            else:
+                results[room] = RoomResult(room, False, error=str(data.get("error") or "发送失败"))
+        return {room: results[room] for room in rooms}
+    
+    def broadcast_image(self, fileobj: IO[bytes], rooms: Optional[Iterable[str]] = None,
+                        filename: str = "briefing.jpg", message: str = "") -> Dict[str, RoomResult]:
+        """
+        把同一张图片推送到多个房间：只上传一次，其余房间发送引用该文件地址的消息
         
-        try:
-            # 尝试使用简化的消息格式
-            response = requests.post(f"{self.base_url}/chat.postMessage", 
-                                   headers=headers, 
-                                   json=payload, 
-                                   timeout=10)
-            
-            print(f"\n🔧 发送消息请求:")
-            print(f"  URL: {self.base_url}/chat.postMessage")
-            print(f"  Headers: {headers}")
-            print(f"  Payload: {payload}")
-            print(f"  Response status: {response.status_code}")
-            print(f"  Response text: {response.text}")
+        Args:
+            fileobj: 已定位到文件开头的图片文件对象（如 ImageGenerator.generate_image_stream 的返回值）
+            rooms: 房间名称列表，默认为配置中的推送房间
+            filename: 文件名
+            message: 随图片发送的文字
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success"):
-                    logger.info(f"Rocket消息发送成功")
-                    return True
-                else:
-                    logger.error(f"Rocket消息发送失败: {data.get('error')}")
-            else:
-                logger.error(f"Rocket消息发送失败: {response.status_code} - {response.text}")
-                
-        except Exception as e:
-            logger.error(f"Rocket消息发送异常: {e}")
+        Returns:
+            Dict[str, RoomResult]: 房间名称到发送结果的映射
+        """
+        rooms = self._prepare_rooms(rooms)
+        start = fileobj.tell()
+        results: Dict[str, RoomResult] = {}
+        uploaded: Optional[RoomResult] = None
+        # 依次尝试上传，直到有一个房间上传成功
+        for room in rooms:
+            fileobj.seek(start)
+            results[room] = self.upload_file(fileobj, room, filename, message=message)
+            if results[room].ok:
+                uploaded = results[room]
+                break
         
-        return False
+        remaining = [room for room in rooms if room not in results]
+        if uploaded and uploaded.file_url:
+            attachments = [{"title": filename, "title_link": uploaded.file_url, "image_url": uploaded.file_url}]
+            results.update(self._fan_out(remaining, lambda room: self.send_to_room(message, room, attachments)))
+        else:
+            error = "没有可引用的文件地址" if uploaded else "图片上传失败"
+            results.update({room: RoomResult(room, False, error=error) for room in remaining})
+        self._log_results(results)
+        return results
     
     def format_message(self, weather, life_index, almanac, traffic, constellation=None, i_ching=None):
         """
@@ -144,62 +636,15 @@ class RocketPush:
         Returns:
             str: 格式化后的消息
         """
-        today = datetime.now().strftime("%Y年%m月%d日")
-        
-        message = f"""
-【每日信息简报】
-📅 {today}
-
---------------------
-【天气】
-🌤️ 天气：{weather.get('weather', '未知')}
-🌡️ 温度：{weather.get('temperature', '未知')}
-💧 湿度：{weather.get('humidity', '未知')}
-💨 风力：{weather.get('wind', '未知')}
-
---------------------
-【生活指数】
-👔 穿衣：{life_index.get('dressing', '未知')}
-☀️ 紫外线：{life_index.get('uv', '未知')}
-🚗 洗车：{life_index.get('car_washing', '未知')}
-🤧 感冒：{life_index.get('cold', '未知')}
-🏃 运动：{life_index.get('sport', '未知')}
-🌬️ 空气：{life_index.get('air_quality', '未知')}
-
---------------------
-【黄历】
-📅 农历：{almanac.get('lunar', '未知')}
-🐉 生肖：{almanac.get('zodiac', '未知')}
-✅ 宜：{almanac.get('suitable', '未知')}
-❌ 忌：{almanac.get('avoid', '未知')}
-
---------------------
-【限行】
-🚫 {', '.join(map(str, traffic.get('restricted_numbers', []))) if traffic.get('restricted_numbers') else '不限行'}
-⏰ 7:00-20:00 | 📍 五环路以内
-
---------------------
-【星座】
-⭐ {constellation.get('constellation', '未知') if constellation else '未知'}
-🌟 整体：{constellation.get('overall', '未知') if constellation else '未知'}
-💖 爱情：{constellation.get('love', '未知') if constellation else '未知'}
-💼 事业：{constellation.get('career', '未知') if constellation else '未知'}
-💰 财运：{constellation.get('wealth', '未知') if constellation else '未知'}
-🧘 健康：{constellation.get('health', '未知') if constellation else '未知'}
-
---------------------
-【易经】
-🔮 卦象：{i_ching.get('hexagram', '未知') if i_ching else '未知'}
-🌅 寓意：{i_ching.get('meaning', '未知') if i_ching else '未知'}
-🔢 幸运数字：{i_ching.get('lucky_number', '未知') if i_ching else '未知'}
-🎨 幸运颜色：{i_ching.get('lucky_color', '未知') if i_ching else '未知'}
-
---------------------
-【寄语】
-愿您的每一天都充满阳光与希望，事业有成，家庭幸福！
-"""
-        
-        return message
+        sections = {
+            "weather": weather,
+            "life_index": life_index,
+            "almanac": almanac,
+            "traffic": traffic,
+            "constellation": constellation,
+            "i_ching": i_ching
+        }
+        return render("rocket", Briefing(Config.WEATHER_LOCATION, sections))
 
 class RocketConfig:
     """Rocket配置类"""
@@ -209,6 +654,17 @@ class RocketConfig:
     ROCKET_USER_ID = "mkvGvyyAjT5x4d8xt"
     ROCKET_CHANNEL = "mei3-ri4-huang2-li4"  # 实际频道名称
     ROCKET_SERVER_URL = "https://chat.akria.net/api/v1"  # Rocket服务器地址
+    ROCKET_ROOM_CACHE_FILE = "rocket_rooms.json"  # 房间名称到ID的缓存（数据目录下）
+    ROCKET_ROOM_CACHE_TTL = 30 * 24 * 3600  # 房间缓存有效期（秒），房间不存在时会立即刷新
+    ROCKET_UNKNOWN_ROOM_TTL = 300  # 刷新房间列表后仍找不到的房间名称，多少秒内不再因它刷新
+    ROCKET_BROADCAST_ROOMS = [ROCKET_CHANNEL]  # 每日简报推送的房间
+    ROCKET_MAX_WORKERS = 4  # 多房间推送的最大并发数
+    ROCKET_RATE_LIMIT_RETRIES = 2  # 被限流（429）时的最大重试次数
+    ROCKET_UPLOAD_TIMEOUT = 60  # 文件上传超时时间（秒）
+    ROCKET_SEND_IMAGE = False  # 每日简报是否同时推送图片版
+    ROCKET_REALTIME = False  # 文字消息是否走实时接口（需要安装 websocket-client）
+    ROCKET_ACK_TIMEOUT = 10  # 实时接口连接和等待消息确认的超时时间（秒）
+    ROCKET_REALTIME_RETRY_INTERVAL = 30  # 实时接口连接失败后多久再尝试（秒），期间使用REST
 
 if __name__ == "__main__":
     """测试Rocket推送"""
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rocket实时推送模块
+功能：保持一个已登录的 Realtime API（DDP over WebSocket）会话，流水线式发送 sendMessage 调用，
+      按调用ID对应服务器的确认结果；连接断开时由调用方回退到REST接口
+依赖：websocket-client（可选，未安装时只能使用REST接口）
+"""
+
+import json
+import uuid
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+try:
+    import websocket
+except ImportError:  # 未安装 websocket-client 时不启用实时推送
+    websocket = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class RealtimeError(Exception):
+    """服务器对方法调用返回了错误"""
+
+    def __init__(self, error: Dict):
+        self.error = error if isinstance(error, dict) else {"error": str(error)}
+        super().__init__(self.error.get("error") or self.error.get("reason") or str(self.error))
+
+
+class RealtimeDisconnected(ConnectionError):
+    """实时会话不可用（未连接、已断开或等待确认超时），消息可以改走REST接口"""
+
+
+def realtime_url(server_url: str) -> str:
+    """服务器地址对应的 WebSocket 地址，如 https://chat.example.com -> wss://chat.example.com/websocket"""
+    if server_url.startswith("https://"):
+        server_url = "wss://" + server_url[len("https://"):]
+    elif server_url.startswith("http://"):
+        server_url = "ws://" + server_url[len("http://"):]
+    return server_url.rstrip('/') + "/websocket"
+
+
+def _close_quietly(ws):
+    """关闭连接，忽略关闭过程中的异常"""
+    if ws is None:
+        return
+    try:
+        ws.close()
+    except Exception:
+        pass
+
+
+class RocketRealtime:
+    """Rocket Realtime API 会话（线程安全，多个调用可同时等待确认）"""
+
+    def __init__(self, url: str, token: str, timeout: float = 10):
+        """
+        初始化实时会话（不立即连接）
+
+        Args:
+            url: WebSocket 地址（见 realtime_url）
+            token: Rocket个人访问令牌（以 resume 方式登录）
+            timeout: 连接、登录和等待单条确认的超时时间（秒）
+        """
+        if websocket is None:
+            raise RuntimeError("未安装 websocket-client，无法使用Rocket实时推送")
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self._ws = None
+        self._connected = threading.Event()
+        self._send_lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._next_id = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def connect(self):
+        """
+        建立连接并登录
+
+        Raises:
+            RealtimeDisconnected: 连接或登录失败
+        """
+        if self.connected:
+            return
+        ws = None
+        try:
+            ws = websocket.create_connection(self.url, timeout=self.timeout)
+            ws.send(json.dumps({"msg": "connect", "version": "1", "support": ["1"]}))
+            while True:
+                message = json.loads(ws.recv())
+                if message.get("msg") == "connected":
+                    break
+                if message.get("msg") == "failed":
+                    raise RealtimeDisconnected(f"服务器不支持DDP版本: {message}")
+        except RealtimeDisconnected:
+            # RealtimeDisconnected 也是 OSError，需在下面的分支之前原样抛出
+            _close_quietly(ws)
+            raise
+        except (OSError, ValueError, websocket.WebSocketException) as e:
+            _close_quietly(ws)
+            raise RealtimeDisconnected(f"连接Rocket实时接口失败: {e}") from e
+
+        # 连接建立后由读取线程阻塞等待消息，超时只作用于调用确认
+        ws.settimeout(None)
+        self._ws = ws
+        self._connected.set()
+        threading.Thread(target=self._read_loop, args=(ws,), name="rocket-realtime", daemon=True).start()
+
+        try:
+            self.call("login", [{"resume": self.token}]).result(self.timeout)
+        except Exception as e:
+            self.close()
+            raise RealtimeDisconnected(f"Rocket实时接口登录失败: {e}") from e
+        logger.info("Rocket实时会话已连接")
+
+    def _read_loop(self, ws):
+        """读取服务器消息：响应心跳，把调用结果交给对应的调用方"""
+        try:
+            while True:
+                message = json.loads(ws.recv())
+                kind = message.get("msg")
+                if kind == "ping":
+                    self._send({"msg": "pong"})
+                elif kind == "result":
+                    with self._pending_lock:
+                        future = self._pending.pop(message.get("id"), None)
+                    if future is None:
+                        continue
+                    if "error" in message:
+                        future.set_exception(RealtimeError(message["error"]))
+                    else:
+                        future.set_result(message.get("result"))
+        except Exception as e:
+            if self._ws is ws:
+                logger.warning(f"Rocket实时会话已断开: {e}")
+        finally:
+            self._disconnect(ws)
+            _close_quietly(ws)
+
+    def _disconnect(self, ws):
+        """标记断开，所有未确认的调用以 RealtimeDisconnected 结束"""
+        if self._ws is ws:
+            self._ws = None
+            self._connected.clear()
+        try:
+            # 中断读取线程阻塞中的recv（close需要等待读取锁，不能在这里调用）
+            ws.abort()
+        except Exception:
+            pass
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(RealtimeDisconnected("Rocket实时会话已断开"))
+
+    def _send(self, payload: Dict):
+        ws = self._ws
+        if ws is None:
+            raise RealtimeDisconnected("Rocket实时会话未连接")
+        try:
+            with self._send_lock:
+                ws.send(json.dumps(payload, ensure_ascii=False))
+        except (OSError, websocket.WebSocketException) as e:
+            self._disconnect(ws)
+            raise RealtimeDisconnected(f"发送失败: {e}") from e
+
+    def call(self, method: str, params: List[Any]) -> Future:
+        """
+        发起方法调用，不等待结果（可连续发起多个调用，由服务器按ID确认）
+
+        Returns:
+            Future: 调用结果；服务器返回错误时为 RealtimeError，断开时为 RealtimeDisconnected
+        """
+        future: Future = Future()
+        with self._pending_lock:
+            self._next_id += 1
+            call_id = str(self._next_id)
+            self._pending[call_id] = future
+        try:
+            self._send({"msg": "method", "method": method, "id": call_id, "params": params})
+        except RealtimeDisconnected as e:
+            with self._pending_lock:
+                # 断开时可能已由 _disconnect 统一结束
+                if self._pending.pop(call_id, None) is not None:
+                    future.set_exception(e)
+        return future
+
+    def send_message(self, room_id: str, text: str, message_id: Optional[str] = None) -> Future:
+        """
+        发送消息（不等待确认）
+
+        Args:
+            room_id: 房间ID
+            text: 消息内容
+            message_id: 消息ID，改走REST重发时沿用同一个ID，服务器不会重复保存
+
+        Returns:
+            Future: 确认结果为服务器保存的消息
+        """
+        return self.call("sendMessage", [{"_id": message_id or uuid.uuid4().hex[:17], "rid": room_id, "msg": text}])
+
+    def close(self):
+        """关闭会话"""
+        ws = self._ws
+        if ws is not None:
+            self._disconnect(ws)
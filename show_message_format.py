@@ -7,6 +7,12 @@
 
 import json
 from datetime import datetime
+from almanac_table import lookup_almanac
+from briefing_templates import Briefing, miniprogram_data, render
+from config import Config
+from snapshot_store import SnapshotStore
+from traffic_rules import query_traffic_restriction
+from weather_client import peek_cached_weather
 
 def show_message_format():
     """展示消息格式"""
@@ -14,55 +20,21 @@ def show_message_format():
     print("🎯 完整的消息格式展示")
     print("=" * 60)
     
-    # 模拟数据
+    # 优先使用定时任务写入的当天快照，其次是天气缓存，都没有时使用模拟数据
+    snapshot = SnapshotStore().load(Config.WEATHER_LOCATION) or {}
+    cached = peek_cached_weather()
     today = datetime.now()
-    weekday = today.weekday()
-    restriction_rules = {0: [1, 6], 1: [2, 7], 2: [3, 8], 3: [4, 9], 4: [5, 0], 5: [], 6: []}
-    restricted_numbers = restriction_rules.get(weekday, [])
     
-    data = {
-        'weather': {'temperature': '8℃', 'weather': '晴', 'humidity': '45%', 'wind': '北风3级'},
-        'life_index': {'dressing': '较舒适', 'uv': '中等', 'air_quality': '良'},
-        'almanac': {'lunar': '农历腊月廿三', 'suitable': '祭祀、祈福、求嗣、开光、出行'},
-        'traffic': {'weekday': ['周一', '周二', '周三', '周四', '周五', '周六', '周日'][weekday], 'restricted_numbers': restricted_numbers}
-    }
+    briefing = Briefing(Config.WEATHER_LOCATION, {
+        'weather': snapshot.get('weather') or cached['weather'] or {'temperature': '8℃', 'weather': '晴', 'humidity': '45%', 'wind': '北风3级'},
+        'life_index': snapshot.get('life_index') or cached['life_index'] or {'dressing': '较舒适', 'uv': '中等', 'air_quality': '良'},
+        'almanac': lookup_almanac(today.date()),
+        'traffic': query_traffic_restriction(day=today.date())
+    }, today)
     
-    # 小程序模板格式
-    template_format = {
-        'thing1': {'value': '每日信息简报'},
-        'date2': {'value': today.strftime('%Y年%m月%d日')},
-        'thing3': {'value': f"{data['weather']['weather']} {data['weather']['temperature']}"},
-        'thing4': {'value': f"限行:{', '.join(map(str, data['traffic']['restricted_numbers'])) if data['traffic']['restricted_numbers'] else '不限行'}"},
-        'thing5': {'value': data['almanac']['suitable'][:10] + '...'},
-        'thing6': {'value': f"穿衣:{data['life_index']['dressing']}"}
-    }
-    
-    # 美化显示格式
-    display_format = f"""
-🌅 早安！今日信息简报
-📅 {today.strftime('%Y-%m-%d %H:%M')}
-
-🌤️ 北京天气
-   温度：{data['weather']['temperature']}
-   天气：{data['weather']['weather']}
-   湿度：{data['weather']['humidity']}
-   风力：{data['weather']['wind']}
-
-📊 生活指数
-   穿衣：{data['life_index']['dressing']}
-   紫外线：{data['life_index']['uv']}
-   空气质量：{data['life_index']['air_quality']}
-
-📅 今日黄历
-   农历：{data['almanac']['lunar']}
-   宜：{data['almanac']['suitable']}
-
-🚗 尾号限行
-   星期：{data['traffic']['weekday']}
-   限行尾号：{', '.join(map(str, data['traffic']['restricted_numbers'])) if data['traffic']['restricted_numbers'] else '不限行'}
-   时间：7:00-20:00
-   区域：五环路以内道路（不含五环路）
-"""
+    # 小程序模板格式、美化显示格式都由统一模板渲染
+    template_format = miniprogram_data(briefing)
+    display_format = render("wechat", briefing)
     
     # 显示小程序模板格式
     print("\n📱 小程序模板格式（JSON）")
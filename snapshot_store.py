@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+简报快照存储
+功能：把每天每个城市组装好的板块数据写入SQLite（带版本号），
+      各推送渠道、命令行工具和重启后的进程直接读取，避免重复请求上游
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import closing
+from datetime import date, timedelta
+from typing import Callable, Dict, Optional
+
+from briefing_assembler import BriefingAssembler, is_degraded
+from config import Config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 快照内容格式版本，格式不兼容变更时递增，旧格式快照不再读取
+SCHEMA_VERSION = 1
+
+
+def is_usable(section: Optional[Dict]) -> bool:
+    """板块数据是否可以直接复用（非空、未降级且不是熔断时返回的旧数据）"""
+    return bool(section) and not is_degraded(section) and not section.get("stale")
+
+
+class SnapshotStore:
+    """按 (日期, 地区) 存储的简报快照"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化快照存储
+
+        Args:
+            path: SQLite数据库文件路径，默认在数据目录下
+        """
+        self.path = path or os.path.join(Config.DATA_DIR, Config.SNAPSHOT_DB)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    day TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    schema INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (day, location, version)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def save(self, location: str, sections: Dict, day: Optional[date] = None) -> int:
+        """
+        写入新版本快照
+
+        Args:
+            location: 地区代码
+            sections: 板块名称到板块数据的映射
+            day: 日期，默认今天
+
+        Returns:
+            int: 新快照的版本号
+        """
+        day_key = (day or date.today()).isoformat()
+        payload = json.dumps(sections, ensure_ascii=False)
+        with closing(self._connect()) as conn, conn:
+            # 立即加写锁，避免多个进程同时分配到相同的版本号
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM snapshots WHERE day = ? AND location = ?",
+                (day_key, location)
+            ).fetchone()
+            version = row[0] + 1
+            conn.execute(
+                "INSERT INTO snapshots (day, location, version, schema, created_at, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                (day_key, location, version, SCHEMA_VERSION, time.time(), payload)
+            )
+        logger.info(f"简报快照已保存: {day_key} {location} v{version}")
+        return version
+
+    def load(self, location: str, day: Optional[date] = None, version: Optional[int] = None) -> Optional[Dict]:
+        """
+        读取快照
+
+        Args:
+            location: 地区代码
+            day: 日期，默认今天
+            version: 版本号，默认最新版本
+
+        Returns:
+            Optional[Dict]: 板块数据，不存在时返回None
+        """
+        day_key = (day or date.today()).isoformat()
+        query = "SELECT payload FROM snapshots WHERE day = ? AND location = ? AND schema = ?"
+        params = [day_key, location, SCHEMA_VERSION]
+        if version is not None:
+            query += " AND version = ?"
+            params.append(version)
+        query += " ORDER BY version DESC LIMIT 1"
+
+        with closing(self._connect()) as conn:
+            row = conn.execute(query, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_or_assemble(self, location: str, providers: Dict[str, Callable[[], Dict]],
+                         day: Optional[date] = None, persist: bool = True) -> Dict:
+        """
+        读取快照，只为缺失或降级的板块调用数据源，并把新数据合并为新版本快照
+
+        Args:
+            location: 地区代码
+            providers: 板块名称到数据获取函数的映射
+            day: 日期，默认今天
+            persist: 是否把新获取的数据写回快照（测试工具的模拟数据不应写回）
+
+        Returns:
+            Dict: providers 中每个板块的数据
+        """
+        snapshot = self.load(location, day) or {}
+        missing = {name: provider for name, provider in providers.items()
+                   if not is_usable(snapshot.get(name))}
+        if not missing:
+            return {name: snapshot[name] for name in providers}
+
+        fresh = BriefingAssembler(missing).assemble()
+        usable = {name: section for name, section in fresh.items() if is_usable(section)}
+        if usable and persist:
+            self.save(location, dict(snapshot, **usable), day)
+
+        sections = {name: snapshot.get(name, {}) for name in providers}
+        sections.update(fresh)
+        return sections
+
+    def prune(self, keep_days: Optional[int] = None):
+        """删除过期快照"""
+        keep_days = keep_days if keep_days is not None else Config.SNAPSHOT_KEEP_DAYS
+        cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM snapshots WHERE day < ?", (cutoff,))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订阅用户批量检查模块
+功能：通过公众号的批量获取用户信息接口（每次100个openid）检查用户是否仍关注、openid是否有效，
+      结果带时间记录在用户状态库中，只重新检查过期或状态有变化的用户，检查过程不发送任何消息。
+      该接口只认本公众号的openid，小程序订阅消息的用户不能用它检查（见 batch_check_supported）
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from config import Config
+from subscriber_status import INVALID_OPENID, SubscriberStatusStore
+from subscribers import Subscriber
+from wechat_token import AccessTokenManager, WeChatAPIError
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 每次从订阅用户中取出多少个openid查询检查记录
+LOOKUP_CHUNK = 500
+
+
+def batch_check_supported() -> bool:
+    """订阅用户的openid是否属于配置的公众号（只有这时才能用公众号令牌批量检查）"""
+    return bool(Config.SUBSCRIBER_APP_ID) and Config.SUBSCRIBER_APP_ID == Config.WECHAT_APP_ID
+
+
+class SubscriberChecker:
+    """订阅用户批量检查器"""
+
+    def __init__(self, manager: AccessTokenManager, store: Optional[SubscriberStatusStore] = None,
+                 url: Optional[str] = None, max_age: Optional[float] = None):
+        """
+        初始化检查器
+
+        Args:
+            manager: 订阅用户所属公众号的Access Token管理器
+            store: 用户状态存储，检查结果写入其中
+            url: 批量获取用户信息接口地址
+            max_age: 检查结果有效期（秒）
+        """
+        self.manager = manager
+        self.store = store or SubscriberStatusStore()
+        self.url = url or Config.WECHAT_USER_BATCHGET_URL
+        self.max_age = max_age if max_age is not None else Config.CHECK_MAX_AGE
+        self.calls = 0
+
+    def _batch_get(self, openids: List[str]) -> Dict[str, Optional[bool]]:
+        """
+        查询一批openid是否关注
+
+        列表中有无效openid时整批返回40003，此时对半拆分找出无效的openid。
+
+        Returns:
+            Dict[str, Optional[bool]]: openid 到结果的映射（True关注、False未关注、None无效openid）
+
+        Raises:
+            WeChatAPIError: 网络异常或其他接口错误
+        """
+        self.calls += 1
+        data = self.manager.request("POST", self.url, json={
+            "user_list": [{"openid": openid, "lang": "zh_CN"} for openid in openids]
+        })
+        errcode = data.get('errcode', 0)
+        if errcode == INVALID_OPENID:
+            if len(openids) == 1:
+                return {openids[0]: None}
+            middle = len(openids) // 2
+            return {**self._batch_get(openids[:middle]), **self._batch_get(openids[middle:])}
+        if errcode:
+            raise WeChatAPIError(f"批量获取用户信息失败: {data}", errcode)
+        return {info['openid']: bool(info.get('subscribe')) for info in data.get('user_info_list', [])}
+
+    def check(self, subscribers: Iterable[Subscriber], force: bool = False) -> Dict[str, Optional[bool]]:
+        """
+        检查订阅用户（流式读取，按批查询并写回结果）
+
+        Args:
+            subscribers: 订阅用户（可以是逐行读取文件的生成器）
+            force: 是否忽略有效期，全部重新检查
+
+        Returns:
+            Dict[str, Optional[bool]]: 本次重新检查的openid及结果，未过期的用户不在其中
+        """
+        results: Dict[str, Optional[bool]] = {}
+        skipped = 0
+        pending: List[str] = []
+        chunk: List[str] = []
+        self.calls = 0
+
+        def flush(openids: List[str]):
+            checks = self._batch_get(openids)
+            self.store.apply_checks(checks)
+            results.update(checks)
+
+        def lookup():
+            nonlocal skipped
+            stale = chunk if force else self.store.needs_check(chunk, self.max_age)
+            skipped += len(chunk) - len(stale)
+            pending.extend(stale)
+            chunk.clear()
+            while len(pending) >= Config.CHECK_BATCH_SIZE:
+                flush(pending[:Config.CHECK_BATCH_SIZE])
+                del pending[:Config.CHECK_BATCH_SIZE]
+
+        for subscriber in subscribers:
+            chunk.append(subscriber.openid)
+            if len(chunk) >= LOOKUP_CHUNK:
+                lookup()
+        lookup()
+        if pending:
+            flush(pending)
+
+        logger.info(f"订阅用户检查完成: 重新检查 {len(results)} 个（{self.calls} 次请求），"
+                    f"{skipped} 个检查结果未过期")
+        return results
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订阅用户状态模块
+功能：根据每次发送结果自动更新订阅用户状态：永久失败（无效openid、未授权）的用户不再发送，
+      临时失败的用户按指数退避暂停发送，每天只向可达的用户推送；
+      记录批量检查（openid是否有效、是否关注）的结果和时间，只重新检查过期或状态有变化的用户
+"""
+
+import os
+import time
+import sqlite3
+import logging
+from contextlib import closing
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bulk_sender import SendResult
+from config import Config
+from subscribers import Subscriber
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 永久失败的错误码：无效openid、用户未授权订阅消息
+INVALID_OPENID = 40003
+PERMANENT_ERRCODES = {INVALID_OPENID, 43101}
+# 用户未关注公众号：与订阅消息能否送达无关，不作为永久失败
+NOT_SUBSCRIBED = 43004
+
+# 用户状态
+ACTIVE = "active"          # 正常
+BACKOFF = "backoff"        # 临时失败，retry_at 之前不发送
+SUPPRESSED = "suppressed"  # 永久失败，不再发送（重新添加用户后恢复）
+
+
+class SubscriberStatusStore:
+    """订阅用户状态（SQLite）"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化状态存储
+
+        Args:
+            path: SQLite数据库文件路径，默认在数据目录下
+        """
+        self.path = path or os.path.join(Config.DATA_DIR, Config.STATUS_DB)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS subscriber_status (
+                    openid TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    errcode INTEGER,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    retry_at REAL NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_status_state ON subscriber_status (state)")
+            # 旧版本把未关注（43004）当作永久失败停发，恢复这些用户
+            conn.execute("DELETE FROM subscriber_status WHERE state = ? AND errcode = ?", (SUPPRESSED, NOT_SUBSCRIBED))
+            # 批量检查结果：subscribed 为1关注、0未关注、NULL无效openid
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS subscriber_check (
+                    openid TEXT PRIMARY KEY,
+                    subscribed INTEGER,
+                    checked_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _backoff(self, failures: int) -> float:
+        """第 failures 次连续临时失败后的暂停时间（秒）"""
+        return min(Config.STATUS_BACKOFF_BASE * (2 ** (failures - 1)), Config.STATUS_BACKOFF_MAX)
+
+    def apply(self, results: Iterable[SendResult]):
+        """
+        按一批发送结果更新用户状态
+
+        成功恢复为正常；永久失败标记为不再发送；微信返回的其他错误（限流、系统繁忙等）按指数退避暂停。
+        没有错误码的失败（本方网络异常、超时）与用户无关，不记录，网络恢复后照常发送。
+        """
+        results = [result for result in results if result.ok or result.errcode is not None]
+        if not results:
+            return
+        # 分块查询，避免超过SQLite的参数个数上限
+        for start in range(0, len(results), 500):
+            self._apply_chunk(results[start:start + 500])
+
+    def _apply_chunk(self, results: List[SendResult]):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            openids = [result.openid for result in results]
+            placeholders = ",".join("?" * len(openids))
+            failures = dict(conn.execute(
+                f"SELECT openid, failures FROM subscriber_status WHERE openid IN ({placeholders})", openids
+            ).fetchall())
+
+            rows = []
+            for result in results:
+                if result.ok:
+                    rows.append((result.openid, ACTIVE, 0, 0, 0, now))
+                elif result.errcode in PERMANENT_ERRCODES:
+                    rows.append((result.openid, SUPPRESSED, result.errcode, failures.get(result.openid, 0) + 1, 0, now))
+                else:
+                    count = failures.get(result.openid, 0) + 1
+                    rows.append((result.openid, BACKOFF, result.errcode, count, now + self._backoff(count), now))
+            conn.executemany(
+                "INSERT OR REPLACE INTO subscriber_status (openid, state, errcode, failures, retry_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def blocked_openids(self, now: Optional[float] = None) -> Set[str]:
+        """
+        当前不应发送的openid（永久失败和退避期内的用户）
+
+        只加载不可达的用户，正常用户不占内存。
+        """
+        now = now if now is not None else time.time()
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT openid FROM subscriber_status WHERE state = ? OR (state = ? AND retry_at > ?)",
+                (SUPPRESSED, BACKOFF, now)
+            ).fetchall()
+        return {openid for openid, in rows}
+
+    def filter_reachable(self, subscribers: Iterable[Subscriber]) -> Iterator[Subscriber]:
+        """过滤掉当前不可达的用户（保持流式）"""
+        blocked = self.blocked_openids()
+        skipped = 0
+        for subscriber in subscribers:
+            if subscriber.openid in blocked:
+                skipped += 1
+                continue
+            yield subscriber
+        if skipped:
+            logger.info(f"跳过 {skipped} 位不可达的订阅用户（未授权、无效openid或退避中）")
+
+    def reactivate(self, openid: str):
+        """恢复用户为正常状态（用户重新授权或重新添加时调用）"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM subscriber_status WHERE openid = ?", (openid,))
+
+    def reactivate_many(self, openids: Iterable[str]):
+        """批量恢复用户为正常状态（批量导入时调用，一个事务）"""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("DELETE FROM subscriber_status WHERE openid = ?", ((openid,) for openid in openids))
+
+    def needs_check(self, openids: List[str], max_age: float, now: Optional[float] = None) -> List[str]:
+        """
+        需要重新检查的openid：从未检查、检查结果已过期，或检查之后发送状态有变化
+
+        Args:
+            openids: 待筛选的openid（调用方分块传入）
+            max_age: 检查结果的有效期（秒）
+        """
+        now = now if now is not None else time.time()
+        fresh = set()
+        with closing(self._connect()) as conn:
+            for start in range(0, len(openids), 500):
+                chunk = openids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT c.openid FROM subscriber_check c LEFT JOIN subscriber_status s ON s.openid = c.openid "
+                    f"WHERE c.openid IN ({placeholders}) AND c.checked_at >= ? "
+                    f"AND (s.updated_at IS NULL OR s.updated_at <= c.checked_at)",
+                    chunk + [now - max_age]
+                ).fetchall()
+                fresh.update(openid for openid, in rows)
+        return [openid for openid in openids if openid not in fresh]
+
+    def apply_checks(self, checks: Dict[str, Optional[bool]]):
+        """
+        写入一批检查结果并同步用户状态
+
+        无效的openid不再发送；未关注只记录检查结果，不停发。
+
+        Args:
+            checks: openid 到检查结果的映射（True关注、False未关注、None无效openid）
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO subscriber_check (openid, subscribed, checked_at) VALUES (?, ?, ?)",
+                [(openid, None if subscribed is None else int(subscribed), now)
+                 for openid, subscribed in checks.items()]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO subscriber_status (openid, state, errcode, failures, retry_at, updated_at) "
+                "VALUES (?, ?, ?, 0, 0, ?)",
+                [(openid, SUPPRESSED, INVALID_OPENID, now) for openid, subscribed in checks.items() if subscribed is None]
+            )
+
+    def states(self, openids: List[str]) -> Dict[str, Tuple[str, Optional[int], float]]:
+        """
+        按发送记录得到的用户状态
+
+        Args:
+            openids: 待查询的openid（调用方分块传入）
+
+        Returns:
+            Dict[str, Tuple[str, Optional[int], float]]: openid 到 (状态, 最近错误码, 恢复发送时间) 的映射，
+            没有失败记录的用户不在其中
+        """
+        states = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(openids), 500):
+                chunk = openids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT openid, state, errcode, retry_at FROM subscriber_status WHERE openid IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                states.update((openid, (state, errcode, retry_at)) for openid, state, errcode, retry_at in rows)
+        return states
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订阅用户存储模块
+功能：用SQLite（WAL模式，openid主键，状态和地区索引）保存订阅用户，替代 user_openids.txt：
+      单个用户按主键插入或更新，批量导入逐行流式写入，首次使用时从文本文件迁移一次；
+      按openid的稳定哈希分片，多个进程各自流式读取自己的分片
+"""
+
+import os
+import csv
+import time
+import zlib
+import sqlite3
+import threading
+import logging
+from contextlib import closing
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from config import Config
+from constellation import parse_sign
+from subscribers import Subscriber, iter_subscribers as iter_file_subscribers
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 订阅状态
+ACTIVE = "active"      # 正常订阅
+REMOVED = "removed"    # 已取消订阅（重新添加后恢复）
+
+# 哈希桶数量（32位），分片按桶区间划分
+BUCKET_COUNT = 1 << 32
+
+# 流式读取时每次查询的行数：每页一个短查询，不长时间占用读事务（阻塞WAL检查点）
+PAGE_SIZE = 1000
+
+# 已有用户只更新填写了的字段（如重新授权时只给出openid），未填写地区时保留原地区而不是改为默认地区
+UPSERT_SQL = (
+    "INSERT INTO subscribers (openid, location, sign, name, plate, status, bucket, created_at, updated_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (openid) DO UPDATE SET location = COALESCE(?, subscribers.location), "
+    "sign = COALESCE(excluded.sign, subscribers.sign), name = COALESCE(excluded.name, subscribers.name), "
+    "plate = COALESCE(excluded.plate, subscribers.plate), status = excluded.status, updated_at = excluded.updated_at"
+)
+
+
+def bucket_of(openid: str) -> int:
+    """openid的稳定哈希桶（CRC32，跨进程、跨机器一致，不受 PYTHONHASHSEED 影响）"""
+    return zlib.crc32(openid.encode('utf-8'))
+
+
+def shard_of(openid: str, count: int) -> int:
+    """openid所属的分片下标（0 到 count-1）"""
+    return bucket_of(openid) * count // BUCKET_COUNT
+
+
+def shard_range(index: int, count: int) -> Tuple[int, int]:
+    """
+    分片对应的哈希桶区间 [起, 止)
+
+    按区间而不是取模划分，读取某个分片时可以走 (status, bucket) 索引做范围扫描。
+    """
+    if not 0 <= index < count:
+        raise ValueError(f"分片下标 {index} 超出范围（共 {count} 片）")
+    return -(-index * BUCKET_COUNT // count), -(-(index + 1) * BUCKET_COUNT // count)
+
+
+def _row(subscriber: Subscriber, now: float) -> Tuple:
+    return (subscriber.openid, subscriber.location, subscriber.sign, subscriber.name, subscriber.plate,
+            ACTIVE, bucket_of(subscriber.openid), now, now, subscriber.given_location)
+
+
+def iter_csv_subscribers(f: IO[str]) -> Iterator[Subscriber]:
+    """
+    逐行读取CSV中的订阅用户
+
+    表头需包含 openid，可选 location、sign（生日MM-DD或星座）、name、plate 列。
+    """
+    for record in csv.DictReader(f):
+        openid = (record.get("openid") or "").strip()
+        if not openid or openid.startswith('#'):
+            continue
+        sign = (record.get("sign") or "").strip()
+        yield Subscriber(openid, (record.get("location") or "").strip() or None,
+                         parse_sign(sign) if sign else None,
+                         (record.get("name") or "").strip() or None,
+                         (record.get("plate") or "").strip() or None)
+
+
+class SubscriberStore:
+    """订阅用户存储（SQLite）"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化订阅用户存储
+
+        Args:
+            path: SQLite数据库文件路径，默认在数据目录下
+        """
+        self.path = path or os.path.join(Config.DATA_DIR, Config.SUBSCRIBER_DB)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS subscribers (
+                    openid TEXT PRIMARY KEY,
+                    location TEXT NOT NULL,
+                    sign INTEGER,
+                    name TEXT,
+                    plate TEXT,
+                    status TEXT NOT NULL,
+                    bucket INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # 按状态遍历、按地区统计时走索引
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_subscribers_status ON subscribers (status, openid)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_subscribers_location ON subscribers (status, location)")
+            self._add_buckets(conn)
+            # 按分片读取时走 (status, bucket, openid) 索引做范围扫描，并按该顺序续读下一页
+            conn.execute("DROP INDEX IF EXISTS idx_subscribers_bucket")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_subscribers_shard ON subscribers (status, bucket, openid)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _add_buckets(conn: sqlite3.Connection):
+        """旧版数据库没有哈希桶列时补上并回填"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(subscribers)")}
+        if "bucket" in columns:
+            return
+        conn.execute("ALTER TABLE subscribers ADD COLUMN bucket INTEGER NOT NULL DEFAULT 0")
+        conn.create_function("openid_bucket", 1, bucket_of, deterministic=True)
+        conn.execute("UPDATE subscribers SET bucket = openid_bucket(openid)")
+
+    def upsert(self, subscriber: Subscriber) -> bool:
+        """
+        添加或更新一个订阅用户（已取消的用户恢复为正常订阅，未填写的字段保留原值）
+
+        Returns:
+            bool: 是否为新用户
+        """
+        with closing(self._connect()) as conn, conn:
+            existed = conn.execute("SELECT 1 FROM subscribers WHERE openid = ?", (subscriber.openid,)).fetchone()
+            conn.execute(UPSERT_SQL, _row(subscriber, time.time()))
+        return existed is None
+
+    def upsert_many(self, subscribers: Iterable[Subscriber], batch_size: Optional[int] = None) -> Tuple[int, int]:
+        """
+        批量导入订阅用户，按批写入，不把全部用户载入内存
+
+        Args:
+            subscribers: 订阅用户（可以是逐行读取的生成器）
+            batch_size: 每批写入的行数
+
+        Returns:
+            Tuple[int, int]: (新增数, 处理总数)
+        """
+        batch_size = batch_size or Config.SUBSCRIBER_IMPORT_BATCH
+        total = 0
+        batch: List[Tuple] = []
+        with closing(self._connect()) as conn:
+            before = self._count(conn, None)
+
+            def flush():
+                with conn:
+                    conn.executemany(UPSERT_SQL, batch)
+                batch.clear()
+
+            for subscriber in subscribers:
+                batch.append(_row(subscriber, time.time()))
+                total += 1
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+            added = self._count(conn, None) - before
+        return added, total
+
+    def remove(self, openid: str) -> bool:
+        """
+        取消订阅（保留记录，重新添加时恢复）
+
+        Returns:
+            bool: 用户是否存在
+        """
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute("UPDATE subscribers SET status = ?, updated_at = ? WHERE openid = ?",
+                                  (REMOVED, time.time(), openid))
+        return cursor.rowcount > 0
+
+    def get(self, openid: str) -> Optional[Subscriber]:
+        """按openid读取订阅用户"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT openid, location, sign, name, plate FROM subscribers WHERE openid = ?",
+                               (openid,)).fetchone()
+        return Subscriber(*row) if row else None
+
+    def iter_subscribers(self, status: str = ACTIVE, shard: Optional[Tuple[int, int]] = None) -> Iterator[Subscriber]:
+        """
+        逐页读取订阅用户（按索引续读，内存占用与用户数无关，读到第一页即可开始处理）
+
+        每页单独查询，调用方在两页之间可以长时间处理（如按发送窗口等待），不会一直占用读事务。
+
+        Args:
+            status: 订阅状态
+            shard: (分片下标, 分片数)，只读取该分片的用户，按哈希桶顺序返回；同一用户总是落在同一分片
+        """
+        columns = "SELECT bucket, openid, location, sign, name, plate FROM subscribers"
+        if shard is None:
+            sql = f"{columns} WHERE status = ? AND openid > ? ORDER BY openid LIMIT ?"
+            bounds: Tuple = (status,)
+            last: Tuple = ("",)
+        else:
+            low, high = shard_range(*shard)
+            sql = (f"{columns} WHERE status = ? AND bucket < ? AND (bucket, openid) > (?, ?) "
+                   f"ORDER BY bucket, openid LIMIT ?")
+            bounds = (status, high)
+            last = (low - 1, "")
+        while True:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(sql, (*bounds, *last, PAGE_SIZE)).fetchall()
+            for row in rows:
+                yield Subscriber(*row[1:])
+            if len(rows) < PAGE_SIZE:
+                return
+            bucket, openid = rows[-1][:2]
+            last = (openid,) if shard is None else (bucket, openid)
+
+    def locations(self) -> List[str]:
+        """正常订阅用户涉及的地区代码（走索引，不遍历用户）"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT DISTINCT location FROM subscribers WHERE status = ? ORDER BY location",
+                                (ACTIVE,)).fetchall()
+        return [location for location, in rows]
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, status: Optional[str]) -> int:
+        if status is None:
+            return conn.execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
+        return conn.execute("SELECT COUNT(*) FROM subscribers WHERE status = ?", (status,)).fetchone()[0]
+
+    def count(self, status: Optional[str] = ACTIVE) -> int:
+        """订阅用户数，status 为None时统计全部"""
+        with closing(self._connect()) as conn:
+            return self._count(conn, status)
+
+    def migrate_from_file(self, path: Optional[str] = None) -> int:
+        """
+        从 user_openids.txt 导入订阅用户（每个文件只迁移一次）
+
+        Returns:
+            int: 新增的用户数
+        """
+        path = os.path.abspath(path or Config.SUBSCRIBER_FILE)
+        key = f"migrated:{path}"
+        with closing(self._connect()) as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+        if not os.path.exists(path):
+            return 0
+        added, total = self.upsert_many(iter_file_subscribers(path))
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(time.time())))
+        logger.info(f"已从 {path} 迁移订阅用户: 新增 {added} 个（共 {total} 行）")
+        return added
+
+
+def configured_shard() -> Optional[Tuple[int, int]]:
+    """配置（SHARD_INDEX / SHARD_COUNT）中本进程负责的分片，不分片时为None"""
+    if Config.SHARD_COUNT <= 1:
+        return None
+    shard_range(Config.SHARD_INDEX, Config.SHARD_COUNT)  # 校验下标
+    return Config.SHARD_INDEX, Config.SHARD_COUNT
+
+
+_store: Optional[SubscriberStore] = None
+_store_lock = threading.Lock()
+
+
+def get_subscriber_store() -> SubscriberStore:
+    """获取进程内共享的订阅用户存储（首次使用时从 user_openids.txt 迁移）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SubscriberStore()
+            _store.migrate_from_file()
+        return _store
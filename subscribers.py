@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+订阅用户模块
+功能：解析 user_openids.txt 中的订阅用户，每行格式为
+      "openid [地区代码] [生日MM-DD或星座] [name=称呼] [plate=车牌号]"，
+      未填写地区代码时使用配置中的默认地区
+"""
+
+from typing import Iterable, Iterator, Optional
+
+from config import Config
+from constellation import parse_sign
+
+
+class Subscriber:
+    """订阅用户"""
+
+    __slots__ = ("openid", "_location", "sign", "name", "plate")
+
+    def __init__(self, openid: str, location: Optional[str] = None, sign: Optional[int] = None,
+                 name: Optional[str] = None, plate: Optional[str] = None):
+        """
+        初始化订阅用户
+
+        Args:
+            openid: 用户openid
+            location: 和风天气地区代码
+            sign: 星座下标（见 constellation.SIGNS），未设置为None
+            name: 称呼，用于问候语
+            plate: 车牌号，用于提示本人车辆是否限行
+        """
+        self.openid = openid
+        self._location = location or None
+        self.sign = sign
+        self.name = name
+        self.plate = plate
+
+    @property
+    def location(self) -> str:
+        """地区代码，未填写时为配置中的默认地区"""
+        return self._location or Config.WEATHER_LOCATION
+
+    @property
+    def given_location(self) -> Optional[str]:
+        """填写的地区代码，未填写时为None（更新已有用户时保留原地区）"""
+        return self._location
+
+    def __repr__(self):
+        return f"Subscriber({self.openid!r}, {self.location!r}, {self.sign!r}, {self.name!r}, {self.plate!r})"
+
+
+def parse_subscriber_line(line: str) -> Optional[Subscriber]:
+    """
+    解析一行订阅用户记录
+
+    Returns:
+        Optional[Subscriber]: 空行和注释行返回None
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    fields = line.split()
+    location = None
+    sign = None
+    extras = {}
+    for field in fields[1:]:
+        # key=value 为附加信息，地区代码为纯数字，其余按生日或星座解析
+        if '=' in field:
+            key, _, value = field.partition('=')
+            extras[key] = value
+        elif field.isdigit():
+            location = field
+        else:
+            sign = parse_sign(field)
+    return Subscriber(fields[0], location, sign, extras.get("name"), extras.get("plate"))
+
+
+def iter_subscribers(path: Optional[str] = None, lines: Optional[Iterable[str]] = None) -> Iterator[Subscriber]:
+    """
+    逐行读取订阅用户，不把整个文件载入内存
+
+    Args:
+        path: 订阅用户文件，默认为配置中的文件
+        lines: 已打开的文件或行迭代器（如标准输入），给出时不再打开文件
+
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    if lines is None:
+        with open(path or Config.SUBSCRIBER_FILE, 'r', encoding='utf-8') as f:
+            yield from iter_subscribers(lines=f)
+        return
+    for line in lines:
+        subscriber = parse_subscriber_line(line)
+        if subscriber:
+            yield subscriber
+
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+熔断器测试
+验证熔断状态持久化后恢复的行为：试探中被中断的熔断器在重启后仍能重新放行试探请求
+用法：python3 test_circuit_breaker.py
+"""
+
+import os
+import time
+import tempfile
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ProviderGuard
+
+
+def test_restore_half_open_allows_probe():
+    """保存时正在试探的熔断器恢复为熔断，熔断窗口过后放行试探请求"""
+    breaker = CircuitBreaker("weather", failure_threshold=1, reset_timeout=60)
+    breaker.restore({"state": HALF_OPEN, "failures": 3, "opened_at": time.time() - 120})
+    assert breaker.state == OPEN, breaker.state
+    assert breaker.allow(), "熔断窗口已过，应放行试探请求"
+    assert breaker.state == HALF_OPEN
+
+
+def test_restore_half_open_keeps_window():
+    """恢复为熔断时保留保存的熔断时间，熔断窗口内仍不放行"""
+    breaker = CircuitBreaker("weather", failure_threshold=1, reset_timeout=60)
+    breaker.restore({"state": HALF_OPEN, "failures": 3, "opened_at": time.time() - 10})
+    assert not breaker.allow(), "熔断窗口未过，不应放行"
+
+
+def test_guard_restart_during_probe():
+    """试探期间保存状态后重启，数据源不会被永久跳过"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "provider_state.json")
+        guard = ProviderGuard(path)
+        breaker = guard.breaker("weather")
+        breaker.reset_timeout = 0
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        assert breaker.allow() and breaker.state == HALF_OPEN
+        # 另一个数据源的结果触发保存，此时 weather 正在试探
+        guard.fetch("almanac", "today", lambda: {"ok": True})
+
+        restarted = ProviderGuard(path)
+        restored = restarted.breaker("weather")
+        restored.reset_timeout = 0
+        assert restored.state == OPEN, restored.state
+        value = restarted.fetch("weather", "101010100", lambda: {"temp": 20})
+        assert value == {"temp": 20}, value
+        assert restored.state == CLOSED
+
+
+def main():
+    print("🧪 熔断器测试")
+    print("=" * 50)
+
+    tests = [test_restore_half_open_allows_probe, test_restore_half_open_keeps_window,
+             test_guard_restart_during_probe]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__doc__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 测试结果: {len(tests) - failed}/{len(tests)} 通过")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rocket实时推送测试
+在本机启动一个模拟的Rocket服务器（REST接口 + DDP over WebSocket），不需要真实服务器即可验证：
+流水线发送、断开后改走REST、确认超时后REST重发遇到重复ID、握手失败时关闭连接
+用法：python3 test_rocket_realtime.py（需要安装 websocket-client）
+"""
+
+import json
+import base64
+import socket
+import struct
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rocket_push import RocketConfig, RocketPush
+from rocket_realtime import RealtimeDisconnected, RocketRealtime, websocket
+from ttl_cache import TTLCache
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+TOKEN = "test-token"
+ROOMS = {f"room{i}": f"rid{i}" for i in range(6)}
+
+
+class StandInRocket:
+    """模拟的Rocket服务器：按消息ID保存消息，重复ID的REST发送返回与MongoDB相同的重复键错误"""
+
+    def __init__(self, mode: str = "ack", drop_after: int = 0):
+        """
+        Args:
+            mode: 实时会话的行为，ack 正常确认、drop 收到 drop_after 条消息后断开、
+                  silent 保存消息但不确认、failed 握手时返回 failed
+            drop_after: drop 模式下断开前确认的消息数
+        """
+        self.mode = mode
+        self.drop_after = drop_after
+        self.messages = {}
+        self.ws_sends = []
+        self.rest_sends = []
+        self.rest_errors = []
+        self.closed = threading.Event()
+        self._lock = threading.Lock()
+
+        self._ws_server = socket.socket()
+        self._ws_server.bind(("127.0.0.1", 0))
+        self._ws_server.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, data):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if "channels.list.joined" in self.path:
+                    rooms = [{"_id": rid, "name": name} for name, rid in ROOMS.items()]
+                    self._reply(200, {"channels": rooms, "total": len(rooms), "success": True})
+                else:
+                    self._reply(200, {"groups": [], "total": 0, "success": True})
+
+            def do_POST(self):
+                message = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["message"]
+                server.rest_sends.append(message["_id"])
+                if not server.store(message):
+                    error = "E11000 duplicate key error collection: rocketchat_message index: _id_ dup key"
+                    server.rest_errors.append(error)
+                    self._reply(400, {"success": False, "error": error})
+                else:
+                    self._reply(200, {"success": True, "message": message})
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._http.server_port}/api/v1"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://127.0.0.1:{self._ws_server.getsockname()[1]}/websocket"
+
+    def store(self, message) -> bool:
+        """保存消息，ID已存在时返回False"""
+        with self._lock:
+            if message["_id"] in self.messages:
+                return False
+            self.messages[message["_id"]] = message
+            return True
+
+    def close(self):
+        self._http.shutdown()
+        self._ws_server.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._ws_server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._session, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _recv_exact(conn, size):
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+
+    def _recv_frame(self, conn):
+        """读取一个客户端帧（客户端帧带掩码）"""
+        head = self._recv_exact(conn, 2)
+        opcode, length = head[0] & 0x0F, head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self._recv_exact(conn, 2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self._recv_exact(conn, 8))[0]
+        mask = self._recv_exact(conn, 4)
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._recv_exact(conn, length)))
+        return opcode, payload
+
+    @staticmethod
+    def _send_frame(conn, data):
+        payload = json.dumps(data).encode()
+        if len(payload) < 126:
+            head = bytes([0x81, len(payload)])
+        else:
+            head = bytes([0x81, 126]) + struct.pack(">H", len(payload))
+        conn.sendall(head + payload)
+
+    def _session(self, conn):
+        """处理一个WebSocket连接：握手，再按DDP消息应答"""
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                request += conn.recv(1024)
+            key = next(line.split(b":", 1)[1].strip() for line in request.split(b"\r\n")
+                       if line.lower().startswith(b"sec-websocket-key"))
+            accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest())
+            conn.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+            self._send_frame(conn, {"server_id": "0"})
+
+            while True:
+                opcode, payload = self._recv_frame(conn)
+                if opcode == 0x8:
+                    break
+                message = json.loads(payload)
+                if message.get("msg") == "connect":
+                    if self.mode == "failed":
+                        self._send_frame(conn, {"msg": "failed", "version": "1"})
+                    else:
+                        self._send_frame(conn, {"msg": "connected", "session": "s1"})
+                        self._send_frame(conn, {"msg": "ping"})
+                elif message.get("msg") == "method" and message["method"] == "login":
+                    if message["params"][0].get("resume") == TOKEN:
+                        self._send_frame(conn, {"msg": "result", "id": message["id"], "result": {"id": "u1"}})
+                    else:
+                        self._send_frame(conn, {"msg": "result", "id": message["id"],
+                                                "error": {"error": 403, "reason": "You've been logged out by the server."}})
+                elif message.get("msg") == "method" and message["method"] == "sendMessage":
+                    sent = message["params"][0]
+                    self.ws_sends.append(sent["_id"])
+                    if self.mode == "drop" and len(self.ws_sends) > self.drop_after:
+                        # 没有保存就断开：这条消息需要改走REST。先关闭写方向并读完客户端已发出的帧，
+                        # 否则未读数据会让内核发送RST，客户端可能丢掉已收到的确认
+                        conn.shutdown(socket.SHUT_WR)
+                        conn.settimeout(3)
+                        while conn.recv(4096):
+                            pass
+                        break
+                    self.store(sent)
+                    if self.mode != "silent":
+                        self._send_frame(conn, {"msg": "result", "id": message["id"], "result": sent})
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            self.closed.set()
+
+
+def create_push(server: StandInRocket) -> RocketPush:
+    """连接到模拟服务器的推送实例（房间列表只缓存在内存中）"""
+    realtime = RocketRealtime(server.ws_url, TOKEN, timeout=3)
+    return RocketPush(TOKEN, "u1", "room0", base_url=server.base_url,
+                      room_cache=TTLCache(None, ttl=60, max_stale=60), realtime=realtime)
+
+
+def test_pipelined_broadcast():
+    """实时会话正常时所有房间的消息都走WebSocket，不调用REST"""
+    server = StandInRocket()
+    try:
+        results = create_push(server).broadcast("今日简报", list(ROOMS))
+        assert all(result.ok for result in results.values()), results
+        assert len(server.ws_sends) == len(ROOMS) and not server.rest_sends
+        assert len(server.messages) == len(ROOMS)
+    finally:
+        server.close()
+
+
+def test_fallback_on_disconnect():
+    """会话中途断开时未确认的消息以同一ID改走REST，每条消息只保存一次"""
+    server = StandInRocket(mode="drop", drop_after=2)
+    try:
+        results = create_push(server).broadcast("今日简报", list(ROOMS))
+        assert all(result.ok for result in results.values()), results
+        # 断开时发出但未保存的那条消息以同一ID重发
+        assert server.ws_sends[-1] in server.rest_sends, (server.ws_sends, server.rest_sends)
+        assert len(server.messages) == len(ROOMS) and not server.rest_errors
+    finally:
+        server.close()
+
+
+def test_duplicate_after_ack_timeout():
+    """服务器已保存但确认超时的消息，REST重发遇到重复ID时仍视为发送成功"""
+    server = StandInRocket(mode="silent")
+    ack_timeout, RocketConfig.ROCKET_ACK_TIMEOUT = RocketConfig.ROCKET_ACK_TIMEOUT, 0.3
+    try:
+        results = create_push(server).broadcast("今日简报", ["room0", "room1"])
+        assert all(result.ok for result in results.values()), results
+        assert len(server.rest_errors) == 2
+        assert len(server.messages) == 2
+    finally:
+        RocketConfig.ROCKET_ACK_TIMEOUT = ack_timeout
+        server.close()
+
+
+def test_handshake_failure_closes_socket():
+    """握手失败时抛出未经二次包装的 RealtimeDisconnected，并关闭已建立的连接"""
+    server = StandInRocket(mode="failed")
+    try:
+        realtime = RocketRealtime(server.ws_url, TOKEN, timeout=3)
+        try:
+            realtime.connect()
+        except RealtimeDisconnected as e:
+            assert e.__cause__ is None and "DDP" in str(e), repr(e)
+        else:
+            raise AssertionError("握手失败时应抛出 RealtimeDisconnected")
+        assert server.closed.wait(3), "握手失败后连接没有关闭"
+        assert not realtime.connected
+    finally:
+        server.close()
+
+
+def test_login_failure():
+    """令牌无效时登录失败，会话保持未连接"""
+    server = StandInRocket()
+    try:
+        realtime = RocketRealtime(server.ws_url, "wrong-token", timeout=3)
+        try:
+            realtime.connect()
+        except RealtimeDisconnected:
+            pass
+        else:
+            raise AssertionError("令牌无效时应抛出 RealtimeDisconnected")
+        assert not realtime.connected
+    finally:
+        server.close()
+
+
+def main():
+    print("🧪 Rocket实时推送测试（本机模拟服务器）")
+    print("=" * 50)
+
+    if websocket is None:
+        print("❌ 未安装 websocket-client，无法测试实时推送")
+        return
+
+    tests = [test_pipelined_broadcast, test_fallback_on_disconnect, test_duplicate_after_ack_timeout,
+             test_handshake_failure_closes_socket, test_login_failure]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__doc__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__doc__}: {e}")
+
+    print(f"\n📊 测试结果: {len(tests) - failed}/{len(tests)} 通过")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@
 import os
 import subprocess
 import time
+from subscriber_store import get_subscriber_store
 
 def test_with_test_account():
     print("🧪 测试号一键测试工具")
@@ -23,13 +24,7 @@ def test_with_test_account():
     print("✅ 已切换到测试号配置")
     
     # 检查用户openid
-    try:
-        with open('user_openids.txt', 'r', encoding='utf-8') as f:
-            openids = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-    except FileNotFoundError:
-        print("❌ 用户openid文件不存在")
-        print("请先添加测试用户openid")
-        return
+    openids = [subscriber.openid for subscriber in get_subscriber_store().iter_subscribers()]
     
     if not openids:
         print("❌ 未找到任何用户openid")
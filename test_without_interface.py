@@ -5,10 +5,15 @@
 用于验证系统核心功能
 """
 
-import requests
 import json
-from datetime import datetime
+from almanac_table import lookup_almanac
+from briefing_templates import Briefing, miniprogram_data
+from config import Config
 from miniprogram_config import MiniProgramConfig
+from traffic_rules import query_traffic_restriction
+from wechat_token import WeChatAPIError, get_token_manager
+from weather_client import peek_cached_weather
+from subscriber_store import get_subscriber_store
 
 def test_system_without_interface():
     """测试系统核心功能（不依赖接口配置）"""
@@ -19,68 +24,58 @@ def test_system_without_interface():
     
     # 测试1: Access Token获取
     print("1. 测试Access Token获取...")
-    url = f"{config.ACCESS_TOKEN_URL}?grant_type=client_credential&appid={config.MINI_PROGRAM_APP_ID}&secret={config.MINI_PROGRAM_APP_SECRET}"
-    
+    manager = get_token_manager(config.MINI_PROGRAM_APP_ID, config.MINI_PROGRAM_APP_SECRET)
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if 'access_token' in data:
-                print("✅ Access Token获取成功")
-                access_token = data['access_token']
-                print(f"   Token: {access_token[:20]}...")
-            else:
-                print("❌ Access Token获取失败")
-                print(f"   错误信息: {data}")
-                return
-    except Exception as e:
-        print(f"❌ 请求异常: {e}")
+        access_token = manager.get_token()
+        print("✅ Access Token获取成功")
+        print(f"   Token: {access_token[:20]}...")
+    except WeChatAPIError as e:
+        print("❌ Access Token获取失败")
+        print(f"   错误信息: {e}")
         return
     
     # 测试2: 消息模板验证
     print("\n2. 测试消息模板...")
-    template_url = f"https://api.weixin.qq.com/cgi-bin/template/get_all_private_template?access_token={access_token}"
+    template_url = "https://api.weixin.qq.com/cgi-bin/template/get_all_private_template"
     
     try:
-        response = requests.get(template_url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if 'template_list' in data:
-                templates = data['template_list']
-                print(f"✅ 找到 {len(templates)} 个模板")
-                
-                # 检查我们的模板是否存在
-                our_template = None
-                for template in templates:
-                    if template['template_id'] == config.MINI_PROGRAM_TEMPLATE_ID:
-                        our_template = template
-                        break
-                
-                if our_template:
-                    print("✅ 我们的模板存在")
-                    print(f"   模板标题: {our_template['title']}")
-                    print(f"   模板内容: {our_template['content']}")
-                else:
-                    print("❌ 我们的模板不存在")
-                    print("   请检查模板ID是否正确")
+        data = manager.request("GET", template_url)
+        if 'template_list' in data:
+            templates = data['template_list']
+            print(f"✅ 找到 {len(templates)} 个模板")
+            
+            # 检查我们的模板是否存在
+            our_template = None
+            for template in templates:
+                if template['template_id'] == config.MINI_PROGRAM_TEMPLATE_ID:
+                    our_template = template
+                    break
+            
+            if our_template:
+                print("✅ 我们的模板存在")
+                print(f"   模板标题: {our_template['title']}")
+                print(f"   模板内容: {our_template['content']}")
             else:
-                print("❌ 获取模板列表失败")
-                print(f"   错误信息: {data}")
+                print("❌ 我们的模板不存在")
+                print("   请检查模板ID是否正确")
+        else:
+            print("❌ 获取模板列表失败")
+            print(f"   错误信息: {data}")
     except Exception as e:
         print(f"❌ 模板验证异常: {e}")
     
     # 测试3: 消息数据格式化
     print("\n3. 测试消息数据格式化...")
     
-    # 模拟消息数据
-    test_message = {
-        "thing1": {"value": "每日信息简报"},
-        "date2": {"value": datetime.now().strftime("%Y年%m月%d日")},
-        "thing3": {"value": "晴 8℃"},
-        "thing4": {"value": "限行:2, 7"},
-        "thing5": {"value": "祭祀、祈福、求嗣"},
-        "thing6": {"value": "穿衣:较舒适"}
-    }
+    # 优先使用定时任务缓存的天气数据，没有缓存时使用模拟数据
+    cached = peek_cached_weather()
+    briefing = Briefing(Config.WEATHER_LOCATION, {
+        "weather": cached['weather'] or {"weather": "晴", "temperature": "8℃"},
+        "life_index": cached['life_index'] or {"dressing": "较舒适"},
+        "almanac": lookup_almanac(),
+        "traffic": query_traffic_restriction()
+    })
+    test_message = miniprogram_data(briefing)
     
     print("✅ 消息数据格式化成功")
     print("   消息格式:")
@@ -89,12 +84,7 @@ def test_system_without_interface():
     # 测试4: 用户openid验证
     print("\n4. 测试用户openid...")
     
-    try:
-        with open('user_openids.txt', 'r', encoding='utf-8') as f:
-            openids = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-    except FileNotFoundError:
-        print("❌ 用户openid文件不存在")
-        return
+    openids = [subscriber.openid for subscriber in get_subscriber_store().iter_subscribers()]
     
     if openids:
         print(f"✅ 找到 {len(openids)} 个用户openid")
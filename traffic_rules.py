@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+尾号限行规则引擎
+功能：按城市编译限行规则（工作日轮换周期、法定节假日、调休上班日），
+      把每天的限行尾号预先展开为数组，单日查询O(1)，支持按日期范围批量查询
+"""
+
+import json
+import os
+import threading
+import logging
+from array import array
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from config import Config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+WEEKDAY_NAMES = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
+# 法定节假日（放假日期，不限行），每年国务院公布后补充，也可追加到数据目录下的节假日文件
+HOLIDAYS = {
+    date(2025, 1, 1),
+    *(date(2025, 1, 28) + timedelta(days=i) for i in range(8)),   # 春节
+    *(date(2025, 4, 4) + timedelta(days=i) for i in range(3)),    # 清明
+    *(date(2025, 5, 1) + timedelta(days=i) for i in range(5)),    # 劳动节
+    *(date(2025, 5, 31) + timedelta(days=i) for i in range(3)),   # 端午
+    *(date(2025, 10, 1) + timedelta(days=i) for i in range(8)),   # 国庆、中秋
+    *(date(2026, 1, 1) + timedelta(days=i) for i in range(3)),    # 元旦
+    *(date(2026, 2, 15) + timedelta(days=i) for i in range(9)),   # 春节
+    *(date(2026, 4, 4) + timedelta(days=i) for i in range(3)),    # 清明
+    *(date(2026, 5, 1) + timedelta(days=i) for i in range(5)),    # 劳动节
+    *(date(2026, 6, 19) + timedelta(days=i) for i in range(3)),   # 端午
+    *(date(2026, 9, 25) + timedelta(days=i) for i in range(3)),   # 中秋
+    *(date(2026, 10, 1) + timedelta(days=i) for i in range(7)),   # 国庆
+}
+
+# 调休上班日（周末上班）
+MAKEUP_WORKDAYS = {
+    date(2025, 1, 26), date(2025, 2, 8), date(2025, 4, 27),
+    date(2025, 9, 28), date(2025, 10, 11),
+    date(2026, 1, 4), date(2026, 2, 14), date(2026, 2, 28),
+    date(2026, 5, 9), date(2026, 9, 20), date(2026, 10, 10),
+}
+
+# 没有节假日安排的年份无法判断是否放假，提示以官方通告为准
+UNKNOWN_CALENDAR_NOTE = "未收录当年节假日安排，请以官方通告为准"
+
+# 尾号分组
+DIGIT_PAIRS = ((1, 6), (2, 7), (3, 8), (4, 9), (5, 0))
+
+
+class CityTrafficRule:
+    """单个城市的尾号限行规则"""
+
+    def __init__(self, name: str, anchor: date, anchor_monday_pair: int,
+                 period_days: int = 91, time_range: str = "7:00-20:00", area: str = ""):
+        """
+        初始化城市规则
+
+        Args:
+            name: 城市名称
+            anchor: 某个轮换周期的起始日（周一）
+            anchor_monday_pair: 该周期内周一限行的尾号组（DIGIT_PAIRS 下标）
+            period_days: 轮换周期天数，北京为13周
+            time_range: 限行时段
+            area: 限行区域
+        """
+        self.name = name
+        self.anchor = anchor
+        self.anchor_monday_pair = anchor_monday_pair
+        self.period_days = period_days
+        self.time_range = time_range
+        self.area = area
+
+    def digits_for(self, day: date, holidays: set) -> tuple:
+        """
+        按规则计算某天的限行尾号（编译时使用）
+
+        只有非节假日的周一至周五限行（调休上班的周末不限行）；
+        每过一个轮换周期，周一对应的尾号组向前轮换一组，其余工作日依次顺延。
+        """
+        if day in holidays or day.weekday() >= 5:
+            return ()
+        period = (day - self.anchor).days // self.period_days
+        monday_pair = (self.anchor_monday_pair - period) % len(DIGIT_PAIRS)
+        return DIGIT_PAIRS[(monday_pair + day.weekday()) % len(DIGIT_PAIRS)]
+
+
+# 各城市限行规则（按和风天气地区代码）
+CITY_RULES = {
+    # 北京：2025-06-30 起的周期内周一限行1和6，每13周轮换一次；调休上班的周末不限行
+    "101010100": CityTrafficRule("北京", date(2025, 6, 30), 0, area="五环路以内道路（不含五环路）")
+}
+
+
+def _digits_to_mask(digits: Iterable[int]) -> int:
+    mask = 0
+    for digit in digits:
+        mask |= 1 << digit
+    return mask
+
+
+def _mask_to_digits(mask: int) -> List[int]:
+    # 保持"1、6"这样的常用顺序，0排在最后
+    return [digit for digit in (1, 2, 3, 4, 5, 6, 7, 8, 9, 0) if mask & (1 << digit)]
+
+
+def plate_digit(plate: str) -> int:
+    """车牌尾号：取最后一位，最后一位是字母时按0处理"""
+    last = plate.strip()[-1:]
+    return int(last) if last.isdigit() else 0
+
+
+def load_calendar_overrides(path: Optional[str] = None) -> tuple:
+    """
+    读取额外的节假日安排文件（每年国务院公布后追加即可）
+
+    文件格式: {"holidays": ["2026-01-01", ...], "makeup_workdays": ["2026-01-04", ...]}
+
+    Returns:
+        tuple: (节假日集合, 调休上班日集合)
+    """
+    holidays, makeup_workdays = set(HOLIDAYS), set(MAKEUP_WORKDAYS)
+    path = path or os.path.join(Config.DATA_DIR, Config.HOLIDAY_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            holidays.update(date.fromisoformat(d) for d in data.get("holidays", []))
+            makeup_workdays.update(date.fromisoformat(d) for d in data.get("makeup_workdays", []))
+        except (OSError, ValueError) as e:
+            logger.warning(f"节假日安排文件 {path} 读取失败，忽略: {e}")
+    return holidays, makeup_workdays
+
+
+class TrafficRulesEngine:
+    """编译后的限行规则：每个城市每天一个尾号位图"""
+
+    def __init__(self, rules: Optional[Dict[str, CityTrafficRule]] = None,
+                 start: Optional[date] = None, days: Optional[int] = None,
+                 holidays: Optional[set] = None, makeup_workdays: Optional[set] = None):
+        """
+        编译限行规则
+
+        Args:
+            rules: 地区代码到城市规则的映射
+            start: 编译起始日期，默认为今年1月1日
+            days: 编译天数
+            holidays: 法定节假日集合
+            makeup_workdays: 调休上班日集合
+        """
+        if holidays is None or makeup_workdays is None:
+            loaded_holidays, loaded_makeup = load_calendar_overrides()
+            holidays = loaded_holidays if holidays is None else holidays
+            makeup_workdays = loaded_makeup if makeup_workdays is None else makeup_workdays
+
+        self.rules = rules if rules is not None else CITY_RULES
+        self.holidays = holidays
+        self.makeup_workdays = makeup_workdays
+        self.start = start or date(date.today().year, 1, 1)
+        self.days = days or Config.TRAFFIC_COMPILE_DAYS
+        self.base = self.start.toordinal()
+        # 有节假日安排的年份，其余年份的工作日限行只是按星期推算
+        self.calendar_years = {day.year for day in self.holidays}
+        end_year = date.fromordinal(self.base + self.days - 1).year
+        missing = [year for year in range(self.start.year, end_year + 1) if year not in self.calendar_years]
+        if missing and self.rules:
+            logger.warning(f"缺少 {'、'.join(map(str, missing))} 年的法定节假日安排，这些年份的限行只按星期推算，"
+                           f"请在 {Config.HOLIDAY_FILE} 中补充")
+
+        self._masks: Dict[str, array] = {}
+        for location, rule in self.rules.items():
+            masks = array('H', bytes(2 * self.days))
+            for i in range(self.days):
+                day = date.fromordinal(self.base + i)
+                masks[i] = _digits_to_mask(rule.digits_for(day, self.holidays))
+            self._masks[location] = masks
+
+    def restricted_digits(self, location: str, day: date) -> List[int]:
+        """
+        查询某城市某天的限行尾号
+
+        Returns:
+            List[int]: 限行尾号，不限行或无该城市规则时为空列表
+        """
+        masks = self._masks.get(location)
+        if masks is None:
+            return []
+        index = day.toordinal() - self.base
+        if 0 <= index < self.days:
+            return _mask_to_digits(masks[index])
+        # 超出编译范围时按规则现算
+        return list(self.rules[location].digits_for(day, self.holidays))
+
+    def restricted_range(self, location: str, start: date, end: date) -> Dict[date, List[int]]:
+        """
+        批量查询日期范围内（含首尾）每天的限行尾号，例如预计算一个季度
+
+        Returns:
+            Dict[date, List[int]]: 日期到限行尾号的映射
+        """
+        total = (end - start).days + 1
+        if total <= 0:
+            return {}
+        masks = self._masks.get(location)
+        first = start.toordinal() - self.base
+        if masks is not None and first >= 0 and first + total <= self.days:
+            window = masks[first:first + total]
+            return {start + timedelta(days=i): _mask_to_digits(mask) for i, mask in enumerate(window)}
+        return {start + timedelta(days=i): self.restricted_digits(location, start + timedelta(days=i))
+                for i in range(total)}
+
+    def query(self, location: Optional[str] = None, day: Optional[date] = None) -> Dict:
+        """
+        查询限行信息（简报板块格式）
+
+        Args:
+            location: 地区代码，默认为配置中的地区
+            day: 日期，默认今天
+
+        Returns:
+            Dict: 日期、星期、限行尾号、限行时段、限行区域、说明（不限行原因，或未收录节假日安排的提示）
+        """
+        location = location or Config.WEATHER_LOCATION
+        day = day or date.today()
+        rule = self.rules.get(location)
+        digits = self.restricted_digits(location, day)
+
+        if rule is None:
+            note = "暂无该城市限行规则"
+        elif day.year not in self.calendar_years:
+            note = UNKNOWN_CALENDAR_NOTE
+        elif digits:
+            note = ""
+        elif day in self.holidays:
+            note = "法定节假日不限行"
+        elif day in self.makeup_workdays:
+            note = "调休上班日不限行"
+        else:
+            note = "周末不限行"
+
+        return {
+            "date": day.strftime("%Y年%m月%d日"),
+            "weekday": WEEKDAY_NAMES[day.weekday()],
+            "restricted_numbers": digits,
+            "time": rule.time_range if rule else "",
+            "area": rule.area if rule else "",
+            "note": note
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_traffic_engine() -> TrafficRulesEngine:
+    """获取进程内共享的限行规则引擎（首次调用时编译）"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TrafficRulesEngine()
+        return _engine
+
+
+def query_traffic_restriction(location: Optional[str] = None, day: Optional[date] = None) -> Dict:
+    """查询限行信息，默认为配置中的地区和今天"""
+    return get_traffic_engine().query(location, day)
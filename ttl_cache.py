@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTL缓存模块
+功能：内存 + 磁盘两级缓存，过期后先返回旧值并在后台刷新（stale-while-revalidate）
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """带磁盘持久化的TTL缓存"""
+
+    def __init__(self, path: Optional[str], ttl: float, max_stale: float):
+        """
+        初始化缓存
+
+        Args:
+            path: 磁盘缓存文件路径，为None时只使用内存
+            ttl: 新鲜期（秒），期内直接返回缓存，不请求上游
+            max_stale: 最长可用期（秒），超过新鲜期但未超过此值时返回旧值并后台刷新
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._load()
+
+    def _load(self):
+        """从磁盘加载缓存"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"缓存文件 {self.path} 读取失败，忽略: {e}")
+            self._entries = {}
+
+    def _save(self):
+        """原子写入磁盘（调用方需持有锁）"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"缓存文件 {self.path} 写入失败: {e}")
+
+    def peek(self, key: str, max_stale: Optional[float] = None) -> Optional[Dict]:
+        """
+        读取缓存条目，不触发任何请求
+
+        Args:
+            key: 缓存键
+            max_stale: 本次读取的最长可用期（秒），默认为缓存的最长可用期
+
+        Returns:
+            Optional[Dict]: {"value": 缓存值, "age": 已缓存秒数}，不存在或已超过最长可用期时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry:
+            return None
+        age = time.time() - entry["fetched_at"]
+        if age > (self.max_stale if max_stale is None else max(max_stale, self.ttl)):
+            return None
+        return {"value": entry["value"], "age": age}
+
+    def set(self, key: str, value: Any):
+        """写入缓存并持久化"""
+        with self._lock:
+            self._entries[key] = {"value": value, "fetched_at": time.time()}
+            self._save()
+
+    def get_or_fetch(self, key: str, fetcher: Callable[[], Any], max_stale: Optional[float] = None) -> Any:
+        """
+        读取缓存，必要时调用上游
+
+        新鲜期内直接返回；过期但在最长可用期内返回旧值并后台刷新；
+        否则同步调用 fetcher，成功后写入缓存。fetcher 失败时抛出的异常原样传出。
+
+        Args:
+            key: 缓存键
+            fetcher: 上游获取函数，失败时应抛出异常
+            max_stale: 本次读取的最长可用期（秒），时效性强的数据（如实时天气）可以调小，
+                       超过后同步请求，失败由调用方处理（如熔断器计数并标注数据时间）
+
+        Returns:
+            Any: 缓存值或新获取的值
+        """
+        cached = self.peek(key, max_stale)
+        if cached is not None:
+            if cached["age"] >= self.ttl:
+                self._refresh_in_background(key, fetcher)
+            return cached["value"]
+
+        value = fetcher()
+        self.set(key, value)
+        return value
+
+    def _refresh_in_background(self, key: str, fetcher: Callable[[], Any]):
+        """后台刷新，同一个键同时只有一个刷新线程"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.set(key, fetcher())
+                logger.info(f"缓存 {key} 后台刷新完成")
+            except Exception as e:
+                logger.warning(f"缓存 {key} 后台刷新失败，继续使用旧值: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"cache-refresh-{key}", daemon=True).start()
@@ -2,99 +2,107 @@
 # -*- coding: utf-8 -*-
 """
 openid验证工具
+订阅用户属于配置的公众号时，通过批量获取用户信息接口检查openid（每次100个，不发送消息），
+只重新检查过期或状态有变化的用户；小程序订阅消息的用户不能用公众号接口检查，改为根据发送记录判断
+用法：python3 verify_openids.py [--force]
 """
 
-import requests
-from miniprogram_config import MiniProgramConfig
-
-def verify_openid(openid, config):
-    """验证单个openid是否有效"""
-    access_token = get_access_token(config)
-    if not access_token:
-        return False, "无法获取Access Token"
-    
-    # 构建测试消息
-    test_data = {
-        "thing1": {"value": "测试消息"},
-        "date2": {"value": "2024-01-01"},
-        "thing3": {"value": "测试"}
-    }
-    
-    template_data = {
-        "touser": openid,
-        "template_id": config.MINI_PROGRAM_TEMPLATE_ID,
-        "page": "pages/index/index",
-        "data": test_data
-    }
-    
-    url = f"https://api.weixin.qq.com/cgi-bin/message/subscribe/send?access_token={access_token}"
-    
-    try:
-        response = requests.post(url, json=template_data, timeout=10)
-        if response.status_code == 200:
-            result = response.json()
-            errcode = result.get('errcode', -1)
-            
-            if errcode == 0:
-                return True, "有效"
-            elif errcode == 40003:
-                return False, "无效openid"
-            elif errcode == 43101:
-                return False, "用户未授权"
-            else:
-                return False, f"其他错误: {result}"
-    except Exception as e:
-        return False, f"请求异常: {e}"
-    
-    return False, "未知错误"
-
-def get_access_token(config):
-    """获取Access Token"""
-    url = f"{config.ACCESS_TOKEN_URL}?grant_type=client_credential&appid={config.MINI_PROGRAM_APP_ID}&secret={config.MINI_PROGRAM_APP_SECRET}"
-    
-    try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('access_token', '')
-    except:
-        pass
-    
-    return ""
+import sys
+import time
+from itertools import islice
+
+from config import Config
+from subscriber_check import SubscriberChecker, batch_check_supported
+from subscriber_status import ACTIVE, BACKOFF, SubscriberStatusStore
+from subscriber_store import get_subscriber_store
+from subscribers import Subscriber
+from wechat_token import WeChatAPIError, get_token_manager
+
+# 按发送记录判断时每次查询的用户数
+LOOKUP_CHUNK = 500
+
+def create_checker():
+    """创建批量检查器（使用订阅用户所属公众号的令牌），openid不属于该公众号时为None"""
+    if not batch_check_supported():
+        return None
+    manager = get_token_manager(Config.WECHAT_APP_ID, Config.WECHAT_APP_SECRET)
+    return SubscriberChecker(manager)
+
+def describe_check(subscribed):
+    """检查结果转为 (是否有效, 说明)"""
+    if subscribed:
+        return True, "有效"
+    elif subscribed is None:
+        return False, "无效openid"
+    else:
+        return True, "有效（未关注公众号）"
+
+def describe_state(state):
+    """发送记录中的用户状态转为 (是否有效, 说明)，state 为 (状态, 错误码, 恢复发送时间) 或None"""
+    if state is None or state[0] == ACTIVE:
+        return True, "发送记录正常"
+    status, errcode, retry_at = state
+    if status == BACKOFF:
+        return True, f"临时失败（错误码 {errcode}），{time.strftime('%m-%d %H:%M', time.localtime(retry_at))} 后重试"
+    return False, f"已停发（错误码 {errcode}）"
+
+def verify_openid(openid):
+    """验证单个openid是否有效（批量检查时不使用缓存的检查结果）"""
+    checker = create_checker()
+    if checker is None:
+        return describe_state(SubscriberStatusStore().states([openid]).get(openid))
+    results = checker.check([Subscriber(openid)], force=True)
+    return describe_check(results.get(openid))
+
+def print_results(results):
+    """逐个输出 (openid, (是否有效, 说明))，返回有效数"""
+    valid_count = 0
+    for i, (openid, (is_valid, message)) in enumerate(results, 1):
+        mark = "✅" if is_valid else "❌"
+        print(f"[{i}/{len(results)}] {openid[:8]}... {mark} {message}")
+        valid_count += is_valid
+    return valid_count
+
+def verify_by_history():
+    """根据发送记录判断订阅用户状态（不调用任何接口）"""
+    status = SubscriberStatusStore()
+    subscribers = get_subscriber_store().iter_subscribers()
+    results = []
+    while True:
+        chunk = [subscriber.openid for subscriber in islice(subscribers, LOOKUP_CHUNK)]
+        if not chunk:
+            break
+        states = status.states(chunk)
+        results.extend((openid, describe_state(states.get(openid))) for openid in chunk)
+
+    print("ℹ️ 订阅用户不属于配置的公众号（SUBSCRIBER_APP_ID），无法批量检查，按发送记录判断\n")
+    valid_count = print_results(results)
+    print(f"\n📊 验证结果: {valid_count}/{len(results)} 个可发送的openid")
 
 def main():
     print("🔍 openid验证工具")
     print("=" * 50)
-    
-    config = MiniProgramConfig()
-    
-    # 读取openid文件
+
+    checker = create_checker()
+    if checker is None:
+        verify_by_history()
+        return
+
+    # 逐行读取订阅用户，只批量检查没有有效检查结果的openid，结果写回用户状态
+    force = "--force" in sys.argv[1:]
     try:
-        with open('user_openids.txt', 'r', encoding='utf-8') as f:
-            openids = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-    except FileNotFoundError:
-        print("❌ user_openids.txt 文件不存在")
+        results = checker.check(get_subscriber_store().iter_subscribers(), force=force)
+    except WeChatAPIError as e:
+        print(f"❌ 检查失败: {e}")
         return
-    
-    if not openids:
-        print("❌ 未找到任何openid")
+
+    if not results:
+        print("✅ 所有openid的检查结果都未过期，无需重新检查（使用 --force 全部重新检查）")
         return
-    
-    print(f"📋 开始验证 {len(openids)} 个openid...\n")
-    
-    valid_count = 0
-    for i, openid in enumerate(openids, 1):
-        print(f"[{i}/{len(openids)}] 验证 {openid[:8]}...", end=" ")
-        
-        is_valid, message = verify_openid(openid, config)
-        
-        if is_valid:
-            print("✅ 有效")
-            valid_count += 1
-        else:
-            print(f"❌ {message}")
-    
-    print(f"\n📊 验证结果: {valid_count}/{len(openids)} 个有效openid")
+
+    print(f"📋 已检查 {len(results)} 个openid（{checker.calls} 次请求）\n")
+    valid_count = print_results([(openid, describe_check(subscribed)) for openid, subscribed in results.items()])
+    print(f"\n📊 验证结果: {valid_count}/{len(results)} 个有效openid")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
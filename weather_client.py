@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+和风天气客户端
+功能：通过长连接池访问和风天气API，带连接/读取超时和指数退避重试，
+      实时天气和生活指数经过TTL缓存，重复运行和重启后无需重新请求上游
+"""
+
+import os
+import time
+import random
+import threading
+import logging
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from ttl_cache import TTLCache
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 生活指数类型（和风天气 indices 接口的 type 参数）
+LIFE_INDEX_TYPES = {
+    "1": "sport",
+    "2": "car_washing",
+    "3": "dressing",
+    "5": "uv",
+    "9": "cold",
+    "10": "air_quality"
+}
+
+# 可重试的和风天气业务状态码（限流、服务端错误）
+RETRYABLE_CODES = {"429", "500", "502", "503", "504"}
+
+# 一次重试至少需要的时间（秒），剩余时长不足时不再重试
+MIN_ATTEMPT_TIME = 1.0
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+class WeatherAPIError(Exception):
+    """天气API调用失败"""
+
+
+def shared_weather_cache() -> TTLCache:
+    """获取进程内共享的天气缓存（对应同一个磁盘缓存文件）"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = TTLCache(
+                os.path.join(Config.DATA_DIR, Config.WEATHER_CACHE_FILE),
+                ttl=Config.WEATHER_CACHE_TTL,
+                max_stale=Config.WEATHER_CACHE_MAX_STALE
+            )
+        return _shared_cache
+
+
+def peek_cached_weather(location: Optional[str] = None) -> Dict:
+    """
+    只读取缓存中的实时天气和生活指数，不请求上游（供测试和展示工具使用）
+
+    Args:
+        location: 地区代码，默认为配置中的地区
+
+    Returns:
+        Dict: {"weather": 实时天气或None, "life_index": 生活指数或None}
+    """
+    location = location or Config.WEATHER_LOCATION
+    cache = shared_weather_cache()
+    weather = cache.peek(f"now:{location}")
+    life_index = cache.peek(f"indices:{location}")
+    return {
+        "weather": weather["value"] if weather else None,
+        "life_index": life_index["value"] if life_index else None
+    }
+
+
+class QWeatherClient:
+    """和风天气API客户端"""
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 max_retry: Optional[int] = None, retry_delay: Optional[float] = None,
+                 retry_budget: Optional[float] = None, pool_size: int = 10, cache: Optional[TTLCache] = None):
+        """
+        初始化天气客户端
+
+        Args:
+            api_key: 和风天气API密钥
+            base_url: API地址
+            connect_timeout: 建立连接（含TLS握手）超时时间（秒）
+            read_timeout: 读取响应超时时间（秒）
+            max_retry: 最大尝试次数
+            retry_delay: 退避基准延迟（秒）
+            retry_budget: 一次请求含重试的总时长（秒），每次尝试的超时不超过剩余时长
+            pool_size: 连接池大小
+            cache: 天气缓存，默认使用共享缓存
+        """
+        self.api_key = api_key or Config.WEATHER_API_KEY
+        self.base_url = (base_url or Config.WEATHER_API_URL).rstrip('/')
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else Config.WEATHER_CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else Config.WEATHER_READ_TIMEOUT
+        )
+        self.max_retry = max(1, max_retry if max_retry is not None else Config.MAX_RETRY)
+        self.retry_delay = retry_delay if retry_delay is not None else Config.RETRY_DELAY
+        self.retry_budget = retry_budget if retry_budget is not None else Config.WEATHER_RETRY_BUDGET
+        self.cache = cache if cache is not None else shared_weather_cache()
+
+        # 复用长连接，避免每次请求重新握手
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt: int) -> float:
+        """计算第 attempt 次失败后的等待时间（指数退避 + 全抖动）"""
+        return random.uniform(0, self.retry_delay * (2 ** attempt))
+
+    def _get(self, path: str, params: Dict) -> Dict:
+        """
+        发送GET请求，失败时按退避策略重试，全部尝试在 retry_budget 内完成（简报板块超时前）
+
+        Args:
+            path: 接口路径，如 /weather/now
+            params: 查询参数（不含key）
+
+        Returns:
+            Dict: 接口返回的JSON数据
+
+        Raises:
+            WeatherAPIError: 重试耗尽或遇到不可重试的错误
+        """
+        url = f"{self.base_url}{path}"
+        query = dict(params, key=self.api_key)
+        last_error = None
+        deadline = time.monotonic() + self.retry_budget
+
+        for attempt in range(self.max_retry):
+            remaining = deadline - time.monotonic()
+            timeout = tuple(min(limit, remaining) for limit in self.timeout)
+            try:
+                response = self.session.get(url, params=query, timeout=timeout)
+                if response.status_code == 200:
+                    data = response.json()
+                    code = str(data.get("code", "200"))
+                    if code == "200":
+                        return data
+                    last_error = f"业务错误码 {code}"
+                    if code not in RETRYABLE_CODES:
+                        break
+                else:
+                    last_error = f"HTTP {response.status_code}"
+                    if str(response.status_code) not in RETRYABLE_CODES:
+                        break
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = f"网络异常: {e}"
+            except ValueError as e:
+                last_error = f"响应解析失败: {e}"
+
+            if attempt < self.max_retry - 1:
+                delay = self._backoff(attempt)
+                if deadline - time.monotonic() - delay < MIN_ATTEMPT_TIME:
+                    logger.warning(f"天气API请求失败（{last_error}），剩余时间不足，不再重试")
+                    break
+                logger.warning(f"天气API请求失败（{last_error}），{delay:.1f}s 后第 {attempt + 2} 次尝试")
+                time.sleep(delay)
+
+        raise WeatherAPIError(f"{path} 请求失败: {last_error}")
+
+    def get_now(self, location: Optional[str] = None) -> Dict:
+        """
+        获取实时天气
+
+        Args:
+            location: 地区代码，默认为配置中的地区
+
+        Returns:
+            Dict: 温度、天气、湿度、风力、更新时间
+        """
+        location = location or Config.WEATHER_LOCATION
+        # 实时天气过了新鲜期只再用几分钟，更旧的不当作当前天气返回，改为同步请求（失败时由熔断器标注数据时间）
+        return self.cache.get_or_fetch(f"now:{location}", lambda: self._fetch_now(location),
+                                       max_stale=Config.WEATHER_NOW_MAX_STALE)
+
+    def get_indices(self, location: Optional[str] = None) -> Dict:
+        """
+        获取当天生活指数
+
+        Args:
+            location: 地区代码，默认为配置中的地区
+
+        Returns:
+            Dict: 穿衣、紫外线、洗车、感冒、运动、空气质量指数
+        """
+        location = location or Config.WEATHER_LOCATION
+        return self.cache.get_or_fetch(f"indices:{location}", lambda: self._fetch_indices(location))
+
+    def _fetch_now(self, location: str) -> Dict:
+        """请求实时天气接口"""
+        data = self._get("/weather/now", {"location": location})
+        now = data["now"]
+        return {
+            "temperature": f"{now['temp']}℃",
+            "weather": now["text"],
+            "humidity": f"{now['humidity']}%",
+            "wind": now["windDir"] + now["windScale"] + "级",
+            "update_time": data["updateTime"]
+        }
+
+    def _fetch_indices(self, location: str) -> Dict:
+        """请求生活指数接口"""
+        data = self._get("/indices/1d", {
+            "location": location,
+            "type": ",".join(LIFE_INDEX_TYPES)
+        })
+        life_index = {}
+        for item in data.get("daily", []):
+            field = LIFE_INDEX_TYPES.get(str(item.get("type")))
+            if field:
+                life_index[field] = item.get("category", "N/A")
+        return life_index
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
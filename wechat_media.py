@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+微信临时素材缓存模块
+功能：同一张图片（按内容哈希和日期区分）只通过临时素材接口上传一次，
+      在有效期内把同一个 media_id 交给本次推送的所有消息
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from datetime import date
+from typing import IO, Dict, Optional
+
+from config import Config
+from wechat_token import AccessTokenManager, WeChatAPIError
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def content_hash(fileobj: IO[bytes], chunk_size: int = 64 * 1024) -> str:
+    """按块计算文件内容的SHA-256（不把文件整体读入内存），读完后回到原位置"""
+    start = fileobj.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        digest.update(chunk)
+    fileobj.seek(start)
+    return digest.hexdigest()
+
+
+class MediaCache:
+    """临时素材 media_id 缓存（磁盘持久化，进程重启后继续使用未过期的素材）"""
+
+    def __init__(self, manager: AccessTokenManager, path: Optional[str] = None,
+                 upload_url: Optional[str] = None, ttl: Optional[float] = None):
+        """
+        初始化素材缓存
+
+        Args:
+            manager: Access Token管理器
+            path: 缓存文件路径，默认在数据目录下
+            upload_url: 临时素材上传接口地址
+            ttl: media_id 的使用期限（秒），应略短于微信的3天有效期
+        """
+        self.manager = manager
+        self.path = path or os.path.join(Config.DATA_DIR, Config.WECHAT_MEDIA_CACHE_FILE)
+        self.upload_url = upload_url or Config.WECHAT_MEDIA_UPLOAD_URL
+        self.ttl = ttl if ttl is not None else Config.WECHAT_MEDIA_TTL
+        self._entries: Dict[str, Dict] = {}
+        # 上传期间持有锁：并发请求同一张图片时只上传一次
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """从磁盘加载缓存"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"素材缓存文件 {self.path} 读取失败，忽略: {e}")
+            self._entries = {}
+
+    def _save(self):
+        """原子写入磁盘缓存，同时清理过期条目（调用方需持有锁）"""
+        now = time.time()
+        self._entries = {key: entry for key, entry in self._entries.items() if entry["expires_at"] > now}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"素材缓存文件 {self.path} 写入失败: {e}")
+
+    def _upload(self, fileobj: IO[bytes], media_type: str, filename: str, content_type: str) -> Dict:
+        """调用临时素材接口上传，完成后文件对象回到原位置"""
+        start = fileobj.tell()
+        try:
+            data = self.manager.request("POST", self.upload_url, params={"type": media_type},
+                                        files={"media": (filename, fileobj, content_type)},
+                                        timeout=Config.WECHAT_MEDIA_UPLOAD_TIMEOUT)
+        finally:
+            fileobj.seek(start)
+        if not data.get('media_id'):
+            raise WeChatAPIError(f"上传临时素材失败: {data}", data.get('errcode'))
+        return data
+
+    def media_id(self, fileobj: IO[bytes], media_type: str = "image", filename: str = "briefing.jpg",
+                 content_type: str = "image/jpeg", day: Optional[date] = None) -> str:
+        """
+        取得图片的 media_id：同一天同一内容只上传一次
+
+        Args:
+            fileobj: 已定位到文件开头的文件对象（如 ImageGenerator.generate_image_stream 的返回值）
+            media_type: 素材类型
+            filename: 上传的文件名
+            content_type: 文件类型
+            day: 日期，默认为今天
+
+        Returns:
+            str: media_id
+
+        Raises:
+            WeChatAPIError: 上传失败
+        """
+        day = day or date.today()
+        key = f"{media_type}:{content_hash(fileobj)}:{day.isoformat()}"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry["expires_at"] > time.time():
+                return entry["media_id"]
+
+            data = self._upload(fileobj, media_type, filename, content_type)
+            created_at = data.get('created_at') or time.time()
+            self._entries[key] = {"media_id": data['media_id'], "expires_at": float(created_at) + self.ttl}
+            self._save()
+        logger.info(f"已上传临时素材 {filename}，media_id {data['media_id']}")
+        return data['media_id']
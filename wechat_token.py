@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+微信 Access Token 管理模块
+功能：缓存 access_token 及其过期时间，临近过期时后台提前刷新；
+      接口返回 40001/42001 等令牌失效错误时刷新后重放请求；
+      通过加锁的磁盘缓存在多个进程之间共享同一个令牌，避免触发获取频率限制
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，只做进程内加锁
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 令牌无效或过期的错误码，刷新令牌后可重放请求
+TOKEN_ERROR_CODES = {40001, 40014, 42001}
+
+
+class WeChatAPIError(Exception):
+    """微信接口调用失败"""
+
+    def __init__(self, message: str, errcode: Optional[int] = None):
+        super().__init__(message)
+        self.errcode = errcode
+
+
+class AccessTokenManager:
+    """单个公众号/小程序的 access_token 管理器"""
+
+    def __init__(self, app_id: str, app_secret: str, token_url: Optional[str] = None,
+                 cache_path: Optional[str] = None, refresh_margin: Optional[float] = None,
+                 session: Optional[requests.Session] = None):
+        """
+        初始化令牌管理器
+
+        Args:
+            app_id: AppID
+            app_secret: AppSecret
+            token_url: 获取令牌的接口地址
+            cache_path: 多进程共享的磁盘缓存文件，默认在数据目录下
+            refresh_margin: 距离过期多少秒时开始提前刷新
+            session: HTTP会话，默认新建带连接池的会话
+        """
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.token_url = token_url or Config.WECHAT_TOKEN_URL
+        self.cache_path = cache_path or os.path.join(Config.DATA_DIR, Config.WECHAT_TOKEN_CACHE_FILE)
+        self.refresh_margin = refresh_margin if refresh_margin is not None else Config.WECHAT_TOKEN_REFRESH_MARGIN
+        self.timeout = Config.WECHAT_REQUEST_TIMEOUT
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.WECHAT_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程互斥：同一时间只有一个进程读写磁盘缓存并请求新令牌"""
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.cache_path}.lock", 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_disk(self) -> Dict:
+        """读取磁盘缓存（调用方需持有文件锁）"""
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"令牌缓存文件 {self.cache_path} 读取失败，忽略: {e}")
+            return {}
+
+    def _write_disk(self, entries: Dict):
+        """原子写入磁盘缓存（调用方需持有文件锁）"""
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"令牌缓存文件 {self.cache_path} 写入失败: {e}")
+
+    def _fetch(self) -> Dict:
+        """请求微信接口获取新令牌"""
+        params = {"grant_type": "client_credential", "appid": self.app_id, "secret": self.app_secret}
+        try:
+            response = self.session.get(self.token_url, params=params, timeout=self.timeout)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise WeChatAPIError(f"获取Access Token失败: {e}")
+        if 'access_token' not in data:
+            raise WeChatAPIError(f"获取Access Token失败: {data}", data.get('errcode'))
+        logger.info("已获取新的Access Token")
+        return {"access_token": data['access_token'], "expires_at": time.time() + data.get('expires_in', 7200)}
+
+    def _refresh(self, invalid_token: Optional[str] = None) -> str:
+        """
+        刷新令牌
+
+        先看其他进程是否已经写入了更新的令牌，没有时才请求微信接口。
+
+        Args:
+            invalid_token: 已确认失效的令牌，磁盘缓存中是这个令牌时也要重新获取
+        """
+        with self._file_lock():
+            entries = self._read_disk()
+            entry = entries.get(self.app_id)
+            usable = (entry and entry["access_token"] != invalid_token
+                      and entry["expires_at"] - time.time() > self.refresh_margin)
+            if not usable:
+                entry = self._fetch()
+                entries[self.app_id] = entry
+                self._write_disk(entries)
+        with self._lock:
+            self._token = entry["access_token"]
+            self._expires_at = entry["expires_at"]
+        return entry["access_token"]
+
+    def _refresh_in_background(self):
+        """后台提前刷新，同时只有一个刷新线程"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self._refresh()
+            except WeChatAPIError as e:
+                logger.warning(f"Access Token后台刷新失败，继续使用当前令牌: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, name="wechat-token-refresh", daemon=True).start()
+
+    def get_token(self) -> str:
+        """
+        获取可用的 access_token
+
+        Returns:
+            str: access_token
+
+        Raises:
+            WeChatAPIError: 没有可用令牌且获取失败
+        """
+        with self._lock:
+            token, remaining = self._token, self._expires_at - time.time()
+        if token and remaining > 0:
+            if remaining <= self.refresh_margin:
+                self._refresh_in_background()
+            return token
+        return self._refresh()
+
+    def invalidate(self, token: str) -> str:
+        """令牌被微信判定无效时调用，返回新令牌"""
+        logger.warning("Access Token已失效，重新获取")
+        return self._refresh(invalid_token=token)
+
+    def request(self, method: str, url: str, **kwargs) -> Dict:
+        """
+        调用需要 access_token 的微信接口，令牌失效时刷新后重放一次
+
+        Args:
+            method: HTTP方法
+            url: 接口地址（不含 access_token 参数）
+            **kwargs: 传给 requests 的其他参数（json、params 等）
+
+        Returns:
+            Dict: 接口返回的JSON数据（业务错误码由调用方处理）
+
+        Raises:
+            WeChatAPIError: 令牌获取失败、网络异常或响应无法解析
+        """
+        params = dict(kwargs.pop("params", None) or {})
+        kwargs.setdefault("timeout", self.timeout)
+        token = self.get_token()
+        # 上传的文件对象在重放前要回到开头
+        uploads = [(f[1], f[1].tell()) for f in (kwargs.get("files") or {}).values()
+                   if isinstance(f, tuple) and hasattr(f[1], "seek")]
+
+        for attempt in range(2):
+            params["access_token"] = token
+            for fileobj, start in uploads:
+                fileobj.seek(start)
+            try:
+                response = self.session.request(method, url, params=params, **kwargs)
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                raise WeChatAPIError(f"请求 {url} 失败: {e}")
+            if data.get('errcode') in TOKEN_ERROR_CODES and attempt == 0:
+                token = self.invalidate(token)
+                continue
+            return data
+
+
+_managers: Dict[str, AccessTokenManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(app_id: Optional[str] = None, app_secret: Optional[str] = None) -> AccessTokenManager:
+    """
+    获取进程内共享的令牌管理器（每个AppID一个）
+
+    Args:
+        app_id: AppID，默认为配置中的公众号AppID
+        app_secret: AppSecret
+    """
+    app_id = app_id or Config.WECHAT_APP_ID
+    with _managers_lock:
+        manager = _managers.get(app_id)
+        if manager is None:
+            manager = AccessTokenManager(app_id, app_secret or Config.WECHAT_APP_SECRET)
+            _managers[app_id] = manager
+        return manager